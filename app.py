@@ -1,25 +1,112 @@
-# from us_visa.pipline.training_pipeline import TrainPipeline
-
-# obj=TrainPipeline()
-# obj.run_pipeline()
-
+import time
+import asyncio
 from datetime import datetime
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import Response, JSONResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from starlette.responses import HTMLResponse, RedirectResponse
 from uvicorn import run as app_run
 
-from typing import Optional
+from typing import Optional, List, Tuple
+from pydantic import BaseModel
+import orjson
 
 from us_visa.constants import *
-from us_visa.pipline.prediction_pipeline import USvisaData, USvisaClassifier
-from us_visa.pipline.training_pipeline import TrainPipeline
+from us_visa.pipline.prediction_pipeline import USvisaData, USvisaClassifier, USVISA_DATA_COLUMNS
+from us_visa.pipline.inference_executor import InferenceExecutor
+from us_visa.pipline.micro_batching import MicroBatchDispatcher
+from us_visa.pipline.bulk_scoring import BulkScorer, RequestStreamingResponse
+from us_visa.pipline.serving_metrics import ServingMetrics
+from us_visa.pipline.warmup import ServingWarmup
+from us_visa.pipline.prefork_server import PreforkServer
+from us_visa.pipline.request_validation import RequestValidator
+from us_visa.pipline.what_if import WhatIfAnalyzer
+from us_visa.pipline.shadow_scoring import ShadowScorer
+from us_visa.entity.config_entity import MicroBatchingConfig, InferenceExecutorConfig, TrainingJobsConfig, BulkScoringConfig, WarmupConfig, PreforkServerConfig, WhatIfConfig, ShadowScoringConfig
+from us_visa.entity.estimator import TargetValueMapping
+from us_visa.pipline.training_jobs import TrainingJobManager
+
+# Per-stage latency histograms and request / error counts, exposed on /metrics
+serving_metrics = ServingMetrics()
+
+# One classifier per process : it hands out the shared preprocessor/model pair of the ModelRegistry
+model_predictor = USvisaClassifier(serving_metrics=serving_metrics)
+
+# transform/predict run on a thread or process pool, the event loop only does I/O, parsing and rendering
+inference_executor = InferenceExecutor(model_predictor=model_predictor,
+                                       inference_executor_config=InferenceExecutorConfig())
+
+# Opt-in (USVISA_MICRO_BATCHING=1) : concurrent form predictions are scored together
+micro_batching_config = MicroBatchingConfig()
+micro_batch_dispatcher = MicroBatchDispatcher(inference_executor=inference_executor,
+                                              micro_batching_config=micro_batching_config)
+
+# Payloads are checked against config/schema.yaml and the learned categories before any model work
+request_validator = RequestValidator(model_predictor=model_predictor)
+
+# What-if sweeps : the grid of variations of one applicant is scored as a single batch
+what_if_analyzer = WhatIfAnalyzer(request_validator=request_validator, inference_executor=inference_executor,
+                                  what_if_config=WhatIfConfig())
+
+# A candidate model staged in CandidateModel/ scores a sample of the predictions after the response is sent
+shadow_scoring_config = ShadowScoringConfig()
+shadow_scorer = ShadowScorer(inference_executor=inference_executor, shadow_scoring_config=shadow_scoring_config)
+
+# Streamed CSV / NDJSON uploads are scored chunk by chunk
+bulk_scorer = BulkScorer(inference_executor=inference_executor, request_validator=request_validator,
+                         bulk_scoring_config=BulkScoringConfig())
 
-app = FastAPI()
+# Model loading, synthetic predictions and template pre-rendering before the process reports ready
+serving_warmup = ServingWarmup(model_predictor=model_predictor, inference_executor=inference_executor,
+                               warmup_config=WarmupConfig())
+
+# Label -> case_status of the JSON API responses
+status_mapping = TargetValueMapping().reverse_mapping()
+
+# Retraining runs in separate processes, never inside a request handler
+training_job_manager = TrainingJobManager(training_jobs_config=TrainingJobsConfig())
+
+
+def prerender_templates() -> None:
+    
+    # Compiles and caches usvisa.html (url_for needs a request, a minimal one is enough)
+    warmup_request = Request({"type": "http", "method": "GET", "path": "/", "root_path": "", "scheme": "http",
+                              "query_string": b"", "headers": [], "server": ("localhost", APP_PORT),
+                              "app": app, "router": app.router})
+    
+    templates.TemplateResponse("usvisa.html", {"request": warmup_request, "context": "Rendering"})
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    
+    inference_executor.start()
+    
+    if micro_batching_config.enabled:
+        await micro_batch_dispatcher.start()
+    
+    if shadow_scoring_config.enabled:
+        await shadow_scorer.start()
+    
+    # Runs in the background : the liveness probe answers while the process warms up
+    warmup_task = asyncio.create_task(serving_warmup.run(prerender_templates=prerender_templates))
+    
+    yield
+    
+    serving_warmup.ready = False
+    warmup_task.cancel()
+    
+    await micro_batch_dispatcher.stop()
+    await shadow_scorer.stop()
+    inference_executor.shutdown()
+    training_job_manager.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -63,6 +150,88 @@ class DataForm:
         self.unit_of_wage = form.get("unit_of_wage")
         self.full_time_position = form.get("full_time_position")
 
+    def get_usvisa_record(self) -> dict:
+        
+        # The form asks for the age of the company, the model was trained on its year of establishment
+        try:
+            yr_of_estab = datetime.today().year - int(self.company_age)
+        except (TypeError, ValueError):
+            yr_of_estab = self.company_age    # not an integer : reported by the request validator
+        
+        return {"continent": self.continent,
+                "education_of_employee": self.education_of_employee,
+                "has_job_experience": self.has_job_experience,
+                "requires_job_training": self.requires_job_training,
+                "no_of_employees": self.no_of_employees,
+                "yr_of_estab": yr_of_estab,
+                "region_of_employment": self.region_of_employment,
+                "prevailing_wage": self.prevailing_wage,
+                "unit_of_wage": self.unit_of_wage,
+                "full_time_position": self.full_time_position}
+
+
+def validation_error_response(field_errors: List[dict]) -> JSONResponse:
+    
+    return JSONResponse(status_code=422, content={"status": False, "error": "Invalid request", "field_errors": field_errors})
+
+
+async def read_applicant_records(request: Request, route: str,
+                                 applicant_field: Optional[str] = None) -> Tuple[Optional[List[dict]], Optional[Response]]:
+    
+    """
+    JSON body of the single-applicant routes : parsed with orjson and checked by the request validator only
+    (no pydantic model). The applicant is the body itself, or its applicant_field object; the parsed body is
+    kept on request.state.payload for the other fields of the route.
+    Returns: (validated records, None), or (None, 400 / 422 error response counted as an error of the route)
+    """
+    
+    start_time = time.perf_counter()
+    
+    try:
+        payload = orjson.loads(await request.body())
+    except orjson.JSONDecodeError as e:
+        serving_metrics.count_error(route)
+        return None, ORJSONResponse(status_code=400, content={"status": False, "error": f"Invalid JSON body : {e}"})
+    
+    applicant = payload if applicant_field is None or not isinstance(payload, dict) else payload.get(applicant_field)
+    
+    if not isinstance(applicant, dict):
+        serving_metrics.count_error(route)
+        return None, validation_error_response([{"index": 0, "field": applicant_field or "body",
+                                                 "error": "expected a JSON object with the applicant fields"}])
+    
+    serving_metrics.observe_stage("json_parsing", time.perf_counter() - start_time)
+    request.state.payload = payload
+    
+    records, field_errors = request_validator.validate_records([{column: applicant.get(column) for column in USVISA_DATA_COLUMNS}])
+    
+    if field_errors:
+        serving_metrics.count_error(route)
+        return None, validation_error_response(field_errors)
+    
+    return records, None
+
+
+class USvisaRecord(BaseModel):
+    
+    """
+    One applicant record of the JSON API : same fields as USvisaData.
+    """
+    continent: str
+    education_of_employee: str
+    has_job_experience: str
+    requires_job_training: str
+    no_of_employees: int
+    yr_of_estab: int
+    region_of_employment: str
+    prevailing_wage: float
+    unit_of_wage: str
+    full_time_position: str
+
+
+class USvisaBatchRequest(BaseModel):
+    records: List[USvisaRecord]
+
 
 
 @app.get("/", tags=["authentication"])
@@ -74,41 +243,62 @@ async def index(request: Request):
 
 @app.get("/train")
 async def trainRouteClient():
+    serving_metrics.count_request("train")
     try:
-        train_pipeline = TrainPipeline()
-
-        train_pipeline.run_pipeline()
+        # Returns immediately : follow the job on /train/jobs/{job_id}
+        training_job = training_job_manager.submit()
 
-        return Response("Training successful !!")
+        return JSONResponse(status_code=202, content=training_job)
 
     except Exception as e:
+        serving_metrics.count_error("train")
         return Response(f"Error Occurred! {e}")
 
 
+@app.get("/train/jobs")
+async def trainJobsRouteClient():
+    
+    return {"jobs": training_job_manager.list_jobs()}
+
+
+@app.get("/train/jobs/{job_id}")
+async def trainJobStatusRouteClient(job_id: str):
+    
+    training_job = training_job_manager.get_job(job_id)
+    
+    if training_job is None:
+        return JSONResponse(status_code=404, content={"status": False, "error": f"Unknown training job {job_id}"})
+    
+    return training_job
+
+
 @app.post("/")
-async def predictRouteClient(request: Request):
+async def predictRouteClient(request: Request, background_tasks: BackgroundTasks):
+    serving_metrics.count_request("predict")
     try:
+        start_time = time.perf_counter()
         form = DataForm(request)
         await form.get_usvisa_data()
+        serving_metrics.observe_stage("form_parsing", time.perf_counter() - start_time)
         
-        usvisa_data = USvisaData(
-                                continent= form.continent,
-                                education_of_employee = form.education_of_employee,
-                                has_job_experience = form.has_job_experience,
-                                requires_job_training = form.requires_job_training,
-                                no_of_employees= form.no_of_employees,
-                                yr_of_estab= int(form.company_age) + datetime.today().year,    # need to change this to yr_of_estab
-                                region_of_employment = form.region_of_employment,
-                                prevailing_wage= form.prevailing_wage,
-                                unit_of_wage= form.unit_of_wage,
-                                full_time_position= form.full_time_position,
-                                )
+        records, field_errors = request_validator.validate_records([form.get_usvisa_record()])
         
-        usvisa_df = usvisa_data.get_usvisa_input_data_frame()
-
-        model_predictor = USvisaClassifier()
-
-        value = model_predictor.predict(dataframe=usvisa_df)[0]
+        if field_errors:
+            serving_metrics.count_error("predict")
+            return validation_error_response(field_errors)
+        
+        usvisa_data = USvisaData(**records[0])
+        
+        if micro_batching_config.enabled:
+            value, probability, model_version = await micro_batch_dispatcher.predict(record=usvisa_data.get_usvisa_data_as_record())
+            probabilities = [probability]
+        
+        else:
+            # Only the label is rendered : early exit applies when USVISA_EARLY_EXIT=1
+            labels, model_version = await inference_executor.score_record_labels(records=[usvisa_data.get_usvisa_data_as_record()])
+            value, probabilities = labels[0], None
+        
+        background_tasks.add_task(shadow_scorer.submit, records, [value], probabilities, model_version)
 
         status = None
         if value == 1:
@@ -117,17 +307,268 @@ async def predictRouteClient(request: Request):
         else:
             status = "Visa Not-Approved"
 
-        return templates.TemplateResponse(
+        start_time = time.perf_counter()
+        template_response = templates.TemplateResponse(
             "usvisa.html",
             {"request": request, "context": status},
         )
+        serving_metrics.observe_stage("template_render", time.perf_counter() - start_time)
+        
+        return template_response
         
     except Exception as e:
+        serving_metrics.count_error("predict")
         return {"status": False, "error": f"{e}"}
 
 
+@app.post("/predict")
+async def predictJsonRouteClient(request: Request, background_tasks: BackgroundTasks):
+    
+    """
+    JSON API for one applicant (the USvisaRecord fields) : no form parsing, no template rendering.
+    The body is parsed with orjson and checked by the request validator only (no pydantic model),
+    the response is serialized with orjson.
+    """
+    
+    serving_metrics.count_request("predict_json")
+    try:
+        records, error_response = await read_applicant_records(request, "predict_json")
+        
+        if error_response is not None:
+            return error_response
+        
+        if micro_batching_config.enabled:
+            label, probability, model_version = await micro_batch_dispatcher.predict(record=records[0])
+        
+        else:
+            labels, probabilities, model_version = await inference_executor.score_records(records=records)
+            label, probability = labels[0], probabilities[0]
+        
+        background_tasks.add_task(shadow_scorer.submit, records, [label], [probability], model_version)
+        
+        return ORJSONResponse({"status": True,
+                               "model_version": model_version,
+                               "prediction": int(label),
+                               "case_status": status_mapping[int(label)],
+                               "probability_certified": float(probability)})
+        
+    except Exception as e:
+        serving_metrics.count_error("predict_json")
+        return ORJSONResponse({"status": False, "error": f"{e}"})
+
+
+@app.post("/predict/explain")
+async def predictExplainRouteClient(request: Request):
+    
+    """
+    Per-feature explanation of the decision for one applicant (same JSON body as /predict).
+    Contributions are TreeSHAP values in log-odds of Certified, one per applicant field (one-hot columns
+    summed back into their ohe_features column), largest first : base_value + their sum is the model output.
+    """
+    
+    serving_metrics.count_request("predict_explain")
+    try:
+        records, error_response = await read_applicant_records(request, "predict_explain")
+        
+        if error_response is not None:
+            return error_response
+        
+        explanations, model_version = await inference_executor.explain_records(records=records)
+        explanation = explanations[0]
+        
+        contributions = [{"feature": feature, "value": records[0][feature], "contribution": contribution}
+                         for feature, contribution in sorted(explanation["contributions"].items(), key=lambda item: -abs(item[1]))]
+        
+        return ORJSONResponse({"status": True,
+                               "model_version": model_version,
+                               "prediction": int(explanation["prediction"]),
+                               "case_status": status_mapping[int(explanation["prediction"])],
+                               "probability_certified": explanation["probability_certified"],
+                               "base_value": explanation["base_value"],
+                               "contributions": contributions})
+        
+    except Exception as e:
+        serving_metrics.count_error("predict_explain")
+        return ORJSONResponse({"status": False, "error": f"{e}"})
+
+
+@app.post("/predict/similar")
+async def predictSimilarRouteClient(request: Request, k: int = SIMILAR_CASES_DEFAULT_K):
+    
+    """
+    Similar past cases for one applicant (same JSON body as /predict) : the decision, plus the k historical
+    applications nearest in the encoded feature space with their outcome, nearest first.
+    certified_share is the share of Certified outcomes among them.
+    """
+    
+    serving_metrics.count_request("predict_similar")
+    try:
+        if not 1 <= k <= SIMILAR_CASES_MAX_K:
+            serving_metrics.count_error("predict_similar")
+            return validation_error_response([{"index": 0, "field": "k", "error": f"expected an integer between 1 and {SIMILAR_CASES_MAX_K}"}])
+        
+        records, error_response = await read_applicant_records(request, "predict_similar")
+        
+        if error_response is not None:
+            return error_response
+        
+        similar_cases, labels, probabilities, model_version = await inference_executor.find_similar_cases(records=records, k=k)
+        
+        cases = similar_cases[0]
+        
+        return ORJSONResponse({"status": True,
+                               "model_version": model_version,
+                               "prediction": int(labels[0]),
+                               "case_status": status_mapping[int(labels[0])],
+                               "probability_certified": float(probabilities[0]),
+                               "certified_share": sum(case["outcome_label"] for case in cases) / len(cases),
+                               "similar_cases": cases})
+        
+    except Exception as e:
+        serving_metrics.count_error("predict_similar")
+        return ORJSONResponse({"status": False, "error": f"{e}"})
+
+
+@app.post("/predict/what-if")
+async def predictWhatIfRouteClient(request: Request):
+    
+    """
+    What-if sweep for one applicant : {"applicant": {the USvisaRecord fields}, "sweeps": {field: sweep spec}}.
+    A sweep spec is a list of values, or {"start", "stop", "num"} for a numerical field. Every combination is
+    scored in one batch; the response holds the probability surface, one axis per swept field in request order.
+    """
+    
+    serving_metrics.count_request("predict_what_if")
+    try:
+        records, error_response = await read_applicant_records(request, "predict_what_if", applicant_field="applicant")
+        
+        if error_response is not None:
+            return error_response
+        
+        axes, field_errors = what_if_analyzer.parse_sweeps(base_record=records[0], sweeps=request.state.payload.get("sweeps"))
+        
+        if field_errors:
+            serving_metrics.count_error("predict_what_if")
+            return validation_error_response(field_errors)
+        
+        return ORJSONResponse({"status": True, **await what_if_analyzer.analyze(base_record=records[0], axes=axes)})
+        
+    except Exception as e:
+        serving_metrics.count_error("predict_what_if")
+        return ORJSONResponse({"status": False, "error": f"{e}"})
+
+
+@app.post("/predict/batch")
+async def predictBatchRouteClient(batch_request: USvisaBatchRequest, background_tasks: BackgroundTasks):
+    serving_metrics.count_request("predict_batch")
+    try:
+        max_batch_size = model_predictor.prediction_pipeline_config.max_batch_size
+        
+        if len(batch_request.records) > max_batch_size:
+            serving_metrics.count_error("predict_batch")
+            return JSONResponse(status_code=413,
+                                content={"status": False,
+                                         "error": f"Batch of {len(batch_request.records)} records exceeds the max batch size {max_batch_size}"})
+        
+        records, field_errors = request_validator.validate_records([record.model_dump() for record in batch_request.records])
+        
+        if field_errors:
+            serving_metrics.count_error("predict_batch")
+            return validation_error_response(field_errors)
+        
+        labels, probabilities, model_version = await inference_executor.score_records(records=records)
+        
+        background_tasks.add_task(shadow_scorer.submit, records, labels, probabilities, model_version)
+        
+        predictions = [{"prediction": int(label),
+                        "case_status": status_mapping[int(label)],
+                        "probability_certified": float(probability)}
+                       for label, probability in zip(labels, probabilities)]
+        
+        return {"status": True, "model_version": model_version, "predictions": predictions}
+        
+    except Exception as e:
+        serving_metrics.count_error("predict_batch")
+        return {"status": False, "error": f"{e}"}
+
+
+@app.post("/predict/bulk")
+async def predictBulkRouteClient(request: Request, format: Optional[str] = None):
+    serving_metrics.count_request("predict_bulk")
+    
+    # Input format from ?format=csv|ndjson or the Content-Type header; results use the same format
+    content_type = request.headers.get("content-type", "")
+    input_format = format or ("csv" if "csv" in content_type else "ndjson")
+    
+    if input_format not in ("csv", "ndjson"):
+        serving_metrics.count_error("predict_bulk")
+        return JSONResponse(status_code=415, content={"status": False, "error": f"Unsupported format {input_format}"})
+    
+    media_type = "text/csv" if input_format == "csv" else "application/x-ndjson"
+    
+    return RequestStreamingResponse(bulk_scorer.score_stream(request.stream(), input_format=input_format),
+                                    media_type=media_type)
+
+
+@app.get("/predict/cache-stats")
+async def predictionCacheStatsRouteClient():
+    
+    # Hit/miss counters of the prediction cache of this process (thread pool inference)
+    if model_predictor.prediction_cache is None:
+        return {"enabled": False}
+    
+    return {"enabled": True, **model_predictor.prediction_cache.get_stats()}
+
+
+@app.get("/predict/dispatcher-stats")
+async def dispatcherStatsRouteClient():
+    
+    # Queue depth and batch size histograms for tuning the micro-batching window
+    return {"enabled": micro_batching_config.enabled, **micro_batch_dispatcher.get_stats()}
+
+
+@app.get("/predict/shadow-stats")
+async def shadowStatsRouteClient():
+    
+    # Agreement rate and latency of the candidate model against production, on the shadowed requests of this process
+    return shadow_scorer.get_stats()
+
+
+@app.get("/health/live")
+async def livenessRouteClient():
+    
+    # The process is up and its event loop answers
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def readinessRouteClient():
+    
+    # Traffic should only be routed here once the model is loaded and the serving path is warm
+    warmup_status = serving_warmup.get_status()
+    
+    return JSONResponse(status_code=200 if warmup_status["ready"] else 503, content=warmup_status)
+
+
+@app.get("/metrics")
+async def metricsRouteClient():
+    
+    # Prometheus text format : per-stage latency histograms, request and error counts
+    return Response(content=serving_metrics.render_prometheus() + shadow_scorer.render_prometheus(),
+                    media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     
-    app_run(app, host=APP_HOST, port=APP_PORT)
+    prefork_server_config = PreforkServerConfig()
+    
+    if prefork_server_config.n_workers > 1:
+        # USVISA_SERVING_WORKERS=N : the model is loaded here once and inherited by N forked workers
+        # (memory-mapped artifact by default, see PreforkServer for what stays shared)
+        PreforkServer(app, host=APP_HOST, port=APP_PORT, prefork_server_config=prefork_server_config,
+                      preload=model_predictor.get_model_handle).run()
+    
+    else:
+        app_run(app, host=APP_HOST, port=APP_PORT)
 
 
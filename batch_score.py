@@ -0,0 +1,29 @@
+# Offline scoring of a large local CSV / Parquet file (raw EasyVisa.csv column layout) with the production
+# preprocessor and model, on all CPU cores. Rerunning the same command after a crash skips the chunks already scored.
+#
+#   python batch_score.py notebook/EasyVisa.csv predictions.csv
+#   python batch_score.py applicants.parquet predictions.parquet --chunk-size 50000 --workers 8
+
+import argparse
+
+from us_visa.entity.config_entity import OfflineScoringConfig
+from us_visa.pipline.offline_scoring import OfflineScoringPipeline
+
+
+if __name__ == "__main__":
+
+    default_config = OfflineScoringConfig()
+
+    parser = argparse.ArgumentParser(description="Score a CSV/Parquet file of visa applications")
+    parser.add_argument("input_filepath", help=".csv or .parquet file to score")
+    parser.add_argument("output_filepath", help=".csv or .parquet file receiving the results, in input order")
+    parser.add_argument("--chunk-size", type=int, default=default_config.chunk_size, help="rows scored together by one worker")
+    parser.add_argument("--workers", type=int, default=default_config.max_workers, help="number of worker processes")
+    args = parser.parse_args()
+
+    offline_scoring_pipeline = OfflineScoringPipeline(input_filepath=args.input_filepath,
+                                                      output_filepath=args.output_filepath,
+                                                      offline_scoring_config=OfflineScoringConfig(chunk_size=args.chunk_size,
+                                                                                                  max_workers=args.workers))
+
+    print(offline_scoring_pipeline.run())
@@ -0,0 +1,87 @@
+# Benchmark : k-nearest historical cases with CaseIndex (category partitions + ring scan) against a brute-force scan.
+# The history is EasyVisa.csv replicated up to each size with jittered numerical fields; for every size, checks that the
+# neighbours are identical to the brute force on random applicants, then reports build time and per-query latency.
+# Run from the project root :  python benchmarks/case_index_benchmark.py
+
+import time
+import pickle
+import statistics
+
+import numpy as np
+import pandas as pd
+
+from us_visa.entity.config_entity import USvisaPredictorConfig
+from us_visa.entity.compiled_encoder import CompiledEncoder
+from us_visa.entity.case_index import CaseIndex, CASE_ID_COLUMN
+from us_visa.pipline.model_registry import get_production_pair_filepaths
+
+
+DATA_FILEPATH = "notebook/EasyVisa.csv"
+HISTORY_SIZES = [25_480, 250_000, 1_000_000]
+N_QUERIES = 200
+K = 5
+
+
+def make_history(dataframe: pd.DataFrame, size: int, rng: np.random.Generator) -> pd.DataFrame:
+
+    history = dataframe.sample(n=size, replace=size > len(dataframe), random_state=0).reset_index(drop=True)
+
+    if size > len(dataframe):
+        for column in ["no_of_employees", "prevailing_wage"]:
+            history[column] = history[column] * rng.uniform(0.9, 1.1, size)
+        history["yr_of_estab"] = history["yr_of_estab"] + rng.integers(-3, 4, size)
+
+    history[CASE_ID_COLUMN] = [f"SYN{row}" for row in range(size)]
+
+    return history
+
+
+def brute_force(X: np.ndarray, x: np.ndarray, k: int) -> np.ndarray:
+
+    squared_distances = np.square(X - x).sum(axis=1)
+
+    return np.lexsort((np.arange(X.shape[0]), squared_distances))[:k]
+
+
+if __name__ == "__main__":
+
+    data_preprocessor_filepath, _ = get_production_pair_filepaths(USvisaPredictorConfig())
+
+    with open(data_preprocessor_filepath, "rb") as preprocessor_file:
+        compiled_encoder = CompiledEncoder.from_preprocessor(pickle.load(preprocessor_file))
+
+    rng = np.random.default_rng(0)
+    dataframe = pd.read_csv(DATA_FILEPATH)
+    X_queries = compiled_encoder.transform(dataframe.sample(n=N_QUERIES, random_state=1))
+
+    print(f"{'cases':>9} | {'partitions':>10} | {'build s':>7} | {'exact':>5} | {'index median us':>15} | "
+          f"{'index p99 us':>12} | {'brute force median us':>21}")
+
+    for size in HISTORY_SIZES:
+        history = make_history(dataframe, size, rng)
+
+        start_time = time.perf_counter()
+        case_index = CaseIndex.build(dataframe=history, compiled_encoder=compiled_encoder, model_version="benchmark")
+        build_seconds = time.perf_counter() - start_time
+
+        # Index rows in the same (partition) order, float32 like the index
+        X_index = np.hstack([np.repeat(case_index.partition_keys, np.diff(case_index.partition_offsets), axis=0),
+                             case_index.numeric])
+        columns = np.concatenate([case_index.ohe_output_indices, case_index.num_output_indices])
+
+        index_timings, brute_force_timings, exact = [], [], True
+
+        for x in X_queries:
+            start_time = time.perf_counter()
+            rows, _ = case_index.query(x, K)
+            index_timings.append(time.perf_counter() - start_time)
+
+            start_time = time.perf_counter()
+            expected_rows = brute_force(X_index, x[columns].astype(np.float32), K)
+            brute_force_timings.append(time.perf_counter() - start_time)
+
+            exact &= bool(np.array_equal(rows, expected_rows))
+
+        print(f"{size:>9} | {case_index.partition_keys.shape[0]:>10} | {build_seconds:>7.2f} | {str(exact):>5} | "
+              f"{statistics.median(index_timings) * 1e6:>15.0f} | {np.percentile(index_timings, 99) * 1e6:>12.0f} | "
+              f"{statistics.median(brute_force_timings) * 1e6:>21.0f}")
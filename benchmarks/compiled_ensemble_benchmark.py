@@ -0,0 +1,70 @@
+# Benchmark : flattened GradientBoostingClassifier evaluator (CompiledGradientBoosting) vs sklearn predict_proba.
+# Run from the project root :  python benchmarks/compiled_ensemble_benchmark.py
+
+import time
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from us_visa.entity.compiled_ensemble import CompiledGradientBoosting
+from us_visa.entity.config_entity import USvisaPredictorConfig
+from us_visa.pipline.model_registry import get_production_pair_filepaths
+
+
+DATA_FILEPATH = "notebook/EasyVisa.csv"
+BATCH_SIZES = [1, 8, 32, 128, 1024, 25480]
+
+
+def time_per_call(func, X, min_seconds: float = 0.5) -> float:
+
+    """
+    Returns the average seconds per func(X) call, repeating until min_seconds have elapsed.
+    """
+
+    func(X)    # warm-up
+
+    n_calls = 0
+    start = time.perf_counter()
+
+    while True:
+        func(X)
+        n_calls += 1
+
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return elapsed / n_calls
+
+
+if __name__ == "__main__":
+
+    data_preprocessor_filepath, pred_model_filepath = get_production_pair_filepaths(USvisaPredictorConfig())
+
+    with open(data_preprocessor_filepath, "rb") as data_preprocessor_handle:
+        data_preprocessor = pickle.load(data_preprocessor_handle)
+
+    with open(pred_model_filepath, "rb") as pred_model_handle:
+        prediction_model = pickle.load(pred_model_handle)
+
+    X_all = data_preprocessor.transform(pd.read_csv(DATA_FILEPATH).drop(columns=["case_id", "case_status"]))
+
+    compile_start = time.perf_counter()
+    compiled_model = CompiledGradientBoosting.from_model(prediction_model)
+    print(f"Compiled {len(compiled_model.roots)} trees / {len(compiled_model.feature)} nodes "
+          f"in {(time.perf_counter() - compile_start) * 1e3:.1f} ms")
+
+    decision_match = np.array_equal(compiled_model.decision_function(X_all), prediction_model.decision_function(X_all))
+    proba_match = np.array_equal(compiled_model.predict_proba(X_all), prediction_model.predict_proba(X_all))
+    print(f"Identical decision_function : {decision_match} | identical predict_proba : {proba_match}\n")
+
+    print(f"{'batch':>7} | {'sklearn us/row':>14} | {'compiled us/row':>15} | {'sklearn rows/s':>14} | {'compiled rows/s':>15} | speedup")
+
+    for batch_size in BATCH_SIZES:
+        X_batch = X_all[:batch_size]
+
+        sklearn_seconds = time_per_call(prediction_model.predict_proba, X_batch)
+        compiled_seconds = time_per_call(compiled_model.predict_proba, X_batch)
+
+        print(f"{len(X_batch):>7} | {sklearn_seconds / len(X_batch) * 1e6:>14.2f} | {compiled_seconds / len(X_batch) * 1e6:>15.2f} | "
+              f"{len(X_batch) / sklearn_seconds:>14.0f} | {len(X_batch) / compiled_seconds:>15.0f} | "
+              f"{sklearn_seconds / compiled_seconds:.2f}x")
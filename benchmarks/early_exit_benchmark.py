@@ -0,0 +1,79 @@
+# Benchmark : early-exit scoring of CompiledGradientBoosting (USVISA_EARLY_EXIT) against the full compiled ensemble.
+# Checks that the labels are identical to predict_proba + argmax on the whole of EasyVisa.csv, reports the average number
+# of trees evaluated for several check intervals, then times both paths at batch sizes 1, 32, 1000 and the full data set.
+# Run from the project root :  python benchmarks/early_exit_benchmark.py
+
+import time
+import pickle
+import statistics
+
+import numpy as np
+import pandas as pd
+
+from us_visa.entity.config_entity import USvisaPredictorConfig
+from us_visa.entity.compiled_ensemble import CompiledGradientBoosting
+from us_visa.pipline.model_registry import get_production_pair_filepaths
+from us_visa.pipline.prediction_pipeline import USvisaData, USVISA_DATA_COLUMNS
+
+
+DATA_FILEPATH = "notebook/EasyVisa.csv"
+STAGES_PER_CHECK = [5, 10, 25, 50]
+BATCH_SIZES = [1, 32, 1000, None]    # None : the full data set
+REPEATS = 5
+
+
+def median_seconds(func, min_calls: int) -> float:
+
+    func()    # warm-up
+
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        for _ in range(min_calls):
+            func()
+        timings.append((time.perf_counter() - start) / min_calls)
+
+    return statistics.median(timings)
+
+
+if __name__ == "__main__":
+
+    predictor_config = USvisaPredictorConfig()
+
+    data_preprocessor_filepath, pred_model_filepath = get_production_pair_filepaths(predictor_config)
+
+    with open(data_preprocessor_filepath, "rb") as preprocessor_file:
+        data_preprocessor = pickle.load(preprocessor_file)
+
+    with open(pred_model_filepath, "rb") as model_file:
+        prediction_model = pickle.load(model_file)
+
+    compiled_model = CompiledGradientBoosting.from_model(prediction_model)
+
+    records = pd.read_csv(DATA_FILEPATH)[USVISA_DATA_COLUMNS].to_dict("records")
+    X_all = data_preprocessor.transform(USvisaData.get_usvisa_batch_data_frame(records=records))
+
+    # Serving labels : classes_ taken at the argmax of predict_proba
+    expected_labels = compiled_model.classes_.take(np.argmax(compiled_model.predict_proba(X_all), axis=1))
+
+    n_trees = len(compiled_model.roots)
+    print(f"{len(X_all)} applicants, {n_trees} trees\n")
+    print(f"{'stages/check':>12} | {'labels equal':>12} | {'avg trees':>9} | {'rows stopped early':>18}")
+
+    for stages_per_check in STAGES_PER_CHECK:
+        labels, n_trees_evaluated = compiled_model.predict_early_exit(X_all, stages_per_check=stages_per_check)
+
+        print(f"{stages_per_check:>12} | {str(bool(np.array_equal(labels, expected_labels))):>12} | "
+              f"{n_trees_evaluated.mean():>9.1f} | {np.mean(n_trees_evaluated < n_trees):>17.1%}")
+
+    print(f"\n{'batch':>6} | {'full us/call':>12} | {'early exit us/call':>18} | {'speed-up':>8}")
+
+    for batch_size in BATCH_SIZES:
+        X_prod = X_all if batch_size is None else X_all[:batch_size]
+        min_calls = max(1, 2000 // len(X_prod))
+
+        full_seconds = median_seconds(lambda: compiled_model.predict_proba(X_prod), min_calls)
+        early_exit_seconds = median_seconds(lambda: compiled_model.predict_early_exit(X_prod), min_calls)
+
+        print(f"{batch_size or len(X_all):>6} | {full_seconds * 1e6:>12.1f} | {early_exit_seconds * 1e6:>18.1f} | "
+              f"{full_seconds / early_exit_seconds:>7.2f}x")
@@ -0,0 +1,77 @@
+# Benchmark : cold start of the serving process (import of app.py, then first model load) and the training-only
+# dependencies it does not import, each measured in a fresh interpreter.
+# Run from the project root :  python benchmarks/import_time_benchmark.py
+
+import os
+import sys
+import json
+import statistics
+import subprocess
+
+
+N_RUNS = 5
+
+# Packages only needed by the training pipeline / S3 / MongoDB code
+TRAINING_ONLY_MODULES = ["boto3", "mypy_boto3_s3", "pymongo", "evidently", "imblearn", "neuro_mf", "dotenv"]
+
+SCENARIOS = {
+    "import app": "import app",
+    "import app + load model": "import app; app.model_predictor.get_model_handle()",
+    # Memory-mapped ProductionModel/production_model.mmap instead of the two pickles (no sklearn import)
+    "import app + load mmap": "import os; os.environ['USVISA_MODEL_ARTIFACT_FORMAT'] = 'mmap'; "
+                              "import app; app.model_predictor.get_model_handle()",
+    "import TrainPipeline": "from us_visa.pipline.training_pipeline import TrainPipeline",
+}
+
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {modules!r} if m in sys.modules]}}))
+"""
+
+
+def run_scenario(statement: str) -> dict:
+
+    """
+    Runs the statement N_RUNS times, each in a new interpreter, and returns the median time
+    and the training-only modules it loaded.
+    """
+
+    # app.py lives in the project root, us_visa in src/ (when not pip installed)
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [".", "src", env.get("PYTHONPATH")]))
+
+    # The serving path must not need the MongoDB credentials any more
+    env.pop("MONGO_PASSWORD", None)
+
+    timings, loaded = [], []
+
+    for _ in range(N_RUNS):
+        completed_process = subprocess.run([sys.executable, "-c", PROBE.format(statement=statement, modules=TRAINING_ONLY_MODULES)],
+                                           env=env, capture_output=True, text=True)
+
+        if completed_process.returncode != 0:
+            return {"error": completed_process.stderr.strip().splitlines()[-1]}
+
+        result = json.loads(completed_process.stdout.strip().splitlines()[-1])
+        timings.append(result["seconds"])
+        loaded = result["loaded"]
+
+    return {"median_seconds": statistics.median(timings), "min_seconds": min(timings), "loaded": loaded}
+
+
+if __name__ == "__main__":
+
+    print(f"{'scenario':<26} | {'median s':>8} | {'min s':>6} | training-only modules loaded")
+
+    for scenario, statement in SCENARIOS.items():
+        result = run_scenario(statement)
+
+        if "error" in result:
+            print(f"{scenario:<26} | failed : {result['error']}")
+            continue
+
+        print(f"{scenario:<26} | {result['median_seconds']:>8.3f} | {result['min_seconds']:>6.3f} | "
+              f"{', '.join(result['loaded']) or '-'}")
@@ -0,0 +1,339 @@
+# Load test : throughput and p50/p95/p99 latency of the serving routes (form, JSON, batch, bulk) under
+# closed-loop concurrency and open-loop request-rate profiles, with applicant payloads sampled from EasyVisa.csv.
+# Drives app.py in-process through httpx.ASGITransport (--target asgi), a local uvicorn started by the tool
+# (--target uvicorn) or an already running server (--url). Results are saved as JSON to compare runs.
+# Run from the project root :  python benchmarks/load_test.py --target asgi --concurrency 1 8 --rate 50
+
+import os
+import sys
+import json
+import time
+import random
+import signal
+import asyncio
+import argparse
+import platform
+import subprocess
+from datetime import datetime
+
+import httpx
+import numpy as np
+import pandas as pd
+
+
+DATA_FILEPATH = "notebook/EasyVisa.csv"
+RECORD_COLUMNS = ["continent", "education_of_employee", "has_job_experience", "requires_job_training", "no_of_employees",
+                  "yr_of_estab", "region_of_employment", "prevailing_wage", "unit_of_wage", "full_time_position"]
+
+# name -> (method, path, kind of payload, records per request)
+SCENARIOS = {
+    "form": ("POST", "/", "form", 1),
+    "json_record": ("POST", "/predict", "record", 1),
+    "json_explain": ("POST", "/predict/explain", "record", 1),
+    "json_similar": ("POST", "/predict/similar", "record", 1),
+    "what_if_200": ("POST", "/predict/what-if", "what_if", 200),
+    "json_single": ("POST", "/predict/batch", "json", 1),
+    "json_batch_100": ("POST", "/predict/batch", "json", 100),
+    "bulk_csv_1000": ("POST", "/predict/bulk?format=csv", "csv", 1000),
+}
+
+# Open-loop profiles : requests beyond this many in flight are counted as dropped instead of queued without bound
+MAX_IN_FLIGHT = 1000
+
+
+class PayloadSampler:
+
+    """
+    Builds request bodies from random EasyVisa.csv applicants.
+    """
+
+    def __init__(self, seed: int):
+
+        self.dataframe = pd.read_csv(DATA_FILEPATH)
+        self.records = self.dataframe[RECORD_COLUMNS].to_dict("records")
+        self.random = random.Random(seed)
+
+    def _sample_indices(self, n_records: int) -> list:
+
+        return [self.random.randrange(len(self.records)) for _ in range(n_records)]
+
+    def build_request(self, kind: str, n_records: int) -> dict:
+
+        """
+        Returns the httpx.request keyword arguments (data / content / json / headers) of one request.
+        """
+
+        indices = self._sample_indices(n_records)
+
+        if kind == "form":
+            record = dict(self.records[indices[0]])
+            record["company_age"] = datetime.today().year - record.pop("yr_of_estab")
+            return {"data": {key: str(value) for key, value in record.items()}}
+
+        if kind == "record":
+            return {"json": self.records[indices[0]]}
+
+        if kind == "json":
+            return {"json": {"records": [self.records[index] for index in indices]}}
+
+        if kind == "what_if":
+            # n_records applicants : the 4 wage units x n_records / 4 wages
+            return {"json": {"applicant": self.records[indices[0]],
+                             "sweeps": {"unit_of_wage": ["Hour", "Week", "Month", "Year"],
+                                        "prevailing_wage": {"start": 1000, "stop": 200000, "num": n_records // 4}}}}
+
+        # The raw data set layout (case_id, ..., case_status) the bulk route expects
+        return {"content": self.dataframe.iloc[indices].to_csv(index=False).encode(), "headers": {"Content-Type": "text/csv"}}
+
+
+def is_success(response: httpx.Response) -> bool:
+
+    # Handled errors come back as {"status": false, ...}, sometimes with a 200
+    return response.status_code == 200 and not response.content.startswith(b'{"status":false')
+
+
+async def send(client: httpx.AsyncClient, method: str, path: str, request_kwargs: dict) -> bool:
+
+    try:
+        response = await client.request(method, path, **request_kwargs)
+        return is_success(response)
+
+    except httpx.HTTPError:
+        return False
+
+
+async def run_closed_loop(client: httpx.AsyncClient, scenario: tuple, sampler: PayloadSampler,
+                          concurrency: int, duration_seconds: float) -> dict:
+
+    """
+    `concurrency` clients, each sending its next request as soon as the previous one is answered.
+    """
+
+    method, path, kind, n_records = scenario
+    latencies, n_errors = [], 0
+    deadline = time.perf_counter() + duration_seconds
+
+    async def client_loop():
+        nonlocal n_errors
+
+        while time.perf_counter() < deadline:
+            request_kwargs = sampler.build_request(kind, n_records)
+
+            start_time = time.perf_counter()
+            success = await send(client, method, path, request_kwargs)
+            latencies.append(time.perf_counter() - start_time)
+
+            n_errors += not success
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+
+    return summarize(latencies, n_errors, 0, time.perf_counter() - start_time, n_records)
+
+
+async def run_open_loop(client: httpx.AsyncClient, scenario: tuple, sampler: PayloadSampler,
+                        rate: float, duration_seconds: float) -> dict:
+
+    """
+    Requests sent on a fixed schedule of `rate` per second, whatever the response times.
+    Latency is measured from the scheduled send time, so a server falling behind is not hidden (coordinated omission).
+    """
+
+    method, path, kind, n_records = scenario
+    latencies, n_errors, n_dropped = [], 0, 0
+    in_flight = set()
+
+    async def timed_request(scheduled_time: float, request_kwargs: dict):
+        nonlocal n_errors
+
+        success = await send(client, method, path, request_kwargs)
+        latencies.append(time.perf_counter() - scheduled_time)
+
+        n_errors += not success
+
+    start_time = time.perf_counter()
+    n_requests = int(rate * duration_seconds)
+
+    for index in range(n_requests):
+        scheduled_time = start_time + index / rate
+        await asyncio.sleep(max(0.0, scheduled_time - time.perf_counter()))
+
+        if len(in_flight) >= MAX_IN_FLIGHT:
+            n_dropped += 1
+            continue
+
+        task = asyncio.create_task(timed_request(scheduled_time, sampler.build_request(kind, n_records)))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+
+    if in_flight:
+        await asyncio.wait(in_flight)
+
+    return summarize(latencies, n_errors, n_dropped, time.perf_counter() - start_time, n_records)
+
+
+def summarize(latencies: list, n_errors: int, n_dropped: int, elapsed_seconds: float, n_records: int) -> dict:
+
+    latencies_ms = np.array(latencies) * 1000
+
+    if len(latencies_ms) == 0:
+        latencies_ms = np.array([np.nan])
+
+    return {"requests": len(latencies),
+            "errors": n_errors,
+            "dropped": n_dropped,
+            "elapsed_seconds": elapsed_seconds,
+            "throughput_rps": len(latencies) / elapsed_seconds,
+            "records_per_second": len(latencies) * n_records / elapsed_seconds,
+            "latency_ms": {"p50": float(np.percentile(latencies_ms, 50)),
+                           "p95": float(np.percentile(latencies_ms, 95)),
+                           "p99": float(np.percentile(latencies_ms, 99)),
+                           "mean": float(np.mean(latencies_ms)),
+                           "max": float(np.max(latencies_ms))}}
+
+
+async def wait_until_ready(client: httpx.AsyncClient, timeout_seconds: float = 120.0) -> None:
+
+    deadline = time.perf_counter() + timeout_seconds
+
+    while time.perf_counter() < deadline:
+        try:
+            if (await client.get("/health/ready")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+
+        await asyncio.sleep(0.2)
+
+    raise TimeoutError("Server did not become ready")
+
+
+async def run_profiles(client: httpx.AsyncClient, args: argparse.Namespace) -> list:
+
+    await wait_until_ready(client)
+
+    sampler = PayloadSampler(seed=args.seed)
+    profiles = [("concurrency", value) for value in args.concurrency] + [("rate", value) for value in args.rate]
+
+    results = []
+
+    for scenario_name in args.scenarios:
+        scenario = SCENARIOS[scenario_name]
+
+        for profile_kind, profile_value in profiles:
+            # Untimed warm-up of the connection pool / prediction path for this profile
+            if args.warmup_seconds > 0:
+                await run_closed_loop(client, scenario, sampler, int(profile_value) if profile_kind == "concurrency" else 1,
+                                      args.warmup_seconds)
+
+            if profile_kind == "concurrency":
+                result = await run_closed_loop(client, scenario, sampler, int(profile_value), args.duration)
+            else:
+                result = await run_open_loop(client, scenario, sampler, float(profile_value), args.duration)
+
+            result = {"scenario": scenario_name, "route": f"{scenario[0]} {scenario[1]}", "records_per_request": scenario[3],
+                      "profile": {"kind": profile_kind, "value": profile_value}, **result}
+            results.append(result)
+
+            latency = result["latency_ms"]
+            print(f"{scenario_name:<15} | {profile_kind:>11} {profile_value:>6g} | {result['throughput_rps']:>8.1f} | "
+                  f"{latency['p50']:>8.2f} | {latency['p95']:>8.2f} | {latency['p99']:>8.2f} | "
+                  f"{result['errors']:>6} | {result['dropped']:>7}")
+
+    return results
+
+
+async def run_in_process(args: argparse.Namespace) -> list:
+
+    # app.py lives in the project root
+    sys.path.insert(0, os.getcwd())
+    import app
+
+    # ASGITransport does not send lifespan events : run the startup (executor, warm-up) ourselves
+    async with app.app.router.lifespan_context(app.app):
+        transport = httpx.ASGITransport(app=app.app)
+
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=args.timeout) as client:
+            return await run_profiles(client, args)
+
+
+async def run_against_url(url: str, args: argparse.Namespace) -> list:
+
+    limits = httpx.Limits(max_connections=max(args.concurrency + [MAX_IN_FLIGHT]))
+
+    async with httpx.AsyncClient(base_url=url, timeout=args.timeout, limits=limits) as client:
+        return await run_profiles(client, args)
+
+
+def get_git_commit() -> str:
+
+    completed_process = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True)
+    return completed_process.stdout.strip() or "unknown"
+
+
+def parse_args() -> argparse.Namespace:
+
+    parser = argparse.ArgumentParser(description="Load test of the US visa serving routes")
+
+    parser.add_argument("--target", choices=["asgi", "uvicorn"], default="asgi",
+                        help="asgi : app.py in this process, uvicorn : app.py started on --port (ignored with --url)")
+    parser.add_argument("--url", default=None, help="Base URL of an already running server")
+    parser.add_argument("--port", type=int, default=8096, help="Port of the uvicorn started by --target uvicorn")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--concurrency", nargs="*", type=int, default=[1, 8], help="Closed-loop client counts")
+    parser.add_argument("--rate", nargs="*", type=float, default=[], help="Open-loop request rates (requests per second)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per (scenario, profile)")
+    parser.add_argument("--warmup-seconds", type=float, default=1.0, help="Untimed seconds before every (scenario, profile)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the payload sampling")
+    parser.add_argument("--output", default=None, help="JSON results file (default : load_test_<target>_<time>.json)")
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+
+    args = parse_args()
+    target = "url" if args.url else args.target
+    started_at = datetime.now()
+
+    print(f"{'scenario':<15} | {'profile':>18} | {'req/s':>8} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | "
+          f"{'errors':>6} | {'dropped':>7}")
+
+    server_process = None
+
+    try:
+        if args.url:
+            results = asyncio.run(run_against_url(args.url, args))
+
+        elif args.target == "uvicorn":
+            env = dict(os.environ, USVISA_APP_PORT=str(args.port),
+                       PYTHONPATH=os.pathsep.join(filter(None, [".", "src", os.environ.get("PYTHONPATH")])))
+
+            server_process = subprocess.Popen([sys.executable, "app.py"], env=env,
+                                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+            results = asyncio.run(run_against_url(f"http://127.0.0.1:{args.port}", args))
+
+        else:
+            results = asyncio.run(run_in_process(args))
+
+    finally:
+        if server_process is not None:
+            server_process.send_signal(signal.SIGTERM)
+            server_process.wait(timeout=60)
+
+    output_filepath = args.output or f"load_test_{target}_{started_at.strftime('%Y%m%d_%H%M%S')}.json"
+
+    with open(output_filepath, "w") as output_file:
+        json.dump({"run": {"started_at": started_at.isoformat(timespec="seconds"),
+                           "git_commit": get_git_commit(),
+                           "target": target,
+                           "url": args.url,
+                           "cpu_count": os.cpu_count(),
+                           "python": platform.python_version(),
+                           "serving_env": {key: value for key, value in os.environ.items() if key.startswith("USVISA_")},
+                           "arguments": vars(args)},
+                   "results": results}, output_file, indent=2)
+
+    print(f"\nResults saved to {output_filepath}")
@@ -0,0 +1,142 @@
+# Benchmark : preforked serving (USVISA_SERVING_WORKERS) - memory per worker and aggregate throughput as workers scale.
+# Starts app.py once per worker count, loads it with POST /predict/batch (1 applicant of EasyVisa.csv per request)
+# from CLIENTS client processes, then reads /proc/<pid>/smaps_rollup of every worker (Linux only).
+# Every worker count serves the memory-mapped artifact (the prefork default) : run again with
+# USVISA_MODEL_ARTIFACT_FORMAT=pickle to compare with the private memory of the sklearn objects.
+# Run from the project root :  python benchmarks/prefork_benchmark.py
+
+import os
+import sys
+import csv
+import json
+import time
+import signal
+import subprocess
+import http.client
+import multiprocessing
+
+
+DATA_FILEPATH = "notebook/EasyVisa.csv"
+WORKER_COUNTS = [1, 2, 4]
+CLIENTS = 8
+DURATION_SECONDS = 10.0
+PORT = 8097
+MODEL_ARTIFACT_FORMAT = os.getenv("USVISA_MODEL_ARTIFACT_FORMAT", "mmap")
+
+RECORD_COLUMNS = ["continent", "education_of_employee", "has_job_experience", "requires_job_training", "no_of_employees",
+                  "yr_of_estab", "region_of_employment", "prevailing_wage", "unit_of_wage", "full_time_position"]
+
+
+def load_records() -> list:
+
+    with open(DATA_FILEPATH, newline="") as data_file:
+        return [{column: row[column] for column in RECORD_COLUMNS} for row in csv.DictReader(data_file)]
+
+
+def run_client(client_index: int, records: list, duration_seconds: float) -> int:
+
+    """
+    Sends requests on one keep-alive connection for duration_seconds, returns the number of successful requests.
+    Every client walks a different part of the data set, so the prediction cache does not answer everything.
+    """
+
+    connection = http.client.HTTPConnection("127.0.0.1", PORT)
+    headers = {"Content-Type": "application/json"}
+
+    n_requests = 0
+    index = client_index * (len(records) // CLIENTS)
+    deadline = time.perf_counter() + duration_seconds
+
+    while time.perf_counter() < deadline:
+        connection.request("POST", "/predict/batch", body=json.dumps({"records": [records[index % len(records)]]}), headers=headers)
+        response = connection.getresponse()
+
+        if json.loads(response.read()).get("status"):
+            n_requests += 1
+
+        index += 1
+
+    connection.close()
+
+    return n_requests
+
+
+def wait_until_ready(n_workers: int, timeout_seconds: float = 120.0) -> None:
+
+    # Connections land on any worker : wait until several probes in a row report ready
+    deadline = time.perf_counter() + timeout_seconds
+    consecutive_ready = 0
+
+    while consecutive_ready < 4 * n_workers:
+        if time.perf_counter() > deadline:
+            raise TimeoutError("Server did not become ready")
+
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", PORT, timeout=2)
+            connection.request("GET", "/health/ready")
+            consecutive_ready = consecutive_ready + 1 if connection.getresponse().status == 200 else 0
+            connection.close()
+
+        except OSError:
+            consecutive_ready = 0
+            time.sleep(0.2)
+
+
+def read_memory_kb(pid: int) -> dict:
+
+    memory = {}
+
+    with open(f"/proc/{pid}/smaps_rollup") as smaps_file:
+        for line in smaps_file:
+            fields = line.split()
+            if len(fields) == 3 and fields[2] == "kB":
+                memory[fields[0].rstrip(":")] = int(fields[1])
+
+    return memory
+
+
+def get_worker_pids(server_pid: int, n_workers: int) -> list:
+
+    if n_workers == 1:
+        return [server_pid]
+
+    with open(f"/proc/{server_pid}/task/{server_pid}/children") as children_file:
+        return [int(pid) for pid in children_file.read().split()]
+
+
+if __name__ == "__main__":
+
+    records = load_records()
+
+    print(f"{CLIENTS} clients, {DURATION_SECONDS:.0f} s per run, {os.cpu_count()} CPUs, {MODEL_ARTIFACT_FORMAT} model artifact\n")
+    print(f"{'workers':>7} | {'req/s':>8} | {'RSS/worker MB':>13} | {'USS/worker MB':>13} | {'total PSS MB':>12}")
+
+    for n_workers in WORKER_COUNTS:
+        env = dict(os.environ, USVISA_SERVING_WORKERS=str(n_workers), USVISA_APP_PORT=str(PORT),
+                   USVISA_MODEL_ARTIFACT_FORMAT=MODEL_ARTIFACT_FORMAT,
+                   PYTHONPATH=os.pathsep.join(filter(None, [".", "src", os.environ.get("PYTHONPATH")])))
+
+        server_process = subprocess.Popen([sys.executable, "app.py"], env=env,
+                                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        try:
+            wait_until_ready(n_workers)
+
+            with multiprocessing.Pool(CLIENTS) as client_pool:
+                counts = client_pool.starmap(run_client, [(client_index, records, DURATION_SECONDS) for client_index in range(CLIENTS)])
+
+            memories = [read_memory_kb(pid) for pid in get_worker_pids(server_process.pid, n_workers)]
+
+            rss_mb = sum(memory["Rss"] for memory in memories) / len(memories) / 1024
+            uss_mb = sum(memory["Private_Clean"] + memory["Private_Dirty"] for memory in memories) / len(memories) / 1024
+
+            # Total proportional set size of the server, the preforking parent included
+            pss_mb = sum(memory["Pss"] for memory in memories) / 1024
+            if n_workers > 1:
+                pss_mb += read_memory_kb(server_process.pid)["Pss"] / 1024
+
+            print(f"{n_workers:>7} | {sum(counts) / DURATION_SECONDS:>8.0f} | {rss_mb:>13.1f} | {uss_mb:>13.1f} | {pss_mb:>12.1f}")
+
+        finally:
+            server_process.send_signal(signal.SIGTERM)
+            server_process.wait(timeout=60)
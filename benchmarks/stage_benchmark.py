@@ -0,0 +1,225 @@
+# Benchmark : cost of every preprocessing / inference step in isolation (USvisaData construction, DataFrame creation,
+# ColumnTransformer.transform, predict, predict_proba and their compiled counterparts, TreeSHAP explanations up to 32 rows)
+# at batch sizes 1, 32, 1k and 100k, plus the load time of the artifacts in ProductionModel/ and data_transformer_object/.
+# --save-baseline stores the timings of this machine, later runs flag steps slower than the baseline by more than --tolerance.
+# Run from the project root :  python benchmarks/stage_benchmark.py [--save-baseline]
+
+import os
+import sys
+import json
+import time
+import pickle
+import argparse
+import platform
+import statistics
+from datetime import datetime
+from typing import Callable, Optional
+
+import dill
+import numpy as np
+import pandas as pd
+import sklearn
+
+from us_visa.entity.config_entity import USvisaPredictorConfig
+from us_visa.entity.compiled_encoder import CompiledEncoder
+from us_visa.entity.compiled_ensemble import CompiledGradientBoosting
+from us_visa.entity.mmap_artifact import MmapModelArtifact
+from us_visa.entity.tree_explainer import CompiledTreeExplainer
+from us_visa.pipline.model_registry import get_production_pair_filepaths
+from us_visa.pipline.prediction_pipeline import USvisaData, USVISA_DATA_COLUMNS
+
+
+DATA_FILEPATH = "notebook/EasyVisa.csv"
+BATCH_SIZES = [1, 32, 1000, 100000]
+TREE_SHAP_MAX_BATCH_SIZE = 32      # ~10 ms per row
+DEFAULT_BASELINE_FILEPATH = os.path.join("benchmarks", "baselines", "stage_benchmark.json")
+
+
+def load_file(filepath: str, loader: Callable) -> object:
+
+    with open(filepath, "rb") as file:
+        return loader(file)
+
+
+def seconds_per_call(func: Callable[[], object], min_seconds: float, repeats: int) -> float:
+
+    """
+    Median over `repeats` rounds of the average seconds per func() call, each round lasting at least min_seconds.
+    """
+
+    func()    # warm-up
+
+    round_timings = []
+
+    for _ in range(repeats):
+        n_calls = 0
+        start = time.perf_counter()
+
+        while True:
+            func()
+            n_calls += 1
+
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_seconds / repeats:
+                round_timings.append(elapsed / n_calls)
+                break
+
+    return statistics.median(round_timings)
+
+
+def get_machine_info() -> dict:
+
+    return {"platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "sklearn": sklearn.__version__}
+
+
+def build_steps(batch_sizes: list) -> dict:
+
+    """
+    Returns {(step, batch size or None) : callable}. Batch-independent steps (artifact loading) have batch size None.
+    """
+
+    predictor_config = USvisaPredictorConfig()
+
+    data_preprocessor_filepath, pred_model_filepath = get_production_pair_filepaths(predictor_config)
+
+    data_preprocessor = load_file(data_preprocessor_filepath, pickle.load)
+    prediction_model = load_file(pred_model_filepath, pickle.load)
+
+    compiled_encoder = CompiledEncoder.from_preprocessor(data_preprocessor)
+    compiled_model = CompiledGradientBoosting.from_model(prediction_model)
+    tree_explainer = CompiledTreeExplainer.from_model(compiled_model)
+
+    steps = {("pickle_load_preprocessor", None): lambda: load_file(data_preprocessor_filepath, pickle.load),
+             ("pickle_load_model", None): lambda: load_file(pred_model_filepath, pickle.load),
+             ("dill_load_preprocessor", None): lambda: load_file(data_preprocessor_filepath, dill.load),
+             ("dill_load_model", None): lambda: load_file(pred_model_filepath, dill.load)}
+
+    if os.path.exists(predictor_config.mmap_artifact_filepath_local):
+        steps[("mmap_artifact_load", None)] = lambda: MmapModelArtifact.load(predictor_config.mmap_artifact_filepath_local)
+
+    steps[("tree_shap_build", None)] = lambda: CompiledTreeExplainer.from_model(compiled_model)
+
+    # Applicants of the data set, repeated up to the largest batch size
+    data_records = pd.read_csv(DATA_FILEPATH)[USVISA_DATA_COLUMNS].to_dict("records")
+
+    for batch_size in batch_sizes:
+        records = [data_records[index % len(data_records)] for index in range(batch_size)]
+
+        dataframe = USvisaData.get_usvisa_batch_data_frame(records=records)
+        X_prod = data_preprocessor.transform(dataframe)
+
+        # Default arguments bind the data of this batch size
+        steps.update({
+            ("usvisa_data", batch_size): lambda records=records: [USvisaData(**record).get_usvisa_data_as_record() for record in records],
+            ("dataframe", batch_size): lambda records=records: USvisaData.get_usvisa_batch_data_frame(records=records),
+            ("transform", batch_size): lambda dataframe=dataframe: data_preprocessor.transform(dataframe),
+            ("compiled_transform", batch_size): lambda dataframe=dataframe: compiled_encoder.transform(dataframe),
+            ("predict", batch_size): lambda X_prod=X_prod: prediction_model.predict(X_prod),
+            ("predict_proba", batch_size): lambda X_prod=X_prod: prediction_model.predict_proba(X_prod),
+            ("compiled_predict_proba", batch_size): lambda X_prod=X_prod: compiled_model.predict_proba(X_prod),
+        })
+
+        if batch_size <= TREE_SHAP_MAX_BATCH_SIZE:
+            steps[("tree_shap", batch_size)] = lambda X_prod=X_prod: tree_explainer.shap_values(X_prod)
+
+        if batch_size == 1:
+            steps[("compiled_encode_record", 1)] = lambda record=records[0]: compiled_encoder.encode_record(record)
+
+    return steps
+
+
+def get_step_key(step: str, batch_size: Optional[int]) -> str:
+
+    return step if batch_size is None else f"{step}@{batch_size}"
+
+
+def parse_args() -> argparse.Namespace:
+
+    parser = argparse.ArgumentParser(description="Micro-benchmarks of the preprocessing and inference steps")
+
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=BATCH_SIZES)
+    parser.add_argument("--steps", nargs="+", default=None, help="Only these steps (default : all)")
+    parser.add_argument("--min-seconds", type=float, default=1.0, help="Minimum measured seconds per (step, batch size)")
+    parser.add_argument("--repeats", type=int, default=5, help="Rounds per (step, batch size), the median is reported")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_FILEPATH, help="Baseline JSON file of this machine")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Relative slowdown against the baseline reported as a regression (0.25 : 25 %% slower)")
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+
+    args = parse_args()
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+
+        if baseline["machine"] != get_machine_info():
+            print(f"Warning : the baseline was recorded on another machine / library versions : {baseline['machine']}\n")
+
+    steps = build_steps(args.batch_sizes)
+
+    print(f"{'step':<26} | {'batch':>6} | {'us/call':>12} | {'us/row':>9} | {'baseline us':>12} | {'change':>7}")
+
+    timings, regressions = {}, []
+
+    for (step, batch_size), func in steps.items():
+        if args.steps is not None and step not in args.steps:
+            continue
+
+        key = get_step_key(step, batch_size)
+        seconds = seconds_per_call(func, min_seconds=args.min_seconds, repeats=args.repeats)
+        timings[key] = seconds
+
+        baseline_seconds = baseline["timings"].get(key) if baseline is not None else None
+
+        change, flag = "", ""
+        if baseline_seconds:
+            ratio = seconds / baseline_seconds
+            change = f"{(ratio - 1) * 100:+.0f}%"
+
+            if ratio > 1 + args.tolerance:
+                regressions.append((key, ratio))
+                flag = "  REGRESSION"
+
+        print(f"{step:<26} | {batch_size or '-':>6} | {seconds * 1e6:>12.1f} | "
+              f"{(f'{seconds / batch_size * 1e6:.2f}' if batch_size else '-'):>9} | "
+              f"{(f'{baseline_seconds * 1e6:.1f}' if baseline_seconds else '-'):>12} | {change:>7}{flag}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+
+        # A run restricted with --steps / --batch-sizes only replaces the timings it measured
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as baseline_file:
+                timings = {**json.load(baseline_file)["timings"], **timings}
+
+        with open(args.baseline, "w") as baseline_file:
+            json.dump({"recorded_at": datetime.now().isoformat(timespec="seconds"),
+                       "machine": get_machine_info(),
+                       "timings": timings}, baseline_file, indent=2)
+
+        print(f"\nBaseline saved to {args.baseline}")
+
+    elif baseline is None:
+        print(f"\nNo baseline at {args.baseline} : run with --save-baseline to record one")
+
+    elif regressions:
+        print(f"\n{len(regressions)} step(s) slower than the baseline by more than {args.tolerance:.0%} :")
+        for key, ratio in regressions:
+            print(f"  {key} : {ratio:.2f}x")
+
+        sys.exit(1)
+
+    else:
+        print(f"\nNo regression beyond {args.tolerance:.0%} of the baseline")
@@ -5,8 +5,8 @@
 # #from us_visa.constants import MONGODB_URL_KEY
 # #print(os.getenv(MONGODB_URL_KEY))
 
-# from us_visa.constants import MONGODB_URI_KEY
-# print(MONGODB_URI_KEY)
+# from us_visa.configuration.settings import settings
+# print(settings.mongodb_uri)
 
 from us_visa.utils.main_utils import read_yaml_file, write_yaml_file
 from us_visa.constants import SCHEMA_FILEPATH
@@ -0,0 +1,20 @@
+# Promotion of the candidate model staged by a training run with USVISA_STAGE_AS_CANDIDATE=1 (see /predict/shadow-stats
+# for its agreement with production). Uploads the model to the s3 bucket, copies the candidate pair over the production
+# pair and publishes the memory-mappable artifact and the case index of the new model version.
+#
+#   python promote_candidate.py
+#   python promote_candidate.py --candidate-dir CandidateModel
+
+import argparse
+
+from us_visa.constants import LOCAL_CANDIDATE_MODEL_DIR
+from us_visa.pipline.model_promotion import promote_candidate
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Promote the staged candidate model to production")
+    parser.add_argument("--candidate-dir", default=str(LOCAL_CANDIDATE_MODEL_DIR), help="directory of the staged candidate pair")
+    args = parser.parse_args()
+
+    print(promote_candidate(candidate_model_dir=args.candidate_dir))
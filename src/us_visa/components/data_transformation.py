@@ -1,6 +1,4 @@
 import sys,os
-from pathlib import Path
-import pickle
 
 import numpy as np
 import pandas as pd
@@ -228,16 +226,8 @@ class DataTransformation:
                     transformed_test_filepath=self.data_transformation_config.transformed_test_filepath
                 )
                 
-                # Saving the data Preprocessor object for prediction pipeline
-                data_preprocessor_object_filepath = os.path.join(DATA_TRANSFORMATION_TRANSFORMED_OBJECT_DIR,
-                                                                 DATA_TRANSFORMATION_OBJECT_FILENAME)
-                
-                os.makedirs(Path(os.path.dirname(data_preprocessor_object_filepath)), exist_ok=True)
-                with open(Path(data_preprocessor_object_filepath), "wb") as data_preprocessor_handle:
-                    pickle.dump(obj=preprocessor, file=data_preprocessor_handle)
-                    
-                print(f"Data Preprocessor successfully saved to {data_preprocessor_object_filepath}")
-                    
+                # The preprocessor is served only together with its model : the model pusher publishes it from
+                # transformed_object_filepath once the trained model is accepted
                 
                 return data_transformation_artifact
             
@@ -1,29 +1,54 @@
-import sys
+import os, sys
+import pickle
+import shutil
+from pathlib import Path
+from typing import Optional
 
+import pandas as pd
+
+from us_visa.constants import DATA_TRANSFORMATION_OBJECT_FILENAME, S3_PRODUCTION_MODEL_NAME
 from us_visa.exception import USvisaException
 from us_visa.logger import logging
 
-from us_visa.entity.artifact_entity import ModelPusherArtifact, ModelEvaluationArtifact
+from us_visa.entity.artifact_entity import ModelPusherArtifact, ModelEvaluationArtifact, DataIngestionArtifact
 from us_visa.entity.config_entity import ModelPusherConfig
 
 from us_visa.cloud_storage.aws_storage import SimpleStorageService
 from us_visa.entity.s3_estimator import USvisaEstimator
+from us_visa.entity.compiled_encoder import CompiledEncoder
+from us_visa.entity.compiled_ensemble import CompiledGradientBoosting
+from us_visa.entity.mmap_artifact import MmapModelArtifact
+from us_visa.entity.case_index import CaseIndex
+from us_visa.entity.production_manifest import ProductionModelManifest
+from us_visa.utils.main_utils import load_object, get_bytes_version, copy_file_atomic, write_bytes_atomic
 
 
 class ModelPusher:
     
     def __init__(self, model_evaluation_artifact: ModelEvaluationArtifact,
-                 model_pusher_config: ModelPusherConfig):
+                 model_pusher_config: ModelPusherConfig,
+                 data_preprocessor_filepath: str,
+                 data_ingestion_artifact: Optional[DataIngestionArtifact] = None):
         
         """
         :param model_evaluation_artifact: Output reference of data evaluation artifact stage
         :param model_pusher_config: Configuration for model pusher
+        :param data_preprocessor_filepath: Data preprocessor paired with the trained model (data transformation artifact
+                                           or staged candidate), saved as production preprocessor together with the model
+        :param data_ingestion_artifact: Output reference of data ingestion artifact stage (historical applications of the case index)
         """
         
         self.s3 = SimpleStorageService()
         
         self.model_evaluation_artifact = model_evaluation_artifact
         self.model_pusher_config = model_pusher_config
+        self.data_ingestion_artifact = data_ingestion_artifact
+        self.data_preprocessor_filepath = data_preprocessor_filepath
+        
+        # Published pair, set by save_production_model
+        self.data_preprocessor_filepath_local: Optional[Path] = None
+        self.pred_model_filepath_local: Optional[Path] = None
+        self.model_version: Optional[str] = None
         
         #self.usvisa_estimator = USvisaEstimator(bucket_name=model_pusher_config.bucket_name,
         #                                        s3_prod_model_path=model_pusher_config.s3_model_key_path)
@@ -35,6 +60,169 @@ class ModelPusher:
         #s3_prod_model_path=self.model_eval_config.s3_prod_model_key_path          
 
 
+    def save_production_model(self) -> str:
+        
+        """
+        Method Name :   save_production_model
+        Description :   This function saves the data preprocessor (plain pickle, the transformation artifact is written
+                        with dill) and the trained model to a new directory of the production versions, then replaces
+                        the production manifest to point at them. The pair is published by this single rename :
+                        a serving process never loads the preprocessor of one version with the model of another.
+                        The oldest version directories are removed afterwards
+        
+        Output      :   Returns the model version (sha256 of the pair, as computed by the serving registry)
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        
+        try:
+            data_preprocessor_bytes = pickle.dumps(load_object(filepath=self.data_preprocessor_filepath))
+            
+            with open(self.model_evaluation_artifact.trained_model_path, "rb") as trained_model_handle:
+                pred_model_bytes = trained_model_handle.read()
+            
+            model_version = get_bytes_version([data_preprocessor_bytes, pred_model_bytes])
+            
+            manifest_filepath = Path(self.model_pusher_config.production_manifest_filepath_local)
+            version_dir = Path(self.model_pusher_config.production_versions_dir_local) / model_version
+            
+            data_preprocessor_filepath_local = version_dir / DATA_TRANSFORMATION_OBJECT_FILENAME
+            pred_model_filepath_local = version_dir / S3_PRODUCTION_MODEL_NAME
+            
+            write_bytes_atomic(filepath=str(data_preprocessor_filepath_local), content=data_preprocessor_bytes)
+            copy_file_atomic(from_filepath=self.model_evaluation_artifact.trained_model_path,
+                             to_filepath=str(pred_model_filepath_local))
+            
+            production_manifest = ProductionModelManifest(
+                                        model_version=model_version,
+                                        data_preprocessor_filepath=os.path.relpath(data_preprocessor_filepath_local, manifest_filepath.parent),
+                                        pred_model_filepath=os.path.relpath(pred_model_filepath_local, manifest_filepath.parent))
+            production_manifest.save(manifest_filepath)
+            
+            self.data_preprocessor_filepath_local = data_preprocessor_filepath_local
+            self.pred_model_filepath_local = pred_model_filepath_local
+            self.model_version = model_version
+            
+            logging.info(f"Saved the trained model as production model version {model_version} to {version_dir}")
+            
+            self.remove_old_versions()
+            
+            return model_version
+        
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+
+    def remove_old_versions(self) -> None:
+        
+        """
+        Method Name :   remove_old_versions
+        Description :   This function keeps the keep_versions most recent production version directories (and always
+                        the published one). Older ones are no longer referenced by the manifest; a few are kept for
+                        serving processes that read the previous manifest just before it was replaced
+        
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        
+        try:
+            version_dirs = sorted((path for path in Path(self.model_pusher_config.production_versions_dir_local).iterdir()
+                                   if path.is_dir() and path.name != self.model_version),
+                                  key=lambda path: path.stat().st_mtime_ns, reverse=True)
+            
+            for version_dir in version_dirs[max(self.model_pusher_config.keep_versions - 1, 0):]:
+                shutil.rmtree(version_dir, ignore_errors=True)
+                logging.info(f"Removed the old production model version {version_dir.name}")
+        
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+
+    def publish_mmap_artifact(self) -> Optional[str]:
+        
+        """
+        Method Name :   publish_mmap_artifact
+        Description :   This function writes the memory-mappable artifact (compiled encoder + flattened trees)
+                        of the data preprocessor and trained model to the local production model directory,
+                        then uploads it to the s3 bucket next to the pickle
+        
+        Output      :   Returns the s3 key of the artifact, None if the model cannot be compiled
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        
+        try:
+            compiled_encoder = CompiledEncoder.from_preprocessor(load_object(filepath=self.data_preprocessor_filepath_local))
+            compiled_model = CompiledGradientBoosting.from_model(load_object(filepath=self.pred_model_filepath_local))
+            
+            if compiled_encoder is None or compiled_model is None:
+                logging.warning("Data preprocessor or trained model cannot be compiled, memory-mappable artifact not published")
+                return None
+            
+            # Same version as the serving registry computes over the pickles, whichever format it loads
+            model_version = self.model_version
+            
+            mmap_artifact = MmapModelArtifact(compiled_encoder=compiled_encoder,
+                                              compiled_model=compiled_model,
+                                              model_version=model_version)
+            mmap_artifact.save(self.model_pusher_config.mmap_artifact_filepath_local)
+            
+            self.s3.upload_file(from_filename=str(self.model_pusher_config.mmap_artifact_filepath_local),
+                                bucket_name=self.model_pusher_config.bucket_name,
+                                s3_key=self.model_pusher_config.s3_mmap_artifact_key_path,
+                                remove=False)
+            
+            logging.info(f"Published memory-mappable artifact of model version {model_version} "
+                         f"to {self.model_pusher_config.s3_mmap_artifact_key_path}")
+            
+            return self.model_pusher_config.s3_mmap_artifact_key_path
+        
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+
+    def publish_case_index(self) -> Optional[str]:
+        
+        """
+        Method Name :   publish_case_index
+        Description :   This function builds the nearest-neighbour index of the historical applications (train + test
+                        files of the data ingestion) encoded with the data preprocessor, writes it to the local
+                        production model directory, then uploads it to the s3 bucket next to the model
+        
+        Output      :   Returns the s3 key of the index, None if there is no data or the preprocessor cannot be compiled
+        On Failure  :   Write an exception log and then raise an exception
+        """
+        
+        try:
+            if self.data_ingestion_artifact is None:
+                logging.warning("No data ingestion artifact, case index not published")
+                return None
+            
+            compiled_encoder = CompiledEncoder.from_preprocessor(load_object(filepath=self.data_preprocessor_filepath_local))
+            
+            if compiled_encoder is None:
+                logging.warning("Data preprocessor cannot be compiled, case index not published")
+                return None
+            
+            # Same version as the serving registry computes over the pickles : the index is only served with this model
+            model_version = self.model_version
+            
+            dataframe = pd.concat([pd.read_csv(self.data_ingestion_artifact.trained_filepath),
+                                   pd.read_csv(self.data_ingestion_artifact.test_filepath)], ignore_index=True)
+            
+            case_index = CaseIndex.build(dataframe=dataframe, compiled_encoder=compiled_encoder, model_version=model_version)
+            case_index.save(self.model_pusher_config.case_index_filepath_local)
+            
+            self.s3.upload_file(from_filename=str(self.model_pusher_config.case_index_filepath_local),
+                                bucket_name=self.model_pusher_config.bucket_name,
+                                s3_key=self.model_pusher_config.s3_case_index_key_path,
+                                remove=False)
+            
+            logging.info(f"Published case index of model version {model_version} to {self.model_pusher_config.s3_case_index_key_path}")
+            
+            return self.model_pusher_config.s3_case_index_key_path
+        
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+
     def initiate_model_pusher(self) -> ModelPusherArtifact:
         
         """
@@ -53,10 +241,24 @@ class ModelPusher:
             self.usvisa_estimator.upload_model_to_s3(from_filepath=self.model_evaluation_artifact.trained_model_path,
                                                      remove=False
                                                      )
+            
+            # The derived artifacts are published after the production pickle they are derived from : a serving
+            # process never finds an artifact of a model version whose pickle is not in place yet
+            self.save_production_model()
+            
+            s3_mmap_artifact_path = None
+            if self.model_pusher_config.publish_mmap_artifact:
+                s3_mmap_artifact_path = self.publish_mmap_artifact()
+            
+            s3_case_index_path = None
+            if self.model_pusher_config.publish_case_index:
+                s3_case_index_path = self.publish_case_index()
 
 
             model_pusher_artifact = ModelPusherArtifact(bucket_name=self.model_pusher_config.bucket_name,
-                                                        s3_model_path=self.model_pusher_config.s3_model_key_path)
+                                                        s3_model_path=self.model_pusher_config.s3_model_key_path,
+                                                        s3_mmap_artifact_path=s3_mmap_artifact_path,
+                                                        s3_case_index_path=s3_case_index_path)
 
             logging.info("Uploaded artifacts folder to s3 bucket")
             logging.info(f"Model pusher artifact: [{model_pusher_artifact}]")
@@ -2,6 +2,7 @@
 import boto3
 import os
 from us_visa.constants import AWS_SECRET_ACCESS_KEY_ENV_KEY, AWS_ACCESS_KEY_ID_ENV_KEY, REGION_NAME
+from us_visa.configuration.settings import settings
 
 
 class S3Client:
@@ -19,8 +20,8 @@ class S3Client:
 
         if S3Client.s3_resource==None or S3Client.s3_client==None:
             
-            __access_key_id=os.getenv(AWS_ACCESS_KEY_ID_ENV_KEY)
-            __secret_access_key=os.getenv(AWS_SECRET_ACCESS_KEY_ENV_KEY)
+            __access_key_id=settings.aws_access_key_id
+            __secret_access_key=settings.aws_secret_access_key
             
             if __access_key_id is None:
                 raise Exception(f"Environment variable: {AWS_ACCESS_KEY_ID_ENV_KEY} is not not set.")
@@ -2,7 +2,8 @@ import sys, os, pymongo, certifi
 from us_visa.exception import USvisaException
 from us_visa.logger import logging
 #from us_visa.constants import DATABASE_NAME, MONGODB_URL_KEY
-from us_visa.constants import DATABASE_NAME, MONGODB_URI_KEY
+from us_visa.constants import DATABASE_NAME
+from us_visa.configuration.settings import settings
 ca=certifi.where()
 
 
@@ -21,12 +22,8 @@ class MongoDBClient:
             if MongoDBClient.client is None:
                 # connection string to connect with our database
                 #mongodb_url=os.getenv(MONGODB_URL_KEY)
-                mongodb_uri=MONGODB_URI_KEY
-                
-                #if mongodb_url is None:
-                if mongodb_uri is None:
-                    #raise Exception(f"Environment Key : {MONGODB_URL_KEY} is not set.")
-                    raise Exception(f"Environment Key : {MONGODB_URI_KEY} is not set.")
+                # built from MONGO_USERNAME / MONGO_PASSWORD, raises if they are not set
+                mongodb_uri=settings.mongodb_uri
                 
                 # setting the global variable value
                 # tlsCAFile: A file containing a single or a bundle of “certification authority” certificates, which are used to validate certificates passed from the other end of the connection.
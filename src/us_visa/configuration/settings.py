@@ -0,0 +1,77 @@
+import os
+import threading
+from typing import Optional
+from urllib.parse import quote_plus
+
+from us_visa.constants import (MONGO_USERNAME_ENV_KEY, MONGO_PASSWORD_ENV_KEY, MONGODB_URI_TEMPLATE,
+                               AWS_ACCESS_KEY_ID_ENV_KEY, AWS_SECRET_ACCESS_KEY_ENV_KEY)
+
+
+
+class Settings:
+
+    """
+    Environment-derived settings (credentials and connection strings), resolved on first access.
+    The .env file is loaded at that moment, not at import time, so a serving process that only predicts
+    never needs the MongoDB or AWS variables to be set.
+    """
+
+    def __init__(self):
+
+        self._dotenv_loaded = False
+        self._lock = threading.Lock()
+
+
+    def _load_dotenv(self) -> None:
+
+        if self._dotenv_loaded:
+            return
+
+        with self._lock:
+            if not self._dotenv_loaded:
+                from dotenv import load_dotenv
+
+                # Load environment variables from .env file (already exported variables win)
+                load_dotenv()
+                self._dotenv_loaded = True
+
+
+    def get_env(self, key: str, default: Optional[str] = None) -> Optional[str]:
+
+        """
+        This method returns an environment variable, after loading the .env file on first call.
+        """
+
+        self._load_dotenv()
+
+        return os.getenv(key, default)
+
+
+    @property
+    def mongodb_uri(self) -> str:
+
+        username = self.get_env(MONGO_USERNAME_ENV_KEY)
+        password = self.get_env(MONGO_PASSWORD_ENV_KEY)
+
+        if password is None:
+            raise Exception(f"Environment variable: {MONGO_PASSWORD_ENV_KEY} is not set.")
+
+        # safely encode special characters
+        return MONGODB_URI_TEMPLATE.format(username=username, password=quote_plus(password))
+
+
+    @property
+    def aws_access_key_id(self) -> Optional[str]:
+
+        return self.get_env(AWS_ACCESS_KEY_ID_ENV_KEY)
+
+
+    @property
+    def aws_secret_access_key(self) -> Optional[str]:
+
+        return self.get_env(AWS_SECRET_ACCESS_KEY_ENV_KEY)
+
+
+
+# Global variable : settings of this process
+settings = Settings()
@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import Optional
 
 
 @dataclass
@@ -53,6 +54,8 @@ class ModelEvaluationArtifact:
 class ModelPusherArtifact:
     bucket_name:str
     s3_model_path:str
+    s3_mmap_artifact_path:Optional[str] = None
+    s3_case_index_path:Optional[str] = None
 
 
 
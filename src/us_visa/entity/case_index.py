@@ -0,0 +1,260 @@
+import sys
+import time
+from pathlib import Path
+from typing import List, Tuple, Union
+
+import numpy as np
+from pandas import DataFrame
+
+from us_visa.constants import TARGET_COLUMN
+from us_visa.entity.compiled_encoder import CompiledEncoder
+from us_visa.entity.estimator import TargetValueMapping
+from us_visa.entity.mmap_artifact import write_mmap_file, read_mmap_header, map_mmap_arrays, to_json_scalar
+
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+
+
+# Same file layout as the memory-mappable model artifact, with its own magic
+CASE_INDEX_MAGIC = b"USVISAKN"
+
+# Column of the historical applications echoed back as the case identifier
+CASE_ID_COLUMN = "case_id"
+
+
+class CaseIndex:
+
+    """
+    Exact k-nearest-neighbour index of historical applications in the preprocessor-encoded feature space
+    (one-hot ohe_features + standardized num_features, Euclidean distance).
+
+    The rows are partitioned by their one-hot part : every row of a partition has the same categories, so its
+    categorical squared distance to a query is one number per partition, and a lower bound of the full distance.
+    A query computes that distance for every partition, then scans the numerical float32 blocks of the partitions
+    ring by ring (same categorical distance), nearest ring first, and stops as soon as the next ring cannot beat
+    the k-th best distance found. Most queries only scan the rows sharing (almost) all of their categories.
+
+    Built once at training time, saved in the memory-mappable layout of entity/mmap_artifact.py and mapped
+    read-only at serve time, so the index is shared by every serving process through the page cache.
+    """
+
+    def __init__(self, partition_keys: np.ndarray, partition_offsets: np.ndarray, numeric: np.ndarray,
+                 case_ids: np.ndarray, case_status: np.ndarray, raw_numeric: np.ndarray, raw_category_codes: np.ndarray,
+                 ohe_output_indices: np.ndarray, num_output_indices: np.ndarray,
+                 ohe_columns: List[str], ohe_categories: List[list], num_columns: List[str],
+                 model_version: str, created_at: float = None):
+
+        """
+        :param partition_keys: (partitions x one-hot outputs) one-hot part shared by the rows of every partition
+        :param partition_offsets: Rows of partition p are partition_offsets[p] : partition_offsets[p + 1]
+        :param numeric: (rows x numerical outputs) float32 standardized values, in partition order
+        :param case_ids: Case identifier of every row (fixed-width bytes)
+        :param case_status: Outcome of every row (TargetValueMapping label)
+        :param raw_numeric: (rows x num_columns) raw numerical values
+        :param raw_category_codes: (rows x ohe_columns) index of the raw category in ohe_categories
+        :param ohe_output_indices: Output columns of the encoder forming the one-hot part
+        :param num_output_indices: Output columns of the encoder forming the numerical part
+        :param ohe_columns: Raw one-hot encoded columns
+        :param ohe_categories: Categories of every ohe column
+        :param num_columns: Raw numerical columns
+        :param model_version: Version of the (preprocessor, model) pair the rows were encoded with
+        :param created_at: Unix time the index was built
+        """
+
+        self.partition_keys = partition_keys
+        self.partition_offsets = partition_offsets
+        self.numeric = numeric
+        self.case_ids = case_ids
+        self.case_status = case_status
+        self.raw_numeric = raw_numeric
+        self.raw_category_codes = raw_category_codes
+        self.ohe_output_indices = ohe_output_indices
+        self.num_output_indices = num_output_indices
+        self.ohe_columns = ohe_columns
+        self.ohe_categories = ohe_categories
+        self.num_columns = num_columns
+        self.model_version = model_version
+        self.created_at = time.time() if created_at is None else created_at
+
+        self.status_mapping = TargetValueMapping().reverse_mapping()
+
+
+    @property
+    def n_cases(self) -> int:
+
+        return self.numeric.shape[0]
+
+
+    @classmethod
+    def build(cls, dataframe: DataFrame, compiled_encoder: CompiledEncoder, model_version: str) -> "CaseIndex":
+
+        """
+        This method encodes the historical applications (raw EasyVisa.csv layout : case_id, features, case_status)
+        with the compiled encoder of the production preprocessor and partitions them by their one-hot part.
+        """
+
+        try:
+            X = compiled_encoder.transform(dataframe)
+
+            ohe_output_indices = np.array([output_index for category_map in compiled_encoder.ohe_category_maps
+                                           for output_index in category_map.values() if output_index is not None], dtype=np.intp)
+            num_output_indices = np.asarray(compiled_encoder.num_output_indices, dtype=np.intp)
+
+            # Rows with the same categories form one partition; the stable sort keeps the history order inside a partition
+            partition_keys, partition_ids = np.unique(X[:, ohe_output_indices], axis=0, return_inverse=True)
+            partition_ids = partition_ids.ravel()
+            order = np.argsort(partition_ids, kind="stable")
+
+            partition_offsets = np.zeros(partition_keys.shape[0] + 1, dtype=np.int64)
+            np.cumsum(np.bincount(partition_ids, minlength=partition_keys.shape[0]), out=partition_offsets[1:])
+
+            dataframe = dataframe.iloc[order]
+
+            ohe_categories = [list(category_map.keys()) for category_map in compiled_encoder.ohe_category_maps]
+            raw_category_codes = np.stack([dataframe[column].map({category: code for code, category in enumerate(categories)})
+                                           .to_numpy(dtype=np.int16)
+                                           for column, categories in zip(compiled_encoder.ohe_columns, ohe_categories)], axis=1)
+
+            target_value_mapping = TargetValueMapping()._asdict()
+
+            case_index = cls(partition_keys=partition_keys.astype(np.float32),
+                             partition_offsets=partition_offsets,
+                             numeric=np.ascontiguousarray(X[order][:, num_output_indices], dtype=np.float32),
+                             case_ids=dataframe[CASE_ID_COLUMN].astype(str).to_numpy().astype(np.bytes_),
+                             case_status=dataframe[TARGET_COLUMN].map(target_value_mapping).to_numpy(dtype=np.int8),
+                             raw_numeric=dataframe[compiled_encoder.num_columns].to_numpy(dtype=np.float64),
+                             raw_category_codes=raw_category_codes,
+                             ohe_output_indices=ohe_output_indices,
+                             num_output_indices=num_output_indices,
+                             ohe_columns=list(compiled_encoder.ohe_columns),
+                             ohe_categories=ohe_categories,
+                             num_columns=list(compiled_encoder.num_columns),
+                             model_version=model_version)
+
+            logging.info(f"Built the case index : {case_index.n_cases} cases in {partition_keys.shape[0]} category partitions")
+
+            return case_index
+
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+
+    def save(self, filepath: Union[str, Path]) -> None:
+
+        try:
+            header = {"model_version": self.model_version,
+                      "created_at": self.created_at,
+                      "ohe_columns": self.ohe_columns,
+                      "ohe_categories": [[to_json_scalar(category) for category in categories] for categories in self.ohe_categories],
+                      "num_columns": self.num_columns}
+
+            arrays = {"partition_keys": self.partition_keys,
+                      "partition_offsets": self.partition_offsets,
+                      "numeric": self.numeric,
+                      "case_ids": self.case_ids,
+                      "case_status": self.case_status,
+                      "raw_numeric": self.raw_numeric,
+                      "raw_category_codes": self.raw_category_codes,
+                      "ohe_output_indices": self.ohe_output_indices,
+                      "num_output_indices": self.num_output_indices}
+
+            file_size = write_mmap_file(filepath, magic=CASE_INDEX_MAGIC, header=header, arrays=arrays)
+
+            logging.info(f"Saved case index {filepath} ({self.n_cases} cases, model version {self.model_version}, {file_size} bytes)")
+
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+
+    @staticmethod
+    def read_header(filepath: Union[str, Path]) -> dict:
+
+        return read_mmap_header(filepath, magic=CASE_INDEX_MAGIC)
+
+
+    @classmethod
+    def load(cls, filepath: Union[str, Path], verify_checksums: bool = True) -> "CaseIndex":
+
+        """
+        This method maps the index read-only : the arrays are views on the mapping, nothing is copied.
+        """
+
+        try:
+            header = cls.read_header(filepath)
+            arrays = map_mmap_arrays(filepath, header, verify_checksums=verify_checksums)
+
+            return cls(**arrays, ohe_columns=header["ohe_columns"], ohe_categories=header["ohe_categories"],
+                       num_columns=header["num_columns"], model_version=header["model_version"], created_at=header["created_at"])
+
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+
+    def query(self, x: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+
+        """
+        This method returns the k rows nearest to one encoded applicant x (n_output_features values),
+        ties broken by position in the index.
+        Returns: (row positions, squared distances), nearest first
+        """
+
+        x_ohe = x[self.ohe_output_indices].astype(np.float32)
+        x_numeric = x[self.num_output_indices].astype(np.float32)
+
+        # Exact categorical squared distance of every partition : a lower bound for all of its rows
+        partition_distances = np.square(self.partition_keys - x_ohe).sum(axis=1)
+
+        partition_order = np.argsort(partition_distances, kind="stable")
+        sorted_distances = partition_distances[partition_order]
+        ring_values, ring_starts = np.unique(sorted_distances, return_index=True)
+        ring_ends = np.append(ring_starts[1:], sorted_distances.shape[0])
+
+        best_rows = np.empty(0, dtype=np.int64)
+        best_distances = np.empty(0, dtype=np.float32)
+
+        for ring_value, ring_start, ring_end in zip(ring_values, ring_starts, ring_ends):
+            if best_rows.shape[0] >= k and ring_value > best_distances[-1]:
+                break
+
+            # Rows of every partition of the ring, as one index array
+            partitions = partition_order[ring_start:ring_end]
+            starts = self.partition_offsets[partitions]
+            lengths = self.partition_offsets[partitions + 1] - starts
+            rows = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(lengths.sum())
+
+            distances = np.square(self.numeric[rows] - x_numeric).sum(axis=1) + ring_value
+
+            candidate_rows = np.concatenate([best_rows, rows])
+            candidate_distances = np.concatenate([best_distances, distances])
+
+            if candidate_rows.shape[0] > k:
+                # Keep the k nearest (every row tied with the k-th one, so that the tie-break below is exact)
+                kth_distance = np.partition(candidate_distances, k - 1)[k - 1]
+                is_kept = candidate_distances <= kth_distance
+                candidate_rows, candidate_distances = candidate_rows[is_kept], candidate_distances[is_kept]
+
+            nearest = np.lexsort((candidate_rows, candidate_distances))[:k]
+            best_rows, best_distances = candidate_rows[nearest], candidate_distances[nearest]
+
+        return best_rows, best_distances
+
+
+    def get_case(self, row: int, squared_distance: float) -> dict:
+
+        """
+        This method returns one historical case : identifier, outcome, distance and raw fields.
+        """
+
+        label = int(self.case_status[row])
+
+        case = {"case_id": self.case_ids[row].decode(),
+                "case_status": self.status_mapping[label],
+                "outcome_label": label,
+                "distance": float(np.sqrt(squared_distance))}
+
+        case.update(zip(self.num_columns, self.raw_numeric[row].tolist()))
+        case.update((column, categories[code])
+                    for column, categories, code in zip(self.ohe_columns, self.ohe_categories, self.raw_category_codes[row].tolist()))
+
+        return case
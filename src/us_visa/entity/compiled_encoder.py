@@ -0,0 +1,208 @@
+import sys
+from typing import TYPE_CHECKING, List, Optional
+
+import numpy as np
+
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+if TYPE_CHECKING:
+    from sklearn.compose import ColumnTransformer
+
+
+
+class CompiledEncoder:
+
+    """
+    Pandas-free encoder for a single applicant record, compiled from the fitted ColumnTransformer
+    (OneHotEncoder(drop='first') on ohe_features + StandardScaler on num_features, see config/schema.yaml).
+
+    The category -> output column maps and the scaler mean/scale are precomputed once, so encoding a record
+    is a few dict lookups and float operations written into a NumPy row. The output is identical to
+    data_preprocessor.transform() on a one-row DataFrame.
+    """
+
+    def __init__(self, n_output_features: int,
+                 ohe_columns: List[str], ohe_category_maps: List[dict],
+                 num_columns: List[str], num_output_indices: np.ndarray,
+                 num_means: np.ndarray, num_scales: np.ndarray):
+
+        """
+        :param n_output_features: Width of the transformed feature vector
+        :param ohe_columns: Raw one-hot encoded columns
+        :param ohe_category_maps: Per ohe column, category -> output column index (None for the dropped category)
+        :param num_columns: Raw numerical columns
+        :param num_output_indices: Output column index of every numerical column
+        :param num_means: StandardScaler mean_ (0.0 when with_mean=False)
+        :param num_scales: StandardScaler scale_ (1.0 when with_std=False)
+        """
+
+        self.n_output_features = n_output_features
+
+        self.ohe_columns = ohe_columns
+        self.ohe_category_maps = ohe_category_maps
+
+        self.num_columns = num_columns
+        self.num_output_indices = num_output_indices
+        self.num_means = num_means
+        self.num_scales = num_scales
+
+        self._ohe_items = list(zip(ohe_columns, ohe_category_maps))
+
+        # Raw column of every output column : one-hot columns map back to their ohe_features column
+        self.output_columns = [None] * n_output_features
+        for column, category_map in self._ohe_items:
+            for output_index in category_map.values():
+                if output_index is not None:
+                    self.output_columns[output_index] = column
+
+        for column, output_index in zip(num_columns, num_output_indices):
+            self.output_columns[output_index] = column
+
+        # Same maps for whole columns, with -1 for the dropped category (a missing key stays NaN after Series.map)
+        self._ohe_column_maps = [(column, {category: -1 if output_index is None else output_index
+                                           for category, output_index in category_map.items()})
+                                 for column, category_map in self._ohe_items]
+
+
+    @classmethod
+    def from_preprocessor(cls, data_preprocessor: "ColumnTransformer") -> Optional["CompiledEncoder"]:
+
+        """
+        This method compiles the fitted data preprocessor.
+        Returns None when the preprocessor layout is not supported, the caller then keeps using transform().
+        """
+
+        try:
+            # sklearn is already loaded by unpickling the preprocessor, importing it here keeps the module import light
+            from sklearn.compose import ColumnTransformer
+            from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+            if not isinstance(data_preprocessor, ColumnTransformer) or data_preprocessor.sparse_output_:
+                return None
+
+            n_output_features = 0
+            ohe_columns, ohe_category_maps = [], []
+            num_columns, num_output_indices, num_means, num_scales = [], [], [], []
+
+            for name, transformer, columns in data_preprocessor.transformers_:
+
+                output_slice = data_preprocessor.output_indices_[name]
+                n_output_features = max(n_output_features, output_slice.stop)
+
+                if transformer == "drop" or output_slice.start == output_slice.stop:
+                    continue
+
+                if isinstance(transformer, OneHotEncoder):
+
+                    if transformer.handle_unknown != "error" or getattr(transformer, "_infrequent_enabled", False):
+                        return None
+
+                    output_index = output_slice.start
+
+                    for feature_index, column in enumerate(columns):
+                        drop_index = None if transformer.drop_idx_ is None else transformer.drop_idx_[feature_index]
+
+                        category_map = {}
+                        for category_index, category in enumerate(transformer.categories_[feature_index]):
+                            if drop_index is not None and category_index == drop_index:
+                                category_map[category] = None
+                            else:
+                                category_map[category] = output_index
+                                output_index += 1
+
+                        ohe_columns.append(column)
+                        ohe_category_maps.append(category_map)
+
+                elif isinstance(transformer, StandardScaler):
+
+                    for feature_index, column in enumerate(columns):
+                        num_columns.append(column)
+                        num_output_indices.append(output_slice.start + feature_index)
+                        num_means.append(transformer.mean_[feature_index] if transformer.with_mean else 0.0)
+                        num_scales.append(transformer.scale_[feature_index] if transformer.with_std else 1.0)
+
+                else:
+                    logging.info(f"CompiledEncoder does not support transformer {transformer}, using transform()")
+                    return None
+
+            return cls(n_output_features=n_output_features,
+                       ohe_columns=ohe_columns, ohe_category_maps=ohe_category_maps,
+                       num_columns=num_columns, num_output_indices=np.array(num_output_indices, dtype=np.intp),
+                       num_means=np.array(num_means, dtype=np.float64),
+                       num_scales=np.array(num_scales, dtype=np.float64))
+
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+
+    def encode_record(self, record: dict, out: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+
+        """
+        This method encodes one applicant record (column -> scalar value) into a (1, n_output_features) row.
+        Returns None when a category was not seen during fit, so that the caller falls back to transform().
+
+        :param out: Optional preallocated float64 row of shape (1, n_output_features), overwritten in place
+        """
+
+        if out is None:
+            out = np.zeros((1, self.n_output_features), dtype=np.float64)
+        else:
+            out.fill(0.0)
+
+        row = out[0]
+
+        for column, category_map in self._ohe_items:
+            output_index = category_map.get(record[column], -1)
+
+            if output_index is None:
+                continue
+
+            if output_index == -1:
+                return None
+
+            row[output_index] = 1.0
+
+        # Same operation order as StandardScaler.transform : (x - mean_) / scale_
+        numeric_values = np.array([record[column] for column in self.num_columns], dtype=np.float64)
+        numeric_values -= self.num_means
+        numeric_values /= self.num_scales
+
+        row[self.num_output_indices] = numeric_values
+
+        return out
+
+
+    def transform(self, dataframe) -> np.ndarray:
+
+        """
+        This method encodes a DataFrame of applicant records, column by column.
+        Same output as data_preprocessor.transform(), and the same ValueError for a category not seen during fit,
+        so the encoder can stand in for the preprocessor when the model is served from the memory-mapped artifact.
+        """
+
+        n_rows = len(dataframe)
+        out = np.zeros((n_rows, self.n_output_features), dtype=np.float64)
+
+        rows = np.arange(n_rows)
+
+        for column, column_map in self._ohe_column_maps:
+            output_indices = dataframe[column].map(column_map)
+
+            unknown = output_indices.isna().to_numpy()
+            if unknown.any():
+                unknown_categories = list(dict.fromkeys(dataframe[column].to_numpy()[unknown]))
+                raise ValueError(f"Found unknown categories {unknown_categories} in column {column} during transform")
+
+            output_indices = output_indices.to_numpy(dtype=np.intp)
+            is_encoded = output_indices >= 0
+
+            out[rows[is_encoded], output_indices[is_encoded]] = 1.0
+
+        numeric_values = dataframe[self.num_columns].to_numpy(dtype=np.float64, copy=True)
+        numeric_values -= self.num_means
+        numeric_values /= self.num_scales
+
+        out[:, self.num_output_indices] = numeric_values
+
+        return out
@@ -0,0 +1,276 @@
+import sys
+from typing import TYPE_CHECKING, Optional, Tuple
+
+import numpy as np
+
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+if TYPE_CHECKING:
+    from sklearn.ensemble import GradientBoostingClassifier
+
+
+
+class CompiledGradientBoosting:
+
+    """
+    Array-backed evaluator of a fitted binary GradientBoostingClassifier (USvisaModel.create_model_object).
+
+    All trees are flattened into contiguous NumPy arrays (feature, threshold, left/right child, leaf value
+    pre-multiplied by the learning rate). A batch is evaluated for every tree at once, one tree level per step,
+    and the stage contributions are accumulated in stage order, so decision_function() is identical to sklearn's.
+    """
+
+    # Rows evaluated together : keeps the (rows x trees) node index matrix in cache
+    chunk_size = 512
+
+    # Early exit only decides rows whose bound clears 0 by more than this (far above the float rounding of 300 sums)
+    early_exit_margin = 1e-9
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray,
+                 children_left: np.ndarray, children_right: np.ndarray, leaf_value: np.ndarray,
+                 roots: np.ndarray, max_depth: int, init_raw_prediction: float,
+                 classes: np.ndarray, n_features: int,
+                 node_weight: Optional[np.ndarray] = None):
+
+        """
+        :param feature: Split feature of every node (0 for leaves)
+        :param threshold: Split threshold of every node (+inf for leaves, so a leaf loops onto itself)
+        :param children_left: Global index of the left child (the node itself for leaves)
+        :param children_right: Global index of the right child (the node itself for leaves)
+        :param leaf_value: learning_rate * tree value of every node
+        :param roots: Global index of the root node of every stage
+        :param max_depth: Depth of the deepest tree
+        :param init_raw_prediction: Raw prediction of the init estimator (log-odds of the prior)
+        :param classes: classes_ of the fitted model
+        :param n_features: Number of input features
+        :param node_weight: Weighted number of training samples of every node (needed by the TreeSHAP explainer only)
+        """
+
+        self.feature = feature
+        self.threshold = threshold
+        self.children_left = children_left
+        self.children_right = children_right
+        self.leaf_value = leaf_value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.init_raw_prediction = init_raw_prediction
+        self.classes_ = classes
+        self.n_features_in_ = n_features
+
+        # Interleaved children, derived here and never stored : children[2 * node] is the left child,
+        # children[2 * node + 1] the right child, so the traversal picks the next node with a single take()
+        self.children = np.stack([children_left, children_right], axis=1).ravel()
+        self.node_weight = node_weight
+
+        # Smallest / largest leaf value of every stage, summed over the stages k, k+1, ..., n_stages - 1 :
+        # whatever the leaves reached from stage k on, the rest of the decision function lies in [remaining_min[k], remaining_max[k]]
+        is_leaf = children_left == np.arange(children_left.shape[0])
+        stage_min = np.minimum.reduceat(np.where(is_leaf, leaf_value, np.inf), roots)
+        stage_max = np.maximum.reduceat(np.where(is_leaf, leaf_value, -np.inf), roots)
+
+        self.remaining_min = np.append(np.cumsum(stage_min[::-1])[::-1], 0.0)
+        self.remaining_max = np.append(np.cumsum(stage_max[::-1])[::-1], 0.0)
+
+
+    @classmethod
+    def from_model(cls, prediction_model: "GradientBoostingClassifier") -> Optional["CompiledGradientBoosting"]:
+
+        """
+        This method flattens the trees of a fitted binary GradientBoostingClassifier.
+        Returns None for models it cannot compile (multiclass, other estimators).
+        """
+
+        try:
+            # sklearn is already loaded by unpickling the model, importing it here keeps the module import light
+            from sklearn.ensemble import GradientBoostingClassifier
+            from sklearn.tree._tree import TREE_LEAF
+
+            if not isinstance(prediction_model, GradientBoostingClassifier) or prediction_model.estimators_.shape[1] != 1:
+                return None
+
+            n_features = prediction_model.n_features_in_
+
+            # The prior of the init estimator does not depend on X
+            init_raw_prediction = float(prediction_model._raw_predict_init(np.zeros((1, n_features), dtype=np.float32))[0, 0])
+
+            learning_rate = prediction_model.learning_rate
+
+            features, thresholds, lefts, rights, values, weights, roots = [], [], [], [], [], [], []
+            max_depth = 0
+            offset = 0
+
+            for stage_estimator in prediction_model.estimators_[:, 0]:
+                tree = stage_estimator.tree_
+
+                is_leaf = tree.children_left == TREE_LEAF
+                node_index = np.arange(tree.node_count)
+
+                features.append(np.where(is_leaf, 0, tree.feature))
+                thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+                lefts.append(np.where(is_leaf, node_index, tree.children_left) + offset)
+                rights.append(np.where(is_leaf, node_index, tree.children_right) + offset)
+
+                # Same product as sklearn's predict_stages : scale * value
+                values.append(learning_rate * tree.value[:, 0, 0])
+                weights.append(tree.weighted_n_node_samples)
+
+                roots.append(offset)
+                max_depth = max(max_depth, tree.max_depth)
+                offset += tree.node_count
+
+            compiled_model = cls(feature=np.concatenate(features).astype(np.intp),
+                                 threshold=np.concatenate(thresholds).astype(np.float64),
+                                 children_left=np.concatenate(lefts).astype(np.intp),
+                                 children_right=np.concatenate(rights).astype(np.intp),
+                                 leaf_value=np.concatenate(values).astype(np.float64),
+                                 roots=np.array(roots, dtype=np.intp),
+                                 max_depth=max_depth,
+                                 init_raw_prediction=init_raw_prediction,
+                                 classes=prediction_model.classes_,
+                                 n_features=n_features,
+                                 node_weight=np.concatenate(weights).astype(np.float64))
+
+            logging.info(f"Compiled {len(roots)} trees ({offset} nodes, max depth {max_depth}) into flat arrays")
+
+            return compiled_model
+
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+
+    def _leaf_values(self, X: np.ndarray, roots: Optional[np.ndarray] = None) -> np.ndarray:
+
+        """
+        Level-by-level traversal of every tree (or of the trees starting at `roots`) for every row :
+        returns the (rows x stages) leaf values.
+        """
+
+        if roots is None:
+            roots = self.roots
+
+        n_rows, n_features = X.shape
+
+        node = np.broadcast_to(roots, (n_rows, roots.shape[0])).copy()
+
+        # Flat offsets of every row inside the C-contiguous X
+        row_offset = (np.arange(n_rows) * n_features)[:, None]
+        X_flat = X.ravel()
+
+        for _ in range(self.max_depth):
+            # sklearn goes left when x <= threshold, so right is x > threshold
+            go_right = X_flat.take(row_offset + self.feature.take(node)) > self.threshold.take(node)
+            node = self.children.take(2 * node + go_right)
+
+        return self.leaf_value.take(node)
+
+
+    def decision_function(self, X: np.ndarray) -> np.ndarray:
+
+        """
+        Raw log-odds of the positive class, identical to GradientBoostingClassifier.decision_function.
+        """
+
+        # sklearn evaluates the trees on float32 features
+        X = np.ascontiguousarray(X, dtype=np.float32)
+
+        raw_predictions = np.empty(X.shape[0], dtype=np.float64)
+
+        for start in range(0, X.shape[0], self.chunk_size):
+            leaf_values = self._leaf_values(X[start:start + self.chunk_size])
+
+            # Accumulate init + stage 1 + stage 2 + ... in stage order, like predict_stages
+            stage_sums = np.empty((leaf_values.shape[0], leaf_values.shape[1] + 1), dtype=np.float64)
+            stage_sums[:, 0] = self.init_raw_prediction
+            stage_sums[:, 1:] = leaf_values
+
+            raw_predictions[start:start + self.chunk_size] = np.cumsum(stage_sums, axis=1)[:, -1]
+
+        return raw_predictions
+
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+
+        # Same sigmoid as sklearn's binomial loss; scipy.special is imported on first use, not on the serving import path
+        from scipy.special import expit
+
+        raw_predictions = self.decision_function(X)
+
+        proba = np.empty((raw_predictions.shape[0], 2), dtype=np.float64)
+        proba[:, 1] = expit(raw_predictions)
+        proba[:, 0] = 1 - proba[:, 1]
+
+        return proba
+
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+
+        # Same rule as the serving path and GradientBoostingClassifier.predict : classes_[argmax(predict_proba)]
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+
+    def predict_early_exit(self, X: np.ndarray, stages_per_check: int = 25) -> Tuple[np.ndarray, np.ndarray]:
+
+        """
+        Labels from a staged evaluation that stops, row by row, once the remaining stages cannot flip the decision :
+        every stages_per_check stages, a row whose running decision function plus remaining_min[k] is > 0
+        (or plus remaining_max[k] is < 0) is decided. The other rows go on to the last stage, accumulated in the
+        same order as decision_function(), so every label equals classes_.take(argmax(predict_proba(X))).
+
+        Returns: (labels, number of trees evaluated for every row)
+        """
+
+        X = np.ascontiguousarray(X, dtype=np.float32)
+
+        n_rows, n_stages = X.shape[0], self.roots.shape[0]
+
+        label_indices = np.empty(n_rows, dtype=np.intp)
+        n_trees_evaluated = np.empty(n_rows, dtype=np.intp)
+
+        for start in range(0, n_rows, self.chunk_size):
+            X_chunk = X[start:start + self.chunk_size]
+
+            raw_predictions = np.full(X_chunk.shape[0], self.init_raw_prediction, dtype=np.float64)
+            chunk_label_indices = np.full(X_chunk.shape[0], -1, dtype=np.intp)
+            chunk_n_trees = np.full(X_chunk.shape[0], n_stages, dtype=np.intp)
+
+            # Rows of the chunk still undecided
+            active = np.arange(X_chunk.shape[0])
+
+            for first_stage in range(0, n_stages, stages_per_check):
+                last_stage = min(first_stage + stages_per_check, n_stages)
+
+                leaf_values = self._leaf_values(X_chunk[active], self.roots[first_stage:last_stage])
+
+                # Running sum first, then the stages in order : the same additions as decision_function()
+                stage_sums = np.empty((active.shape[0], leaf_values.shape[1] + 1), dtype=np.float64)
+                stage_sums[:, 0] = raw_predictions[active]
+                stage_sums[:, 1:] = leaf_values
+
+                raw_predictions[active] = np.cumsum(stage_sums, axis=1)[:, -1]
+
+                if last_stage == n_stages:
+                    break
+
+                is_positive = raw_predictions[active] + self.remaining_min[last_stage] > self.early_exit_margin
+                is_negative = raw_predictions[active] + self.remaining_max[last_stage] < -self.early_exit_margin
+                is_decided = is_positive | is_negative
+
+                chunk_label_indices[active[is_decided]] = is_positive[is_decided]
+                chunk_n_trees[active[is_decided]] = last_stage
+
+                active = active[~is_decided]
+                if active.shape[0] == 0:
+                    break
+
+            # Rows that went through every stage : the argmax of predict_proba()
+            if active.shape[0]:
+                from scipy.special import expit
+
+                proba_positive = expit(raw_predictions[active])
+                chunk_label_indices[active] = proba_positive > 1 - proba_positive
+
+            label_indices[start:start + self.chunk_size] = chunk_label_indices
+            n_trees_evaluated[start:start + self.chunk_size] = chunk_n_trees
+
+        return self.classes_.take(label_indices), n_trees_evaluated
@@ -113,6 +113,15 @@ class ModelEvaluationConfig:
 class ModelPusherConfig:
     bucket_name: str = MODEL_BUCKET_NAME
     s3_model_key_path: str = MODEL_FILENAME  # I think we need to change this
+    production_manifest_filepath_local: Path = Path(os.path.join(LOCAL_PRODUCTION_MODEL_DIR, PRODUCTION_MODEL_MANIFEST_NAME))
+    production_versions_dir_local: Path = Path(os.path.join(LOCAL_PRODUCTION_MODEL_DIR, PRODUCTION_MODEL_VERSIONS_DIR_NAME))
+    keep_versions: int = MODEL_PUSHER_KEEP_VERSIONS
+    publish_mmap_artifact: bool = MODEL_PUSHER_PUBLISH_MMAP_ARTIFACT
+    s3_mmap_artifact_key_path: str = f"{MODEL_PUSHER_S3_KEY}/{S3_PRODUCTION_MMAP_ARTIFACT_NAME}"
+    mmap_artifact_filepath_local: Path = Path(os.path.join(LOCAL_PRODUCTION_MODEL_DIR, S3_PRODUCTION_MMAP_ARTIFACT_NAME))
+    publish_case_index: bool = MODEL_PUSHER_PUBLISH_CASE_INDEX
+    s3_case_index_key_path: str = f"{MODEL_PUSHER_S3_KEY}/{S3_PRODUCTION_CASE_INDEX_NAME}"
+    case_index_filepath_local: Path = Path(os.path.join(LOCAL_PRODUCTION_MODEL_DIR, S3_PRODUCTION_CASE_INDEX_NAME))
 
 
 @dataclass
@@ -127,8 +136,88 @@ class USvisaPredictorConfig:
     pred_model_filepath_local : Path = Path(os.path.join(LOCAL_PRODUCTION_MODEL_DIR,
                                                          S3_PRODUCTION_MODEL_NAME))
     
+    # When it exists, the manifest gives the production pair, and the two filepaths above are not used
+    production_manifest_filepath_local : Path = Path(os.path.join(LOCAL_PRODUCTION_MODEL_DIR,
+                                                                  PRODUCTION_MODEL_MANIFEST_NAME))
+    
+    mmap_artifact_filepath_local : Path = Path(os.path.join(LOCAL_PRODUCTION_MODEL_DIR,
+                                                            S3_PRODUCTION_MMAP_ARTIFACT_NAME))
+    
+    case_index_filepath_local : Path = Path(os.path.join(LOCAL_PRODUCTION_MODEL_DIR,
+                                                         S3_PRODUCTION_CASE_INDEX_NAME))
+    
+    model_artifact_format: str = MODEL_ARTIFACT_FORMAT
+    mmap_artifact_verify_checksums: bool = MMAP_ARTIFACT_VERIFY_CHECKSUMS
+    similar_cases_max_k: int = SIMILAR_CASES_MAX_K
+    
+    max_batch_size: int = PREDICTION_MAX_BATCH_SIZE
+    compiled_ensemble_max_rows: int = COMPILED_ENSEMBLE_MAX_ROWS
+    early_exit_enabled: bool = EARLY_EXIT_ENABLED
+    early_exit_stages_per_check: int = EARLY_EXIT_STAGES_PER_CHECK
+    explanations_enabled: bool = EXPLANATIONS_ENABLED
 
 
+@dataclass
+class PredictionCacheConfig:
+    enabled: bool = PREDICTION_CACHE_ENABLED
+    max_size: int = PREDICTION_CACHE_MAX_SIZE
+    ttl_seconds: float = PREDICTION_CACHE_TTL_SECONDS
+    max_records_per_call: int = PREDICTION_CACHE_MAX_RECORDS_PER_CALL
+
+
+@dataclass
+class MicroBatchingConfig:
+    enabled: bool = MICRO_BATCHING_ENABLED
+    max_batch_size: int = MICRO_BATCHING_MAX_BATCH_SIZE
+    max_wait_us: int = MICRO_BATCHING_MAX_WAIT_US
 
 
+@dataclass
+class InferenceExecutorConfig:
+    kind: str = INFERENCE_EXECUTOR_KIND
+    max_workers: int = INFERENCE_EXECUTOR_MAX_WORKERS
+
+
+@dataclass
+class TrainingJobsConfig:
+    max_concurrent_jobs: int = TRAINING_JOBS_MAX_CONCURRENT
+    history_size: int = TRAINING_JOBS_HISTORY_SIZE
+
+
+@dataclass
+class BulkScoringConfig:
+    chunk_size: int = BULK_SCORING_CHUNK_SIZE
 
+
+@dataclass
+class WhatIfConfig:
+    max_grid_size: int = WHAT_IF_MAX_GRID_SIZE
+    max_range_steps: int = WHAT_IF_MAX_RANGE_STEPS
+
+
+@dataclass
+class ShadowScoringConfig:
+    enabled: bool = SHADOW_SCORING_ENABLED
+    candidate_model_dir: Path = LOCAL_CANDIDATE_MODEL_DIR
+    sample_rate: float = SHADOW_SAMPLE_RATE
+    max_pending: int = SHADOW_MAX_PENDING
+    max_production_in_flight: int = SHADOW_MAX_PRODUCTION_IN_FLIGHT
+    max_records: int = SHADOW_MAX_RECORDS
+
+
+@dataclass
+class WarmupConfig:
+    n_predictions: int = WARMUP_PREDICTIONS
+
+
+@dataclass
+class PreforkServerConfig:
+    n_workers: int = SERVING_WORKERS
+    restart_delay_seconds: float = SERVING_WORKER_RESTART_DELAY_SECONDS
+
+
+@dataclass
+class OfflineScoringConfig:
+    chunk_size: int = OFFLINE_SCORING_CHUNK_SIZE
+    max_workers: int = OFFLINE_SCORING_MAX_WORKERS
+    parts_dir_suffix: str = OFFLINE_SCORING_PARTS_DIR_SUFFIX
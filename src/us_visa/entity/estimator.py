@@ -1,8 +1,6 @@
 import sys
 
 from pandas import DataFrame
-from sklearn.pipeline import Pipeline
-from sklearn.ensemble import GradientBoostingClassifier
 
 from us_visa.exception import USvisaException
 from us_visa.logger import logging
@@ -44,6 +42,9 @@ class USvisaModel:
 
     def create_model_object(self):
         
+        # Imported here : the prediction path only needs TargetValueMapping from this module
+        from sklearn.ensemble import GradientBoostingClassifier
+        
         gb_model = GradientBoostingClassifier(**self.gradboost_params)
         
         return gb_model
@@ -0,0 +1,284 @@
+import os, sys
+import json
+import time
+import struct
+import hashlib
+from pathlib import Path
+from typing import Dict, Union
+
+import numpy as np
+
+from us_visa.entity.compiled_encoder import CompiledEncoder
+from us_visa.entity.compiled_ensemble import CompiledGradientBoosting
+
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+
+
+# File layout : prefix | JSON header | arrays (each one starting on a MMAP_ARTIFACT_ALIGNMENT boundary)
+# prefix = magic (8 bytes) + format version (uint32) + header length (uint32) + sha256 of the header (32 bytes)
+MMAP_ARTIFACT_MAGIC = b"USVISAMM"
+MMAP_ARTIFACT_FORMAT_VERSION = 1
+MMAP_ARTIFACT_PREFIX = struct.Struct("<8sII32s")
+MMAP_ARTIFACT_ALIGNMENT = 64
+
+
+def to_json_scalar(value):
+
+    # Category levels come out of the fitted OneHotEncoder as NumPy scalars
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _get_data_offset(header_length: int) -> int:
+
+    return -(-(MMAP_ARTIFACT_PREFIX.size + header_length) // MMAP_ARTIFACT_ALIGNMENT) * MMAP_ARTIFACT_ALIGNMENT
+
+
+def write_mmap_file(filepath: Union[str, Path], magic: bytes, header: dict, arrays: Dict[str, np.ndarray]) -> int:
+
+    """
+    Writes header + arrays in the memory-mappable layout (through a temporary file and an atomic rename,
+    so a serving process never maps a half-written file). The dtype, shape, offset and sha256 of every
+    array are added to the header under "arrays".
+    Returns: size of the file in bytes
+    """
+
+    contiguous_arrays = {}
+    for name, array in arrays.items():
+        array = np.asarray(array)
+
+        if array.dtype.hasobject:
+            raise ValueError(f"Array {name} has dtype {array.dtype}, which cannot be memory-mapped")
+
+        contiguous_arrays[name] = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder("<"))
+
+    # Array offsets are relative to the data section, which starts on the first aligned byte after the header
+    data_offsets, data_length = {}, 0
+    for name, array in contiguous_arrays.items():
+        data_offsets[name] = data_length
+        data_length += -(-array.nbytes // MMAP_ARTIFACT_ALIGNMENT) * MMAP_ARTIFACT_ALIGNMENT
+
+    header = {**header,
+              "arrays": {name: {"dtype": array.dtype.str,
+                                "shape": list(array.shape),
+                                "offset": data_offsets[name],
+                                "sha256": hashlib.sha256(array.tobytes()).hexdigest()}
+                         for name, array in contiguous_arrays.items()}}
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_offset = _get_data_offset(len(header_bytes))
+
+    filepath = Path(filepath)
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    temporary_filepath = filepath.with_name(filepath.name + ".tmp")
+
+    with open(temporary_filepath, "wb") as artifact_file:
+        artifact_file.write(MMAP_ARTIFACT_PREFIX.pack(magic, MMAP_ARTIFACT_FORMAT_VERSION,
+                                                      len(header_bytes), hashlib.sha256(header_bytes).digest()))
+        artifact_file.write(header_bytes)
+
+        for name, array in contiguous_arrays.items():
+            artifact_file.seek(data_offset + data_offsets[name])
+            artifact_file.write(array.tobytes())
+
+        artifact_file.truncate(data_offset + data_length)
+
+    os.replace(temporary_filepath, filepath)
+
+    return data_offset + data_length
+
+
+def read_mmap_header(filepath: Union[str, Path], magic: bytes) -> dict:
+
+    """
+    Reads and checks the prefix and header of a memory-mappable file, without mapping the arrays.
+    """
+
+    with open(filepath, "rb") as artifact_file:
+        prefix = artifact_file.read(MMAP_ARTIFACT_PREFIX.size)
+
+        if len(prefix) != MMAP_ARTIFACT_PREFIX.size:
+            raise ValueError(f"{filepath} is not a memory-mappable artifact (truncated)")
+
+        file_magic, format_version, header_length, header_sha256 = MMAP_ARTIFACT_PREFIX.unpack(prefix)
+
+        if file_magic != magic:
+            raise ValueError(f"{filepath} is not a {magic.decode()} memory-mappable artifact")
+
+        if format_version != MMAP_ARTIFACT_FORMAT_VERSION:
+            raise ValueError(f"{filepath} has format version {format_version}, "
+                             f"this code reads version {MMAP_ARTIFACT_FORMAT_VERSION}")
+
+        header_bytes = artifact_file.read(header_length)
+
+    if hashlib.sha256(header_bytes).digest() != header_sha256:
+        raise ValueError(f"Header checksum mismatch in {filepath}")
+
+    header = json.loads(header_bytes)
+    header["data_offset"] = _get_data_offset(header_length)
+
+    return header
+
+
+def map_mmap_arrays(filepath: Union[str, Path], header: dict, verify_checksums: bool = True) -> Dict[str, np.ndarray]:
+
+    """
+    Maps the file read-only and returns its arrays as views on the mapping.
+    :param verify_checksums: Check the sha256 of every array (reads the whole file once)
+    """
+
+    mapping = np.memmap(filepath, dtype=np.uint8, mode="r")
+
+    arrays = {}
+    for name, array_header in header["arrays"].items():
+        dtype = np.dtype(array_header["dtype"])
+        shape = tuple(array_header["shape"])
+        offset = header["data_offset"] + array_header["offset"]
+
+        array = np.frombuffer(mapping, dtype=dtype, count=int(np.prod(shape)), offset=offset).reshape(shape)
+
+        if verify_checksums and hashlib.sha256(array).hexdigest() != array_header["sha256"]:
+            raise ValueError(f"Checksum mismatch for array {name} in {filepath}")
+
+        arrays[name] = array
+
+    return arrays
+
+
+
+class MmapModelArtifact:
+
+    """
+    Single-file serving artifact : the flattened trees of CompiledGradientBoosting and the parameters of
+    CompiledEncoder, written as raw little-endian arrays behind a versioned, checksummed JSON header.
+
+    Loading maps the file read-only (np.memmap) and builds the arrays as views on the mapping : nothing is
+    unpickled or copied, so startup does not depend on the model size and every process serving the same
+    file shares its pages through the OS page cache.
+    """
+
+    def __init__(self, compiled_encoder: CompiledEncoder, compiled_model: CompiledGradientBoosting,
+                 model_version: str, created_at: float = None):
+
+        """
+        :param compiled_encoder: Encoder compiled from the fitted data preprocessor
+        :param compiled_model: Flattened trees of the production model
+        :param model_version: Content version of the (preprocessor, model) pickles the artifact was built from
+        :param created_at: Unix time the artifact was written
+        """
+
+        self.compiled_encoder = compiled_encoder
+        self.compiled_model = compiled_model
+        self.model_version = model_version
+        self.created_at = time.time() if created_at is None else created_at
+
+
+    def _get_arrays(self) -> Dict[str, np.ndarray]:
+
+        compiled_model = self.compiled_model
+        compiled_encoder = self.compiled_encoder
+
+        arrays = {"feature": compiled_model.feature,
+                  "threshold": compiled_model.threshold,
+                  "children_left": compiled_model.children_left,
+                  "children_right": compiled_model.children_right,
+                  "leaf_value": compiled_model.leaf_value,
+                  "roots": compiled_model.roots,
+                  "classes": compiled_model.classes_,
+                  "num_output_indices": compiled_encoder.num_output_indices,
+                  "num_means": compiled_encoder.num_means,
+                  "num_scales": compiled_encoder.num_scales}
+
+        # Optional : artifacts written without node weights still load, only without explanations
+        if compiled_model.node_weight is not None:
+            arrays["node_weight"] = compiled_model.node_weight
+
+        return arrays
+
+
+    def save(self, filepath: Union[str, Path]) -> None:
+
+        """
+        This method writes the artifact to filepath (through a temporary file and an atomic rename,
+        so a serving process never maps a half-written file).
+        """
+
+        try:
+            header = {"model_version": self.model_version,
+                      "created_at": self.created_at,
+                      "model": {"max_depth": int(self.compiled_model.max_depth),
+                                "init_raw_prediction": float(self.compiled_model.init_raw_prediction),
+                                "n_features": int(self.compiled_model.n_features_in_)},
+                      "encoder": {"n_output_features": int(self.compiled_encoder.n_output_features),
+                                  "ohe_columns": list(self.compiled_encoder.ohe_columns),
+                                  # (category, output index) pairs : JSON object keys would turn every category into a string
+                                  "ohe_categories": [[[to_json_scalar(category), output_index]
+                                                      for category, output_index in category_map.items()]
+                                                     for category_map in self.compiled_encoder.ohe_category_maps],
+                                  "num_columns": list(self.compiled_encoder.num_columns)}}
+
+            file_size = write_mmap_file(filepath, magic=MMAP_ARTIFACT_MAGIC, header=header, arrays=self._get_arrays())
+
+            logging.info(f"Saved memory-mappable model artifact {filepath} (model version {self.model_version}, "
+                         f"{file_size} bytes)")
+
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+
+    @staticmethod
+    def read_header(filepath: Union[str, Path]) -> dict:
+
+        """
+        This method reads and checks the prefix and header of an artifact file, without mapping the arrays.
+        """
+
+        return read_mmap_header(filepath, magic=MMAP_ARTIFACT_MAGIC)
+
+
+    @classmethod
+    def load(cls, filepath: Union[str, Path], verify_checksums: bool = True) -> "MmapModelArtifact":
+
+        """
+        This method maps the artifact read-only and rebuilds the compiled encoder and model on top of the mapping.
+        :param verify_checksums: Check the sha256 of every array (reads the whole file once)
+        """
+
+        try:
+            header = cls.read_header(filepath)
+
+            arrays = map_mmap_arrays(filepath, header, verify_checksums=verify_checksums)
+
+            model_header, encoder_header = header["model"], header["encoder"]
+
+            compiled_model = CompiledGradientBoosting(feature=arrays["feature"],
+                                                      threshold=arrays["threshold"],
+                                                      children_left=arrays["children_left"],
+                                                      children_right=arrays["children_right"],
+                                                      leaf_value=arrays["leaf_value"],
+                                                      roots=arrays["roots"],
+                                                      max_depth=model_header["max_depth"],
+                                                      init_raw_prediction=model_header["init_raw_prediction"],
+                                                      classes=arrays["classes"],
+                                                      n_features=model_header["n_features"],
+                                                      node_weight=arrays.get("node_weight"))
+
+            compiled_encoder = CompiledEncoder(n_output_features=encoder_header["n_output_features"],
+                                               ohe_columns=encoder_header["ohe_columns"],
+                                               ohe_category_maps=[dict((category, output_index) for category, output_index in categories)
+                                                                  for categories in encoder_header["ohe_categories"]],
+                                               num_columns=encoder_header["num_columns"],
+                                               num_output_indices=arrays["num_output_indices"],
+                                               num_means=arrays["num_means"],
+                                               num_scales=arrays["num_scales"])
+
+            if compiled_encoder.n_output_features != compiled_model.n_features_in_:
+                raise ValueError(f"Encoder outputs {compiled_encoder.n_output_features} features, "
+                                 f"the model expects {compiled_model.n_features_in_}")
+
+            return cls(compiled_encoder=compiled_encoder, compiled_model=compiled_model,
+                       model_version=header["model_version"], created_at=header["created_at"])
+
+        except Exception as e:
+            raise USvisaException(e, sys) from e
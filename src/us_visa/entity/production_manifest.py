@@ -0,0 +1,64 @@
+import os, sys
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Tuple, Union
+
+import yaml
+
+from us_visa.exception import USvisaException
+
+
+
+@dataclass(frozen=True)
+class ProductionModelManifest:
+
+    """
+    Pointer to the production (data preprocessor, model) pair.
+
+    The model pusher writes every pair to its own directory (versions/<model_version>/), which is never modified
+    afterwards, and publishes it by atomically replacing this small file. A reader that takes both filepaths from
+    one manifest therefore never pairs the preprocessor of one version with the model of another.
+    The filepaths are relative to the directory of the manifest.
+    """
+
+    model_version: str
+    data_preprocessor_filepath: str
+    pred_model_filepath: str
+
+
+    def save(self, filepath: Union[str, Path]) -> None:
+
+        """
+        Writes the manifest under a temporary name and renames it over filepath.
+        """
+
+        try:
+            filepath = Path(filepath)
+            filepath.parent.mkdir(parents=True, exist_ok=True)
+
+            temporary_filepath = Path(f"{filepath}.tmp")
+            with open(temporary_filepath, "w") as manifest_file:
+                yaml.safe_dump(asdict(self), manifest_file)
+
+            os.replace(temporary_filepath, filepath)
+
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+
+    @classmethod
+    def load(cls, filepath: Union[str, Path]) -> "ProductionModelManifest":
+
+        with open(filepath) as manifest_file:
+            return cls(**yaml.safe_load(manifest_file))
+
+
+    def get_filepaths(self, filepath: Union[str, Path]) -> Tuple[Path, Path]:
+
+        """
+        Returns: (data preprocessor filepath, production model filepath) of the manifest saved at filepath
+        """
+
+        manifest_dir = Path(filepath).parent
+
+        return manifest_dir / self.data_preprocessor_filepath, manifest_dir / self.pred_model_filepath
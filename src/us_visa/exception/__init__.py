@@ -27,6 +27,20 @@ class USvisaException(Exception):
             error_message, error_detail=error_detail
         )
 
+    def __reduce__(self):
+        
+        # Keeps the exception picklable across process pools : rebuilt from the formatted message
+        return (_rebuild_usvisa_exception, (self.error_message,))
+
     def __str__(self):
         
-        return self.error_message
\ No newline at end of file
+        return self.error_message
+
+
+def _rebuild_usvisa_exception(error_message):
+    
+    exception = USvisaException.__new__(USvisaException)
+    Exception.__init__(exception, error_message)
+    exception.error_message = error_message
+    
+    return exception
\ No newline at end of file
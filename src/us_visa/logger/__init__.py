@@ -1,4 +1,8 @@
 import logging
+import logging.handlers
+import atexit
+import queue
+import multiprocessing.util
 import os
 
 from from_root import from_root
@@ -8,13 +12,113 @@ LOG_FILE = f"{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}.log"
 
 log_dir = 'logs'
 
-logs_path = os.path.join(from_root(), log_dir, LOG_FILE)
+
+def get_logs_path() -> str:
+
+    # One log file per process (pid in the name) : processes rotating the same file would rename it under each other
+    return os.path.join(from_root(), log_dir, f"{os.path.splitext(LOG_FILE)[0]}_{os.getpid()}.log")
+
+
+logs_path = get_logs_path()
 
 os.makedirs(log_dir, exist_ok=True)
 
 
+# Logging configuration (environment variables, the logger cannot depend on us_visa.constants)
+LOG_LEVEL = os.getenv("USVISA_LOG_LEVEL", "INFO").upper()
+LOG_MAX_BYTES = int(os.getenv("USVISA_LOG_MAX_BYTES", 10 * 1024 * 1024))      # size of a log file before rotation
+LOG_BACKUP_COUNT = int(os.getenv("USVISA_LOG_BACKUP_COUNT", 5))                # rotated files kept
+REQUEST_LOG_SAMPLE_EVERY = int(os.getenv("USVISA_REQUEST_LOG_SAMPLE_EVERY", 100))   # 1 per-request log record kept out of N
+
+LOG_FORMAT = "[ %(asctime)s ] %(name)s - %(levelname)s - %(message)s"
+
+
+class DeferredFormattingQueueHandler(logging.handlers.QueueHandler):
+
+    """
+    QueueHandler that enqueues the LogRecord as it is : the message is formatted by the writer thread,
+    not by the thread that logs (the listener runs in the same process, so the record does not need pickling).
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+
+        return record
+
+
+class SampledLogger(logging.Logger):
+
+    """
+    Logger that keeps one INFO (or lower) call out of every `sample_every` calls; WARNING and above are always kept.
+    The sampling decision is taken in isEnabledFor, so a dropped call costs a counter increment : no LogRecord,
+    no caller lookup.
+    """
+
+    def __init__(self, name: str, sample_every: int):
+
+        super().__init__(name)
+        self.sample_every = max(1, sample_every)
+        self._seen = 0
+
+    def isEnabledFor(self, level: int) -> bool:
+
+        if self.manager.disable >= level or level < self.getEffectiveLevel():
+            return False
+
+        if level >= logging.WARNING:
+            return True
+
+        self._seen += 1
+        return (self._seen - 1) % self.sample_every == 0
+
+
+# Disk I/O and formatting run on the listener thread; the logging call only puts the record on the queue
+file_handler = logging.handlers.RotatingFileHandler(logs_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT)
+file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+queue_handler = DeferredFormattingQueueHandler(queue.SimpleQueue())
+
+queue_listener = logging.handlers.QueueListener(queue_handler.queue, file_handler, respect_handler_level=True)
+queue_listener.start()
+
+
+def _stop_queue_listener() -> None:
+
+    # Flush the queued records when the process exits
+    queue_listener.stop()
+
+
+def _restart_queue_listener_in_child() -> None:
+
+    # A forked process (process pool worker) inherits the queue handler but not the listener thread,
+    # and writes to its own file (only opened by its first record : most workers never log)
+    global queue_listener, file_handler, logs_path
+
+    logs_path = get_logs_path()
+    file_handler = logging.handlers.RotatingFileHandler(logs_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, delay=True)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    queue_handler.queue = queue.SimpleQueue()
+    queue_listener = logging.handlers.QueueListener(queue_handler.queue, file_handler, respect_handler_level=True)
+    queue_listener.start()
+
+
+def _register_child_finalizer(_queue_handler: logging.Handler) -> None:
+
+    # multiprocessing children leave through os._exit (no atexit) : flush the queue in their exit finalizers
+    multiprocessing.util.Finalize(None, _stop_queue_listener, exitpriority=0)
+
+
+os.register_at_fork(after_in_child=_restart_queue_listener_in_child)
+multiprocessing.util.register_after_fork(queue_handler, _register_child_finalizer)
+
+atexit.register(_stop_queue_listener)
+
+
 logging.basicConfig(
-    filename=logs_path,
-    format="[ %(asctime)s ] %(name)s - %(levelname)s - %(message)s",
-    level=logging.DEBUG,
-)
\ No newline at end of file
+    handlers=[queue_handler],
+    level=LOG_LEVEL,
+)
+
+# Hot-path (per-request) logs go through this sampled logger, child of the root logger
+request_logger = SampledLogger("us_visa.request", sample_every=REQUEST_LOG_SAMPLE_EVERY)
+request_logger.parent = logging.getLogger()
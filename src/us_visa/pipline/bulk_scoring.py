@@ -0,0 +1,276 @@
+import sys
+import io
+import csv
+import json
+import asyncio
+from typing import AsyncIterator, List, Optional, Tuple
+
+from starlette.responses import StreamingResponse
+from starlette.types import Send
+
+from us_visa.constants import SCHEMA_FILEPATH, TARGET_COLUMN
+from us_visa.entity.config_entity import BulkScoringConfig
+from us_visa.entity.estimator import TargetValueMapping
+from us_visa.pipline.inference_executor import InferenceExecutor
+from us_visa.pipline.request_validation import RequestValidator
+from us_visa.utils.main_utils import read_yaml_file
+
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+
+
+class RequestStreamingResponse(StreamingResponse):
+
+    """
+    StreamingResponse whose body iterator consumes the request body while the response is being sent.
+    StreamingResponse listens for the client disconnect with a concurrent receive() that would steal the
+    request body messages; here the body iterator (request.stream()) is the only reader and already raises
+    ClientDisconnect when the client goes away.
+    """
+
+    async def __call__(self, scope, receive, send: Send) -> None:
+
+        await self.stream_response(send)
+
+        if self.background is not None:
+            await self.background()
+
+
+
+class BulkScorer:
+
+    """
+    This class scores a streamed CSV or NDJSON upload with the raw EasyVisa.csv column layout (config/schema.yaml).
+    The body is parsed incrementally, scored chunk by chunk on the inference executor and the results are
+    yielded as soon as each chunk is done, so memory stays bounded by the chunk size whatever the upload size.
+    The drop_columns of the schema (case_id) are not used for modeling but are echoed back with every result.
+
+    Every row is checked by the RequestValidator before scoring (same rules as /predict). A malformed line or an
+    invalid row gets an error result with its line number instead of a prediction, the stream goes on.
+    """
+
+    output_columns = ["prediction", "case_status", "probability_certified"]
+
+    def __init__(self, inference_executor: InferenceExecutor, request_validator: RequestValidator,
+                 bulk_scoring_config: BulkScoringConfig = BulkScoringConfig()):
+
+        """
+        :param inference_executor: Pool used to score the chunks off the event loop
+        :param request_validator: Validates every row before it is scored
+        :param bulk_scoring_config: Number of rows scored together
+        """
+
+        try:
+            self.inference_executor = inference_executor
+            self.request_validator = request_validator
+            self.bulk_scoring_config = bulk_scoring_config
+
+            self._schema_config = read_yaml_file(filepath=SCHEMA_FILEPATH)
+
+            self.echo_columns = self._schema_config["drop_columns"]
+            self.numerical_columns = set(self._schema_config["num_features"])
+            self.model_columns = self._schema_config["ohe_features"] + self._schema_config["num_features"]
+
+            self.status_mapping = TargetValueMapping().reverse_mapping()
+
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+
+    @staticmethod
+    async def _iter_lines(byte_stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, bytes]]:
+
+        """
+        Splits the incoming byte chunks into complete non-blank lines.
+        Returns: (1-based line number in the upload, line) pairs
+        """
+
+        buffer = b""
+        line_number = 0
+
+        async for data in byte_stream:
+            buffer += data
+            *lines, buffer = buffer.split(b"\n")
+
+            for line in lines:
+                line_number += 1
+                if line.strip():
+                    yield line_number, line.rstrip(b"\r")
+
+        if buffer.strip():
+            yield line_number + 1, buffer.rstrip(b"\r")
+
+
+    async def _iter_rows(self, byte_stream: AsyncIterator[bytes], input_format: str) -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+
+        """
+        Parses the upload line by line.
+        Returns: (line number, row or None, parse error or None) triples
+        """
+
+        if input_format == "csv":
+            header = None
+
+            async for line_number, line in self._iter_lines(byte_stream):
+                try:
+                    values = next(csv.reader([line.decode("utf-8")]))
+
+                except (UnicodeDecodeError, csv.Error) as e:
+                    if header is None:
+                        raise
+
+                    yield line_number, None, f"invalid CSV line : {e}"
+                    continue
+
+                if header is None:
+                    header = values
+                    continue
+
+                if len(values) != len(header):
+                    yield line_number, None, f"expected {len(header)} fields, got {len(values)}"
+                    continue
+
+                yield line_number, dict(zip(header, values)), None
+
+        elif input_format == "ndjson":
+            async for line_number, line in self._iter_lines(byte_stream):
+                try:
+                    row = json.loads(line)
+
+                except ValueError as e:
+                    yield line_number, None, f"invalid JSON : {e}"
+                    continue
+
+                if not isinstance(row, dict):
+                    yield line_number, None, f"expected a JSON object, got {type(row).__name__}"
+                    continue
+
+                yield line_number, row, None
+
+        else:
+            raise ValueError(f"Unsupported bulk input format '{input_format}', expected 'csv' or 'ndjson'")
+
+
+    def _to_model_record(self, row: dict) -> dict:
+
+        # Only the modeling columns, numerical values as float (CSV fields arrive as strings)
+        return {column: float(row[column]) if column in self.numerical_columns else row[column]
+                for column in self.model_columns}
+
+
+    async def _score_chunk(self, parsed_rows: List[Tuple[int, Optional[dict], Optional[str]]]) -> List[dict]:
+
+        """
+        Validates and scores one chunk of parsed rows : only the valid rows reach the model.
+        Returns: one result per parsed row, in input order
+        """
+
+        rules = self.request_validator.get_rules()
+        all_results, line_numbers, rows, results = [], [], [], []
+
+        for line_number, row, parse_error in parsed_rows:
+            result = {column: row.get(column) if row is not None else None for column in self.echo_columns}
+            all_results.append(result)
+
+            if parse_error is not None:
+                result.update(error=f"line {line_number} : {parse_error}")
+                continue
+
+            row, field_errors = rules.validate_record(row)
+
+            if field_errors:
+                result.update(error=f"line {line_number} : " + "; ".join(f"{field_error['field']} {field_error['error']}"
+                                                                         for field_error in field_errors))
+                continue
+
+            line_numbers.append(line_number)
+            rows.append(row)
+            results.append(result)
+
+        if not rows:
+            return all_results
+
+        try:
+            labels, probabilities, _ = await self.inference_executor.score_records(
+                                                [self._to_model_record(row) for row in rows])
+
+            for result, label, probability in zip(results, labels, probabilities):
+                result.update(prediction=int(label),
+                              case_status=self.status_mapping[int(label)],
+                              probability_certified=float(probability))
+
+        except Exception:
+            # A row the validator let through must not fail the whole chunk either : score its rows one by one
+            for line_number, row, result in zip(line_numbers, rows, results):
+                try:
+                    labels, probabilities, _ = await self.inference_executor.score_records([self._to_model_record(row)])
+
+                    result.update(prediction=int(labels[0]),
+                                  case_status=self.status_mapping[int(labels[0])],
+                                  probability_certified=float(probabilities[0]))
+
+                except Exception as e:
+                    result.update(error=f"line {line_number} : {e}")
+
+        return all_results
+
+
+    def _format_results(self, results: List[dict], output_format: str, write_header: bool) -> str:
+
+        if output_format == "ndjson":
+            return "".join(json.dumps(result) + "\n" for result in results)
+
+        output = io.StringIO()
+        writer = csv.DictWriter(output, fieldnames=self.echo_columns + self.output_columns + ["error"],
+                                extrasaction="ignore", lineterminator="\n")
+        if write_header:
+            writer.writeheader()
+        writer.writerows(results)
+
+        return output.getvalue()
+
+
+    async def score_stream(self, byte_stream: AsyncIterator[bytes], input_format: str) -> AsyncIterator[str]:
+
+        """
+        This method yields the scored results (same format as the input) chunk by chunk, in input order.
+        The next chunk is parsed while the previous one is being scored.
+        """
+
+        chunk_size = self.bulk_scoring_config.chunk_size
+        pending_task: Optional[asyncio.Task] = None
+        write_header = True
+        n_rows = 0
+
+        try:
+            rows = []
+
+            async for line_number, row, parse_error in self._iter_rows(byte_stream, input_format):
+                if row is not None:
+                    row.pop(TARGET_COLUMN, None)
+
+                rows.append((line_number, row, parse_error))
+
+                if len(rows) == chunk_size:
+                    if pending_task is not None:
+                        yield self._format_results(await pending_task, input_format, write_header)
+                        write_header = False
+
+                    pending_task = asyncio.create_task(self._score_chunk(rows))
+                    n_rows += len(rows)
+                    rows = []
+
+            if pending_task is not None:
+                yield self._format_results(await pending_task, input_format, write_header)
+                write_header = False
+
+            if rows:
+                n_rows += len(rows)
+                yield self._format_results(await self._score_chunk(rows), input_format, write_header)
+
+            logging.info(f"Bulk scoring finished : {n_rows} rows")
+
+        finally:
+            if pending_task is not None and not pending_task.done():
+                pending_task.cancel()
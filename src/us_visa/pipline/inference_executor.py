@@ -0,0 +1,304 @@
+import sys
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from us_visa.entity.config_entity import InferenceExecutorConfig, USvisaPredictorConfig
+from us_visa.pipline.prediction_pipeline import USvisaClassifier
+from us_visa.pipline.serving_metrics import ServingMetrics
+
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+
+# Global variable : classifier used by the pool workers of this process.
+# Thread pools share the serving classifier, process pool workers load their own copy once in _init_process_worker.
+_worker_model_predictor: Optional[USvisaClassifier] = None
+
+# Global variables : shared counter bumped by InferenceExecutor.clear_prediction_caches, and the value of it
+# this process worker last cleared its prediction cache for
+_worker_cache_generation = None
+_worker_cleared_generation = 0
+
+
+def _init_process_worker(prediction_pipeline_config: USvisaPredictorConfig, cache_generation) -> None:
+
+    """
+    Process pool initializer : loads the preprocessor/model pair once per worker process,
+    so that only the (small) records travel between processes on every call.
+    """
+
+    global _worker_model_predictor, _worker_cache_generation
+
+    _worker_cache_generation = cache_generation
+
+    # Stage timings are sent back with every result and recorded by the serving process
+    _worker_model_predictor = USvisaClassifier(prediction_pipeline_config=prediction_pipeline_config,
+                                               serving_metrics=ServingMetrics(buffered=True))
+    _worker_model_predictor.get_model_handle()
+    _worker_model_predictor.serving_metrics.drain_stage_observations()
+
+
+def run_in_worker(func: Callable, *args):
+
+    """
+    Runs inside a pool worker : clears the prediction cache of a process worker if it was cleared by the serving
+    process since the last call, then runs func. Every pool call goes through here, so a worker never answers
+    from a cache entry written before the clear.
+    """
+
+    global _worker_cleared_generation
+
+    if _worker_cache_generation is not None and _worker_cache_generation.value != _worker_cleared_generation:
+        _worker_cleared_generation = _worker_cache_generation.value
+
+        if _worker_model_predictor.prediction_cache is not None:
+            _worker_model_predictor.prediction_cache.clear()
+
+    return func(*args)
+
+
+
+def score_records(records: List[dict]) -> Tuple[list, list, str, list]:
+
+    """
+    Runs inside a pool worker : encodes/transforms and predicts a list of applicant records.
+    Returns: (predicted labels, Certified probabilities, model version, stage observations of a process worker)
+    """
+
+    labels, probabilities, model_version = _worker_model_predictor.predict_records(records=records)
+
+    return (labels.tolist(), probabilities.tolist(), model_version,
+            _worker_model_predictor.serving_metrics.drain_stage_observations())
+
+
+
+def score_record_labels(records: List[dict]) -> Tuple[list, str, Optional[list], list]:
+
+    """
+    Runs inside a pool worker : labels only, with early exit when it is enabled.
+    Returns: (predicted labels, model version, trees evaluated per record or None, stage observations of a process worker)
+    """
+
+    labels, model_version, n_trees_evaluated = _worker_model_predictor.predict_record_labels(records=records)
+
+    return (labels.tolist(), model_version, None if n_trees_evaluated is None else n_trees_evaluated.tolist(),
+            _worker_model_predictor.serving_metrics.drain_stage_observations())
+
+
+
+def explain_records(records: List[dict]) -> Tuple[list, str, list]:
+
+    """
+    Runs inside a pool worker : TreeSHAP explanations of applicant records.
+    Returns: (explanations, model version, stage observations of a process worker)
+    """
+
+    explanations, model_version = _worker_model_predictor.explain_records(records=records)
+
+    return explanations, model_version, _worker_model_predictor.serving_metrics.drain_stage_observations()
+
+
+
+def score_grid(base_record: dict, sweeps: Dict[str, list]) -> Tuple[list, list, str, list]:
+
+    """
+    Runs inside a pool worker : builds and scores the what-if grid of one applicant, so only the sweep values travel.
+    Returns: (predicted labels, Certified probabilities, model version, stage observations of a process worker)
+    """
+
+    labels, probabilities, model_version = _worker_model_predictor.predict_grid(base_record=base_record, sweeps=sweeps)
+
+    return (labels.tolist(), probabilities.tolist(), model_version,
+            _worker_model_predictor.serving_metrics.drain_stage_observations())
+
+
+
+def find_similar_cases(records: List[dict], k: int) -> Tuple[list, list, list, str, list]:
+
+    """
+    Runs inside a pool worker : k most similar historical applications of every record, and the scores of the records.
+    Returns: (similar cases per record, labels, Certified probabilities, model version, stage observations of a process worker)
+    """
+
+    similar_cases, labels, probabilities, model_version = _worker_model_predictor.find_similar_cases(records=records, k=k)
+
+    return (similar_cases, labels.tolist(), probabilities.tolist(), model_version,
+            _worker_model_predictor.serving_metrics.drain_stage_observations())
+
+
+
+class InferenceExecutor:
+
+    """
+    This class runs the CPU-bound part of a prediction (DataFrame construction, transform, predict)
+    on a thread or process pool, so that the asyncio event loop only does I/O, parsing and rendering.
+    """
+
+    def __init__(self, model_predictor: USvisaClassifier,
+                 inference_executor_config: InferenceExecutorConfig = InferenceExecutorConfig()):
+
+        """
+        :param model_predictor: Serving classifier (shared by the thread pool workers)
+        :param inference_executor_config: Pool kind ("thread" or "process") and number of workers
+        """
+
+        self.model_predictor = model_predictor
+        self.inference_executor_config = inference_executor_config
+
+        self._executor: Optional[Executor] = None
+
+        # Process pools only : generation of the worker prediction caches, see run_in_worker
+        self._cache_generation = None
+
+        # Calls currently running or queued on the pool (the event loop is the only writer)
+        self.in_flight = 0
+
+
+    def start(self) -> None:
+
+        """
+        This method creates the pool. Process workers preload the model in their initializer.
+        """
+
+        global _worker_model_predictor
+
+        try:
+            if self._executor is not None:
+                return
+
+            kind = self.inference_executor_config.kind
+            max_workers = self.inference_executor_config.max_workers
+
+            if kind == "thread":
+                _worker_model_predictor = self.model_predictor
+                self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="usvisa-inference")
+
+            elif kind == "process":
+                self._cache_generation = multiprocessing.Value("q", 0)
+                self._executor = ProcessPoolExecutor(max_workers=max_workers,
+                                                     initializer=_init_process_worker,
+                                                     initargs=(self.model_predictor.prediction_pipeline_config,
+                                                               self._cache_generation))
+
+            else:
+                raise ValueError(f"Unknown inference executor kind '{kind}', expected 'thread' or 'process'")
+
+            logging.info(f"Started inference executor with {self.inference_executor_config}")
+
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+
+    def shutdown(self) -> None:
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+    def clear_prediction_caches(self) -> None:
+
+        """
+        This method clears the prediction cache of the serving classifier (the one thread pool workers use) and,
+        for a process pool, the cache of every worker : each one clears it before running its next call.
+        """
+
+        if self.model_predictor.prediction_cache is not None:
+            self.model_predictor.prediction_cache.clear()
+
+        if self._cache_generation is not None:
+            with self._cache_generation.get_lock():
+                self._cache_generation.value += 1
+
+
+    async def _run_in_pool(self, func: Callable, *args) -> tuple:
+
+        if self._executor is None:
+            self.start()
+
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, run_in_worker, func, *args)
+        finally:
+            self.in_flight -= 1
+
+
+    async def score_records(self, records: List[dict]) -> Tuple[list, list, str]:
+
+        """
+        This method scores applicant records on the pool without blocking the event loop.
+        Returns: (predicted labels, Certified probabilities, model version) in input order
+        """
+
+        labels, probabilities, model_version, stage_observations = await self._run_in_pool(score_records, records)
+
+        if stage_observations:
+            self.model_predictor.serving_metrics.record_stage_observations(stage_observations)
+
+        return labels, probabilities, model_version
+
+
+    async def score_record_labels(self, records: List[dict]) -> Tuple[list, str]:
+
+        """
+        This method predicts only the labels of applicant records on the pool (early exit when enabled).
+        Returns: (predicted labels, model version) in input order
+        """
+
+        labels, model_version, n_trees_evaluated, stage_observations = await self._run_in_pool(score_record_labels, records)
+
+        if stage_observations:
+            self.model_predictor.serving_metrics.record_stage_observations(stage_observations)
+
+        if n_trees_evaluated is not None:
+            self.model_predictor.serving_metrics.count_trees_evaluated(n_trees_evaluated)
+
+        return labels, model_version
+
+
+    async def explain_records(self, records: List[dict]) -> Tuple[list, str]:
+
+        """
+        This method explains the predictions of applicant records on the pool.
+        Returns: (explanations in input order, model version)
+        """
+
+        explanations, model_version, stage_observations = await self._run_in_pool(explain_records, records)
+
+        if stage_observations:
+            self.model_predictor.serving_metrics.record_stage_observations(stage_observations)
+
+        return explanations, model_version
+
+
+    async def score_grid(self, base_record: dict, sweeps: Dict[str, list]) -> Tuple[list, list, str]:
+
+        """
+        This method scores the what-if grid of one applicant (every combination of the sweep values) on the pool.
+        Returns: (predicted labels, Certified probabilities, model version) in row-major grid order
+        """
+
+        labels, probabilities, model_version, stage_observations = await self._run_in_pool(score_grid, base_record, sweeps)
+
+        if stage_observations:
+            self.model_predictor.serving_metrics.record_stage_observations(stage_observations)
+
+        return labels, probabilities, model_version
+
+
+    async def find_similar_cases(self, records: List[dict], k: int) -> Tuple[list, list, list, str]:
+
+        """
+        This method looks up the k most similar historical applications of every record and scores the records,
+        in one pool call on one model handle.
+        Returns: (similar cases per record, labels, Certified probabilities, model version) in input order
+        """
+
+        similar_cases, labels, probabilities, model_version, stage_observations = await self._run_in_pool(find_similar_cases, records, k)
+
+        if stage_observations:
+            self.model_predictor.serving_metrics.record_stage_observations(stage_observations)
+
+        return similar_cases, labels, probabilities, model_version
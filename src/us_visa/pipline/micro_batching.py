@@ -0,0 +1,238 @@
+import sys
+import asyncio
+from bisect import bisect_left
+from typing import List, Optional, Tuple
+
+from us_visa.entity.config_entity import MicroBatchingConfig
+from us_visa.pipline.inference_executor import InferenceExecutor
+
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+
+
+class CountHistogram:
+
+    """
+    Fixed-bucket histogram of small integer observations (batch sizes, queue depths).
+    counts[i] is the number of observations <= buckets[i]; the last slot counts everything above.
+    """
+
+    def __init__(self, buckets: List[int]):
+
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0
+        self.count = 0
+
+    def observe(self, value: int) -> None:
+
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def as_dict(self) -> dict:
+
+        bucket_labels = [str(bucket) for bucket in self.buckets] + ["+Inf"]
+
+        return {"buckets": dict(zip(bucket_labels, self.counts)),
+                "count": self.count,
+                "mean": self.total / self.count if self.count else 0.0}
+
+
+
+class MicroBatchDispatcher:
+
+    """
+    This class collects concurrent single-record predictions on a queue and scores them
+    together : one worker drains the queue for at most max_wait_us microseconds (or until
+    max_batch_size records are waiting), runs one vectorized transform + predict_proba on the
+    inference executor and resolves the future of every caller.
+    """
+
+    def __init__(self, inference_executor: InferenceExecutor,
+                 micro_batching_config: MicroBatchingConfig = MicroBatchingConfig()):
+
+        """
+        :param inference_executor: Pool used to score the batches off the event loop
+        :param micro_batching_config: Batch window configuration
+        """
+
+        self.inference_executor = inference_executor
+        self.micro_batching_config = micro_batching_config
+
+        self.max_wait_seconds = micro_batching_config.max_wait_us / 1_000_000
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_task: Optional[asyncio.Task] = None
+        self._in_flight: Optional[asyncio.Semaphore] = None
+        self._scoring_tasks = set()
+
+        histogram_buckets = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024]
+        self.batch_size_histogram = CountHistogram(buckets=histogram_buckets)
+        self.queue_depth_histogram = CountHistogram(buckets=histogram_buckets)
+
+
+    async def start(self) -> None:
+
+        """
+        This method starts the batching worker on the running event loop.
+        """
+
+        if self._worker_task is None:
+            self._queue = asyncio.Queue()
+
+            # As many batches in flight as the executor has workers
+            self._in_flight = asyncio.Semaphore(self.inference_executor.inference_executor_config.max_workers)
+
+            self._worker_task = asyncio.create_task(self._run_worker())
+
+            logging.info(f"Started micro-batching dispatcher with {self.micro_batching_config}")
+
+
+    async def stop(self) -> None:
+
+        """
+        This method stops the batching worker. Pending callers get a cancellation error.
+        """
+
+        if self._worker_task is not None:
+            self._worker_task.cancel()
+
+            try:
+                await self._worker_task
+            except asyncio.CancelledError:
+                pass
+
+            if self._scoring_tasks:
+                await asyncio.gather(*self._scoring_tasks, return_exceptions=True)
+
+            while not self._queue.empty():
+                _, future = self._queue.get_nowait()
+                if not future.done():
+                    future.cancel()
+
+            self._worker_task = None
+
+
+    async def predict(self, record: dict) -> Tuple[int, float, str]:
+
+        """
+        This method queues one applicant record (dict with the USvisaData fields) and waits for its batch.
+        Returns: (predicted label, Certified probability, model version)
+        """
+
+        future = asyncio.get_running_loop().create_future()
+
+        await self._queue.put((record, future))
+
+        return await future
+
+
+    def get_stats(self) -> dict:
+
+        return {"queue_depth": self._queue.qsize() if self._queue is not None else 0,
+                "batch_size_histogram": self.batch_size_histogram.as_dict(),
+                "queue_depth_histogram": self.queue_depth_histogram.as_dict()}
+
+
+    async def _collect_batch(self) -> list:
+
+        loop = asyncio.get_running_loop()
+
+        batch = [await self._queue.get()]
+
+        # Queue depth seen by the worker when a new batch window opens
+        self.queue_depth_histogram.observe(self._queue.qsize() + 1)
+
+        deadline = loop.time() + self.max_wait_seconds
+
+        try:
+            while len(batch) < self.micro_batching_config.max_batch_size:
+
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+
+        except asyncio.CancelledError:
+            # Stopped inside the batch window : the records already taken off the queue are not scored
+            for _, future in batch:
+                if not future.done():
+                    future.cancel()
+            raise
+
+        return batch
+
+
+    async def _score_records(self, records: List[dict]) -> List[Tuple[int, float, str]]:
+
+        labels, probabilities, model_version = await self.inference_executor.score_records(records)
+
+        return [(int(label), float(probability), model_version) for label, probability in zip(labels, probabilities)]
+
+
+    async def _score_batch(self, batch: list) -> None:
+
+        records = [record for record, _ in batch]
+
+        try:
+            results = await self._score_records(records)
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+        except Exception:
+            # One invalid record must not fail the whole batch : score the records one by one
+            for record, future in batch:
+                if future.done():
+                    continue
+
+                try:
+                    result = (await self._score_records([record]))[0]
+                    if not future.done():
+                        future.set_result(result)
+                except Exception as e:
+                    if not future.done():
+                        future.set_exception(e)
+
+
+    async def _score_batch_task(self, batch: list) -> None:
+
+        try:
+            await self._score_batch(batch)
+
+        except Exception as e:
+            logging.error(f"Micro-batching worker failed on a batch of {len(batch)} records : "
+                          f"{USvisaException(e, sys)}")
+
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+        finally:
+            self._in_flight.release()
+
+
+    async def _run_worker(self) -> None:
+
+        while True:
+            # Wait for a free executor worker before opening the next batch window
+            await self._in_flight.acquire()
+
+            batch = await self._collect_batch()
+
+            self.batch_size_histogram.observe(len(batch))
+
+            scoring_task = asyncio.create_task(self._score_batch_task(batch))
+            self._scoring_tasks.add(scoring_task)
+            scoring_task.add_done_callback(self._scoring_tasks.discard)
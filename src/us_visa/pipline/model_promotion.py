@@ -0,0 +1,104 @@
+import sys
+import pickle
+from pathlib import Path
+from dataclasses import asdict
+from typing import Optional
+
+from us_visa.constants import (LOCAL_CANDIDATE_MODEL_DIR, CANDIDATE_MANIFEST_FILENAME, DATA_TRANSFORMATION_OBJECT_FILENAME,
+                               S3_PRODUCTION_MODEL_NAME)
+from us_visa.entity.config_entity import ModelPusherConfig
+from us_visa.entity.artifact_entity import DataIngestionArtifact, ModelEvaluationArtifact, ModelPusherArtifact
+from us_visa.components.model_pusher import ModelPusher
+from us_visa.utils.main_utils import load_object, copy_file_atomic, read_yaml_file, write_yaml_file
+
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+
+
+def stage_candidate(transformed_object_filepath: str, trained_model_filepath: str,
+                    data_ingestion_artifact: DataIngestionArtifact,
+                    candidate_model_dir: Path = LOCAL_CANDIDATE_MODEL_DIR) -> None:
+
+    """
+    This method stages an accepted model as candidate model (same file names as the production pair), where the
+    serving processes shadow-score it on live traffic (pipline/shadow_scoring.py) until it is promoted.
+    :param transformed_object_filepath: Data preprocessor of the data transformation artifact
+    :param trained_model_filepath: Trained model of the model trainer artifact
+    :param data_ingestion_artifact: Historical applications the case index is rebuilt from on promotion
+    :param candidate_model_dir: Directory of the candidate pair
+    """
+
+    try:
+        candidate_model_dir = Path(candidate_model_dir)
+        candidate_model_dir.mkdir(parents=True, exist_ok=True)
+
+        # Same plain pickle as the production preprocessor (the transformation artifact is written with dill)
+        temporary_filepath = candidate_model_dir / f"{DATA_TRANSFORMATION_OBJECT_FILENAME}.tmp"
+        with open(temporary_filepath, "wb") as data_preprocessor_handle:
+            pickle.dump(obj=load_object(transformed_object_filepath), file=data_preprocessor_handle)
+
+        temporary_filepath.replace(candidate_model_dir / DATA_TRANSFORMATION_OBJECT_FILENAME)
+
+        copy_file_atomic(from_filepath=trained_model_filepath, to_filepath=str(candidate_model_dir / S3_PRODUCTION_MODEL_NAME))
+
+        write_yaml_file(filepath=str(candidate_model_dir / CANDIDATE_MANIFEST_FILENAME),
+                        content={"data_ingestion_artifact": asdict(data_ingestion_artifact)})
+
+        logging.info(f"Staged the trained model as candidate model in {candidate_model_dir}")
+
+    except Exception as e:
+        raise USvisaException(e, sys) from e
+
+
+def promote_candidate(candidate_model_dir: Path = LOCAL_CANDIDATE_MODEL_DIR,
+                      model_pusher_config: ModelPusherConfig = ModelPusherConfig()) -> ModelPusherArtifact:
+
+    """
+    This method makes the staged candidate pair the production model, like the model pusher does for a model
+    trained without staging : the model is uploaded to the s3 bucket, the pair is copied over the local production
+    pair, and the memory-mappable artifact and the case index are published again for the new model version
+    (otherwise the serving processes would keep using the pickles only, and no case index).
+    The candidate files are removed afterwards : shadow scoring stops until the next candidate is staged.
+    Returns: model pusher artifact
+    """
+
+    try:
+        candidate_model_dir = Path(candidate_model_dir)
+        data_preprocessor_filepath = candidate_model_dir / DATA_TRANSFORMATION_OBJECT_FILENAME
+        trained_model_filepath = candidate_model_dir / S3_PRODUCTION_MODEL_NAME
+        manifest_filepath = candidate_model_dir / CANDIDATE_MANIFEST_FILENAME
+
+        if not (data_preprocessor_filepath.exists() and trained_model_filepath.exists()):
+            raise FileNotFoundError(f"No candidate model staged in {candidate_model_dir}")
+
+        data_ingestion_artifact: Optional[DataIngestionArtifact] = None
+
+        if manifest_filepath.exists():
+            data_ingestion_artifact = DataIngestionArtifact(**read_yaml_file(filepath=str(manifest_filepath))["data_ingestion_artifact"])
+
+            if not (Path(data_ingestion_artifact.trained_filepath).exists() and Path(data_ingestion_artifact.test_filepath).exists()):
+                logging.warning(f"Data ingestion files of the candidate are gone, case index not published : {data_ingestion_artifact}")
+                data_ingestion_artifact = None
+
+        model_evaluation_artifact = ModelEvaluationArtifact(is_trained_model_accepted=True,
+                                                            eval_metric_f1score_diff=0.0,
+                                                            s3_prod_model_path=model_pusher_config.s3_model_key_path,
+                                                            trained_model_path=str(trained_model_filepath))
+
+        model_pusher = ModelPusher(model_evaluation_artifact=model_evaluation_artifact,
+                                   model_pusher_config=model_pusher_config,
+                                   data_ingestion_artifact=data_ingestion_artifact,
+                                   data_preprocessor_filepath=str(data_preprocessor_filepath))
+
+        model_pusher_artifact = model_pusher.initiate_model_pusher()
+
+        for filepath in (data_preprocessor_filepath, trained_model_filepath, manifest_filepath):
+            filepath.unlink(missing_ok=True)
+
+        logging.info(f"Promoted the candidate model of {candidate_model_dir} to production : {model_pusher_artifact}")
+
+        return model_pusher_artifact
+
+    except Exception as e:
+        raise USvisaException(e, sys) from e
@@ -0,0 +1,348 @@
+import os, sys
+import time
+import pickle
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Tuple
+
+from us_visa.constants import MODEL_REGISTRY_CHECK_INTERVAL_SECONDS, MODEL_REGISTRY_LOAD_ATTEMPTS
+from us_visa.entity.config_entity import USvisaPredictorConfig
+from us_visa.entity.compiled_encoder import CompiledEncoder
+from us_visa.entity.compiled_ensemble import CompiledGradientBoosting
+from us_visa.entity.mmap_artifact import MmapModelArtifact
+from us_visa.entity.tree_explainer import CompiledTreeExplainer
+from us_visa.entity.case_index import CaseIndex
+from us_visa.entity.production_manifest import ProductionModelManifest
+from us_visa.utils.main_utils import get_bytes_version
+
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+
+
+def get_production_pair_filepaths(prediction_pipeline_config: USvisaPredictorConfig) -> Tuple[Path, Path]:
+
+    """
+    Returns: (data preprocessor filepath, production model filepath) of the published pair : the versioned files
+    named by the production manifest, or the two configured filepaths when no manifest was published
+    """
+
+    manifest_filepath = Path(prediction_pipeline_config.production_manifest_filepath_local)
+
+    if manifest_filepath.exists():
+        return ProductionModelManifest.load(manifest_filepath).get_filepaths(manifest_filepath)
+
+    return (Path(prediction_pipeline_config.data_preprocessor_filepath_local),
+            Path(prediction_pipeline_config.pred_model_filepath_local))
+
+
+
+@dataclass(frozen=True)
+class ModelHandle:
+
+    """
+    Immutable (data preprocessor, prediction model) pair handed out by the ModelRegistry.
+    A request must take one handle and use it for both transform and predict,
+    so that it never mixes the preprocessor of one version with the model of another.
+
+    When served from the memory-mapped artifact, data_preprocessor and prediction_model are the
+    CompiledEncoder and the CompiledGradientBoosting themselves.
+    """
+
+    data_preprocessor: object
+    prediction_model: object
+    version: str
+    loaded_at: float
+    compiled_encoder: Optional[CompiledEncoder] = None
+    compiled_model: Optional[CompiledGradientBoosting] = None
+    tree_explainer: Optional[CompiledTreeExplainer] = None
+    case_index: Optional[CaseIndex] = None
+
+
+
+class ModelRegistry:
+
+    """
+    This class loads the data preprocessor and production model once per process and
+    swaps both of them atomically (single attribute assignment) when the files on disk change.
+
+    model_artifact_format of the predictor configuration selects the files : the two pickles ("pickle")
+    or the single memory-mapped artifact published next to them by the model pusher ("mmap").
+    Pickles published by the model pusher are found through the production manifest : the registry watches that
+    one file, so the preprocessor and the model of a pair are always swapped together.
+    """
+
+    # Global variable : one registry per (preprocessor path, model path) inside a process
+    registries = {}
+    registries_lock = threading.Lock()
+
+    def __init__(self,
+                 prediction_pipeline_config: USvisaPredictorConfig = USvisaPredictorConfig(),
+                 check_interval_seconds: float = MODEL_REGISTRY_CHECK_INTERVAL_SECONDS) -> None:
+
+        """
+        :param prediction_pipeline_config: Configuration holding the local preprocessor and model filepaths
+        :param check_interval_seconds: Minimum seconds between two disk checks for changed artifacts
+        """
+
+        self.prediction_pipeline_config = prediction_pipeline_config
+        self.check_interval_seconds = check_interval_seconds
+
+        self._handle: Optional[ModelHandle] = None
+        self._file_signature: Optional[Tuple] = None
+        self._last_check: float = 0.0
+        self._refresh_lock = threading.Lock()
+
+
+    @classmethod
+    def get_registry(cls, prediction_pipeline_config: USvisaPredictorConfig = USvisaPredictorConfig()) -> "ModelRegistry":
+
+        """
+        This method returns the process-wide registry for the given predictor configuration.
+        """
+
+        key = (prediction_pipeline_config.model_artifact_format,
+               str(prediction_pipeline_config.data_preprocessor_filepath_local),
+               str(prediction_pipeline_config.pred_model_filepath_local),
+               str(prediction_pipeline_config.production_manifest_filepath_local),
+               str(prediction_pipeline_config.mmap_artifact_filepath_local))
+
+        registry = cls.registries.get(key)
+
+        if registry is None:
+            with cls.registries_lock:
+                registry = cls.registries.get(key)
+                if registry is None:
+                    registry = cls(prediction_pipeline_config=prediction_pipeline_config)
+                    cls.registries[key] = registry
+
+        return registry
+
+
+    def _is_mmap_format(self) -> bool:
+
+        artifact_format = self.prediction_pipeline_config.model_artifact_format
+
+        if artifact_format not in ("pickle", "mmap"):
+            raise ValueError(f"Unknown model artifact format {artifact_format}, expected 'pickle' or 'mmap'")
+
+        return artifact_format == "mmap"
+
+
+    def _get_artifact_paths(self) -> Tuple[Path, ...]:
+
+        if self._is_mmap_format():
+            return (Path(self.prediction_pipeline_config.mmap_artifact_filepath_local),)
+
+        manifest_filepath = Path(self.prediction_pipeline_config.production_manifest_filepath_local)
+
+        if manifest_filepath.exists():
+            return (manifest_filepath,)
+
+        return (Path(self.prediction_pipeline_config.data_preprocessor_filepath_local),
+                Path(self.prediction_pipeline_config.pred_model_filepath_local))
+
+
+    def _get_file_signature(self) -> Tuple:
+
+        """
+        Cheap change detector : (mtime_ns, size) of the artifact files (of the manifest only, when published).
+        """
+
+        signature = []
+        for filepath in self._get_artifact_paths():
+            stat_result = os.stat(filepath)
+            signature.append((stat_result.st_mtime_ns, stat_result.st_size))
+
+        return tuple(signature)
+
+
+    def _build_tree_explainer(self, compiled_model: Optional[CompiledGradientBoosting]) -> Optional[CompiledTreeExplainer]:
+
+        # TreeSHAP path tables of the compiled trees (None when disabled or not supported)
+        if not self.prediction_pipeline_config.explanations_enabled or compiled_model is None:
+            return None
+
+        try:
+            return CompiledTreeExplainer.from_model(compiled_model)
+        except Exception as e:
+            logging.warning(f"Could not build the TreeSHAP path tables, explanations are disabled : {e}")
+            return None
+
+
+    def _load_case_index(self, version: str) -> Optional[CaseIndex]:
+
+        # Memory-mapped index of the historical applications, only when it was built with this model version
+        case_index_filepath = Path(self.prediction_pipeline_config.case_index_filepath_local)
+
+        if not case_index_filepath.exists():
+            return None
+
+        try:
+            index_version = CaseIndex.read_header(case_index_filepath)["model_version"]
+
+            if index_version != version:
+                logging.warning(f"Case index {case_index_filepath} was built for model version {index_version}, "
+                                f"serving {version} : similar cases are disabled")
+                return None
+
+            return CaseIndex.load(case_index_filepath, verify_checksums=self.prediction_pipeline_config.mmap_artifact_verify_checksums)
+
+        except Exception as e:
+            logging.warning(f"Could not load the case index, similar cases are disabled : {e}")
+            return None
+
+
+    def _load_mmap_handle(self, force: bool) -> Optional[ModelHandle]:
+
+        # The artifact records the version of the pickles it was built from, so both formats agree
+        if not force and self._handle is not None:
+            if MmapModelArtifact.read_header(self._get_artifact_paths()[0])["model_version"] == self._handle.version:
+                return None
+
+        # Views on the read-only mapping : nothing to unpickle, the pages are shared with other processes.
+        # The version is read from the mapped file itself, not from a path that may have been replaced since
+        mmap_artifact = MmapModelArtifact.load(self._get_artifact_paths()[0],
+                                               verify_checksums=self.prediction_pipeline_config.mmap_artifact_verify_checksums)
+        version = mmap_artifact.model_version
+
+        logging.info(f"Loaded memory-mapped model artifact, version {version}")
+
+        return ModelHandle(data_preprocessor=mmap_artifact.compiled_encoder,
+                           prediction_model=mmap_artifact.compiled_model,
+                           version=version,
+                           loaded_at=time.time(),
+                           compiled_encoder=mmap_artifact.compiled_encoder,
+                           compiled_model=mmap_artifact.compiled_model,
+                           tree_explainer=self._build_tree_explainer(mmap_artifact.compiled_model),
+                           case_index=self._load_case_index(version))
+
+
+    def _load_handle(self, force: bool) -> Optional[ModelHandle]:
+
+        """
+        Loads the artifacts currently on disk. Returns None when their version is the one already served (unless forced).
+        """
+
+        if self._is_mmap_format():
+            return self._load_mmap_handle(force=force)
+
+        # The version is the sha256 of the very bytes that get unpickled : it always describes the loaded pair
+        data_preprocessor_bytes, pred_model_bytes = (filepath.read_bytes()
+                                                     for filepath in get_production_pair_filepaths(self.prediction_pipeline_config))
+        version = get_bytes_version([data_preprocessor_bytes, pred_model_bytes])
+
+        if not force and self._handle is not None and version == self._handle.version:
+            return None
+
+        logging.info(f"Loading data preprocessor and production model, version {version}")
+
+        data_preprocessor = pickle.loads(data_preprocessor_bytes)
+        prediction_model = pickle.loads(pred_model_bytes)
+
+        # Pandas-free single-record encoder derived from the fitted preprocessor (None if not supported)
+        try:
+            compiled_encoder = CompiledEncoder.from_preprocessor(data_preprocessor)
+        except Exception as e:
+            logging.warning(f"Could not compile the data preprocessor, using transform() only : {e}")
+            compiled_encoder = None
+
+        # Flattened tree arrays of the GradientBoostingClassifier (None if not supported)
+        try:
+            compiled_model = CompiledGradientBoosting.from_model(prediction_model)
+        except Exception as e:
+            logging.warning(f"Could not compile the production model, using predict_proba() only : {e}")
+            compiled_model = None
+
+        return ModelHandle(data_preprocessor=data_preprocessor,
+                           prediction_model=prediction_model,
+                           version=version,
+                           loaded_at=time.time(),
+                           compiled_encoder=compiled_encoder,
+                           compiled_model=compiled_model,
+                           tree_explainer=self._build_tree_explainer(compiled_model),
+                           case_index=self._load_case_index(version))
+
+
+    def refresh(self, force: bool = False) -> bool:
+
+        """
+        This method reloads the preprocessor/model pair if the files changed on disk.
+        Returns True when a new handle was published.
+
+        A failed reload (e.g. a file that is still being written) keeps serving the current handle.
+        The new handle is only published if the file signature is the same after loading as before : otherwise
+        the files changed while they were read (e.g. two unversioned pickles replaced one after the other), the
+        loaded pair may mix two versions, and the load is attempted again. A pair published through the manifest
+        is switched by one rename, so only the manifest is watched.
+        """
+
+        # Only one thread checks the disk; the others keep using the current handle
+        if not self._refresh_lock.acquire(blocking=self._handle is None or force):
+            return False
+
+        try:
+            self._last_check = time.monotonic()
+
+            file_signature = self._get_file_signature()
+            if not force and self._handle is not None and file_signature == self._file_signature:
+                return False
+
+            for _ in range(MODEL_REGISTRY_LOAD_ATTEMPTS):
+                new_handle = self._load_handle(force=force)
+                loaded_file_signature = self._get_file_signature()
+
+                if loaded_file_signature != file_signature:
+                    logging.info("Model artifacts changed while being loaded, loading them again")
+                    file_signature = loaded_file_signature
+                    continue
+
+                self._file_signature = file_signature
+
+                if new_handle is None:
+                    return False
+
+                # Publishing the new pair is a single reference assignment
+                self._handle = new_handle
+
+                logging.info(f"Model registry now serving version {new_handle.version}")
+
+                return True
+
+            raise RuntimeError(f"Model artifacts kept changing during {MODEL_REGISTRY_LOAD_ATTEMPTS} load attempts")
+
+        except Exception as e:
+            if self._handle is None:
+                raise USvisaException(e, sys) from e
+
+            logging.warning(f"Model reload failed, still serving version {self._handle.version} : {e}")
+            return False
+
+        finally:
+            self._refresh_lock.release()
+
+
+    def get_current_handle(self) -> Optional[ModelHandle]:
+
+        """
+        This method returns the handle currently served, without looking at the disk (None before the first load).
+        """
+
+        return self._handle
+
+
+    def get_handle(self) -> ModelHandle:
+
+        """
+        This method returns the current immutable ModelHandle, loading it on first use
+        and checking the disk for new artifacts at most once per check interval.
+        """
+
+        if self._handle is None:
+            self.refresh()
+
+        elif time.monotonic() - self._last_check >= self.check_interval_seconds:
+            self.refresh()
+
+        return self._handle
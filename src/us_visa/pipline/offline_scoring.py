@@ -0,0 +1,332 @@
+import os, sys
+import json
+import shutil
+import dataclasses
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+import pandas as pd
+from pandas import DataFrame
+
+from us_visa.constants import SCHEMA_FILEPATH, TARGET_COLUMN
+from us_visa.entity.config_entity import OfflineScoringConfig, USvisaPredictorConfig
+from us_visa.entity.estimator import TargetValueMapping
+from us_visa.pipline.prediction_pipeline import USvisaClassifier
+from us_visa.pipline.request_validation import RequestValidator
+from us_visa.utils.main_utils import read_yaml_file
+
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+
+# Global variables : classifier and request validator of the pool worker process, loaded once in _init_scoring_worker
+_worker_model_predictor: Optional[USvisaClassifier] = None
+_worker_request_validator: Optional[RequestValidator] = None
+
+
+def _init_scoring_worker(prediction_pipeline_config: USvisaPredictorConfig) -> None:
+
+    """
+    Process pool initializer : loads the preprocessor/model pair once per worker process.
+    """
+
+    global _worker_model_predictor, _worker_request_validator
+
+    _worker_model_predictor = USvisaClassifier(prediction_pipeline_config=prediction_pipeline_config)
+    _worker_model_predictor.get_model_handle()
+
+    _worker_request_validator = RequestValidator(model_predictor=_worker_model_predictor)
+
+
+def score_chunk(chunk_index: int, dataframe: DataFrame, model_columns: List[str], echo_columns: List[str],
+                part_filepath: str) -> int:
+
+    """
+    Runs inside a pool worker : scores one chunk and writes its results to part_filepath.
+    Every row is checked by the RequestValidator first (same rules as the prediction API), invalid rows get an
+    error message instead of a prediction. If the valid rows fail as a whole, they are scored one by one,
+    so one bad row neither aborts the run nor every resume of it.
+    The part file is written under a temporary name and renamed, so it only exists once complete.
+    Returns: the chunk index
+    """
+
+    status_mapping = TargetValueMapping().reverse_mapping()
+    rules = _worker_request_validator.get_rules()
+    model_version = rules.version
+
+    n_rows = len(dataframe)
+    labels, probabilities, errors = [None] * n_rows, [None] * n_rows, [None] * n_rows
+    valid_positions, valid_records = [], []
+
+    for position, record in enumerate(dataframe[model_columns].to_dict("records")):
+        clean_record, field_errors = rules.validate_record(record)
+
+        if field_errors:
+            errors[position] = "; ".join(f"{field_error['field']} {field_error['error']}" for field_error in field_errors)
+        else:
+            valid_positions.append(position)
+            valid_records.append(clean_record)
+
+    if valid_records:
+        model_dataframe = DataFrame(valid_records, columns=model_columns)
+
+        try:
+            batch_labels, batch_probabilities, model_version = _worker_model_predictor.predict_batch(model_dataframe)
+
+            for position, label, probability in zip(valid_positions, batch_labels, batch_probabilities):
+                labels[position], probabilities[position] = int(label), float(probability)
+
+        except Exception as e:
+            logging.info(f"Chunk {chunk_index} failed as a whole, scoring its rows one by one : {e}")
+
+            for row, position in enumerate(valid_positions):
+                try:
+                    row_labels, row_probabilities, model_version = _worker_model_predictor.predict_batch(model_dataframe.iloc[[row]])
+                    labels[position], probabilities[position] = int(row_labels[0]), float(row_probabilities[0])
+
+                except Exception as row_error:
+                    errors[position] = f"{row_error}"
+
+    results = dataframe[[column for column in echo_columns if column in dataframe.columns]].copy()
+    results["prediction"] = pd.array(labels, dtype="Int64")
+    results["case_status"] = [None if label is None else status_mapping[label] for label in labels]
+    results["probability_certified"] = pd.array(probabilities, dtype="Float64")
+    results["model_version"] = model_version
+    results["error"] = errors
+
+    temporary_filepath = f"{part_filepath}.tmp"
+    results.to_csv(temporary_filepath, index=False)
+    os.replace(temporary_filepath, part_filepath)
+
+    return chunk_index
+
+
+
+class OfflineScoringPipeline:
+
+    """
+    This class scores a large local CSV or Parquet file (raw EasyVisa.csv column layout) with the production
+    preprocessor and model on a process pool, and writes the results in input order to one output file.
+
+    Every chunk result is kept in <output><parts_dir_suffix>/ until the output file is assembled, so a rerun
+    after a crash only scores the chunks that are missing (same input file, chunk size and model version).
+    """
+
+    manifest_filename = "manifest.json"
+
+    def __init__(self, input_filepath: str, output_filepath: str,
+                 offline_scoring_config: OfflineScoringConfig = OfflineScoringConfig(),
+                 prediction_pipeline_config: USvisaPredictorConfig = USvisaPredictorConfig()):
+
+        """
+        :param input_filepath: .csv or .parquet file to score
+        :param output_filepath: .csv or .parquet file receiving the results
+        :param offline_scoring_config: Rows per chunk, number of worker processes and parts directory suffix
+        :param prediction_pipeline_config: Local model artifact format and filepaths
+        """
+
+        try:
+            self.input_filepath = Path(input_filepath)
+            self.output_filepath = Path(output_filepath)
+            self.offline_scoring_config = offline_scoring_config
+
+            # A worker scores a whole chunk with one predict_batch call
+            self.prediction_pipeline_config = dataclasses.replace(
+                                                prediction_pipeline_config,
+                                                max_batch_size=max(prediction_pipeline_config.max_batch_size, offline_scoring_config.chunk_size))
+
+            self.parts_dir = Path(f"{self.output_filepath}{offline_scoring_config.parts_dir_suffix}")
+
+            schema_config = read_yaml_file(filepath=SCHEMA_FILEPATH)
+            self.echo_columns = schema_config["drop_columns"]
+            self.model_columns = schema_config["ohe_features"] + schema_config["num_features"]
+
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+
+    @staticmethod
+    def _get_file_format(filepath: Path) -> str:
+
+        file_format = filepath.suffix.lower().lstrip(".")
+
+        if file_format not in ("csv", "parquet"):
+            raise ValueError(f"Unsupported file '{filepath}', expected a .csv or .parquet file")
+
+        return file_format
+
+
+    def _iter_chunks(self) -> Iterator[DataFrame]:
+
+        """
+        Reads the input file chunk by chunk (chunk_size rows), without loading it whole.
+        """
+
+        chunk_size = self.offline_scoring_config.chunk_size
+
+        if self._get_file_format(self.input_filepath) == "csv":
+            yield from pd.read_csv(self.input_filepath, chunksize=chunk_size)
+
+        else:
+            # pyarrow (requirements.txt) is imported only for Parquet input/output
+            import pyarrow.parquet as pq
+
+            for record_batch in pq.ParquetFile(self.input_filepath).iter_batches(batch_size=chunk_size):
+                yield record_batch.to_pandas()
+
+
+    def _get_manifest(self) -> dict:
+
+        """
+        Identifies a scoring run : completed chunks are only reused by a run with the same manifest.
+        """
+
+        model_version = USvisaClassifier(prediction_pipeline_config=self.prediction_pipeline_config).get_model_handle().version
+        input_stat = os.stat(self.input_filepath)
+
+        return {"input_filepath": str(self.input_filepath.resolve()),
+                "input_size": input_stat.st_size,
+                "input_mtime_ns": input_stat.st_mtime_ns,
+                "chunk_size": self.offline_scoring_config.chunk_size,
+                "model_version": model_version}
+
+
+    def _prepare_parts_dir(self, manifest: dict) -> None:
+
+        manifest_filepath = self.parts_dir / self.manifest_filename
+
+        if manifest_filepath.exists():
+            with open(manifest_filepath) as manifest_file:
+                previous_manifest = json.load(manifest_file)
+
+            if previous_manifest == manifest:
+                logging.info(f"Resuming offline scoring from {self.parts_dir}")
+                return
+
+            logging.info(f"Input file, chunk size or model changed since the last run : discarding {self.parts_dir}")
+            shutil.rmtree(self.parts_dir)
+
+        self.parts_dir.mkdir(parents=True, exist_ok=True)
+
+        with open(manifest_filepath, "w") as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+
+
+    def _get_part_filepath(self, chunk_index: int) -> Path:
+
+        return self.parts_dir / f"chunk_{chunk_index:06d}.csv"
+
+
+    def _get_part_dtypes(self) -> dict:
+
+        part_dtypes = {column: "string" for column in self.echo_columns}
+        part_dtypes.update({"prediction": "Int64", "case_status": "string", "probability_certified": "Float64",
+                            "model_version": "string", "error": "string"})
+
+        return part_dtypes
+
+
+    def _assemble_output(self, n_chunks: int) -> None:
+
+        """
+        Concatenates the chunk results in chunk order into the output file.
+        """
+
+        part_filepaths = [self._get_part_filepath(chunk_index) for chunk_index in range(n_chunks)]
+        temporary_filepath = Path(f"{self.output_filepath}.tmp")
+
+        if self._get_file_format(self.output_filepath) == "csv":
+            with open(temporary_filepath, "wb") as output_file:
+                for chunk_index, part_filepath in enumerate(part_filepaths):
+                    with open(part_filepath, "rb") as part_file:
+                        if chunk_index > 0:
+                            part_file.readline()    # header already written by the first chunk
+
+                        shutil.copyfileobj(part_file, output_file)
+
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            parquet_writer = None
+
+            try:
+                for part_filepath in part_filepaths:
+                    # Explicit dtypes : every part gets the same schema, whether or not some of its rows failed
+                    table = pa.Table.from_pandas(pd.read_csv(part_filepath, dtype=self._get_part_dtypes()),
+                                                 preserve_index=False)
+
+                    if parquet_writer is None:
+                        parquet_writer = pq.ParquetWriter(temporary_filepath, table.schema)
+
+                    parquet_writer.write_table(table)
+
+            finally:
+                if parquet_writer is not None:
+                    parquet_writer.close()
+
+        os.replace(temporary_filepath, self.output_filepath)
+
+
+    def run(self) -> dict:
+
+        """
+        This method scores the input file and writes the output file.
+        Returns: number of chunks, chunks scored by this run and chunks reused from a previous run
+        """
+
+        try:
+            self._get_file_format(self.output_filepath)
+
+            manifest = self._get_manifest()
+            self._prepare_parts_dir(manifest)
+
+            logging.info(f"Offline scoring of {self.input_filepath} with model version {manifest['model_version']} : "
+                         f"{self.offline_scoring_config.chunk_size} rows per chunk, "
+                         f"{self.offline_scoring_config.max_workers} worker processes")
+
+            max_workers = self.offline_scoring_config.max_workers
+            n_chunks, n_scored, n_reused = 0, 0, 0
+            pending_futures = set()
+
+            with ProcessPoolExecutor(max_workers=max_workers,
+                                     initializer=_init_scoring_worker,
+                                     initargs=(self.prediction_pipeline_config,)) as process_pool:
+
+                for chunk_index, dataframe in enumerate(self._iter_chunks()):
+                    n_chunks += 1
+                    part_filepath = self._get_part_filepath(chunk_index)
+
+                    if part_filepath.exists():
+                        n_reused += 1
+                        continue
+
+                    dataframe = dataframe.drop(columns=[TARGET_COLUMN], errors="ignore")
+
+                    # At most two chunks per worker are read ahead, so memory stays bounded by the chunk size
+                    if len(pending_futures) >= 2 * max_workers:
+                        done_futures, pending_futures = wait(pending_futures, return_when=FIRST_COMPLETED)
+                        for future in done_futures:
+                            future.result()
+
+                    pending_futures.add(process_pool.submit(score_chunk, chunk_index, dataframe,
+                                                            self.model_columns, self.echo_columns, str(part_filepath)))
+                    n_scored += 1
+
+                for future in pending_futures:
+                    future.result()
+
+            if n_chunks == 0:
+                raise ValueError(f"No rows to score in {self.input_filepath}")
+
+            self._assemble_output(n_chunks=n_chunks)
+            shutil.rmtree(self.parts_dir)
+
+            logging.info(f"Offline scoring finished : {n_chunks} chunks ({n_scored} scored, {n_reused} reused) "
+                         f"written to {self.output_filepath}")
+
+            return {"chunks": n_chunks, "scored_chunks": n_scored, "reused_chunks": n_reused}
+
+        except Exception as e:
+            raise USvisaException(e, sys) from e
@@ -0,0 +1,179 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+from us_visa.entity.config_entity import PredictionCacheConfig
+
+
+# Raw USvisaData fields and how their values are normalized inside a cache key.
+# Numerical fields become floats (the preprocessor casts them to float64 anyway, so "2412", 2412 and 2412.0
+# give the same prediction); categorical fields stay exact strings because the OneHotEncoder matches them exactly.
+NUMERICAL_KEY_FIELDS = ("yr_of_estab", "prevailing_wage", "no_of_employees")
+CATEGORICAL_KEY_FIELDS = ("continent", "education_of_employee", "has_job_experience", "requires_job_training",
+                          "region_of_employment", "unit_of_wage", "full_time_position")
+
+
+def canonical_record_key(record: dict) -> tuple:
+
+    """
+    Canonical cache key of one applicant record (dict with the USvisaData fields).
+    """
+
+    return (tuple(float(record[field]) for field in NUMERICAL_KEY_FIELDS)
+            + tuple(str(record[field]) for field in CATEGORICAL_KEY_FIELDS))
+
+
+
+class PredictionCache:
+
+    """
+    Thread-safe LRU cache of (label, Certified probability) per canonical applicant record,
+    bounded in size and entry age, and emptied whenever the served model version changes.
+    Explanations are kept alongside, in their own LRU with the same bounds.
+
+    Only the version currently served is cached : during a swap, a request still scoring with the previous
+    handle gets misses and its writes are ignored, so it never empties the entries of the new version.
+    """
+
+    def __init__(self, get_current_version: Callable[[], Optional[str]],
+                 prediction_cache_config: PredictionCacheConfig = PredictionCacheConfig()):
+
+        """
+        :param get_current_version: Returns the model version currently served (the one of the registry's current handle)
+        :param prediction_cache_config: Max number of entries, time-to-live in seconds and largest cached call
+        """
+
+        self.get_current_version = get_current_version
+
+        self.max_size = prediction_cache_config.max_size
+        self.ttl_seconds = prediction_cache_config.ttl_seconds
+        self.max_records_per_call = prediction_cache_config.max_records_per_call
+
+        self._entries: "OrderedDict[tuple, Tuple[float, float, float]]" = OrderedDict()
+        self._explanations: "OrderedDict[tuple, Tuple[dict, float]]" = OrderedDict()
+        self._model_version: Optional[str] = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        self.explanation_hits = 0
+        self.explanation_misses = 0
+
+
+    def _check_model_version(self, model_version: str) -> bool:
+
+        # Called with the lock held : the entries follow the served version, and a call made with the handle
+        # of any other version is not cached (results of another model version are never served)
+        current_version = self.get_current_version()
+
+        if current_version != self._model_version:
+            if self._entries or self._explanations:
+                self.invalidations += 1
+
+            self._entries.clear()
+            self._explanations.clear()
+            self._model_version = current_version
+
+        return model_version == self._model_version
+
+
+    def get(self, key: tuple, model_version: str) -> Optional[Tuple[float, float]]:
+
+        """
+        Returns the cached (label, Certified probability) or None.
+        """
+
+        with self._lock:
+            entry = self._entries.get(key) if self._check_model_version(model_version) else None
+
+            if entry is None or time.monotonic() - entry[2] > self.ttl_seconds:
+                if entry is not None:
+                    del self._entries[key]
+
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+            return entry[0], entry[1]
+
+
+    def put(self, key: tuple, model_version: str, label: float, probability: float) -> None:
+
+        with self._lock:
+            if not self._check_model_version(model_version):
+                return
+
+            self._entries[key] = (label, probability, time.monotonic())
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+
+    def get_explanation(self, key: tuple, model_version: str) -> Optional[dict]:
+
+        """
+        Returns the cached explanation of the record or None.
+        """
+
+        with self._lock:
+            entry = self._explanations.get(key) if self._check_model_version(model_version) else None
+
+            if entry is None or time.monotonic() - entry[1] > self.ttl_seconds:
+                if entry is not None:
+                    del self._explanations[key]
+
+                self.explanation_misses += 1
+                return None
+
+            self._explanations.move_to_end(key)
+            self.explanation_hits += 1
+
+            return entry[0]
+
+
+    def put_explanation(self, key: tuple, model_version: str, explanation: dict) -> None:
+
+        with self._lock:
+            if not self._check_model_version(model_version):
+                return
+
+            self._explanations[key] = (explanation, time.monotonic())
+            self._explanations.move_to_end(key)
+
+            while len(self._explanations) > self.max_size:
+                self._explanations.popitem(last=False)
+                self.evictions += 1
+
+
+    def clear(self) -> None:
+
+        with self._lock:
+            self._entries.clear()
+            self._explanations.clear()
+
+
+    def get_stats(self) -> dict:
+
+        with self._lock:
+            lookups = self.hits + self.misses
+
+            return {"size": len(self._entries),
+                    "max_size": self.max_size,
+                    "ttl_seconds": self.ttl_seconds,
+                    "model_version": self._model_version,
+                    "hits": self.hits,
+                    "misses": self.misses,
+                    "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                    "evictions": self.evictions,
+                    "invalidations": self.invalidations,
+                    "explanations_size": len(self._explanations),
+                    "explanation_hits": self.explanation_hits,
+                    "explanation_misses": self.explanation_misses}
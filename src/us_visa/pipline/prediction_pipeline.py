@@ -1,20 +1,30 @@
 import os , sys
+import time
 from pathlib import Path
 import pickle
 
 import numpy as np
 import pandas as pd
 from pandas import DataFrame
+from typing import Dict, List, Optional, Tuple
 
 from us_visa.utils.main_utils import read_yaml_file
-from us_visa.entity.config_entity import USvisaPredictorConfig
-from us_visa.entity.s3_estimator import USvisaEstimator   # need to use the ProductionModel/production_model.pkl
+from us_visa.entity.config_entity import USvisaPredictorConfig, PredictionCacheConfig
+from us_visa.pipline.model_registry import ModelRegistry, ModelHandle
+from us_visa.pipline.prediction_cache import PredictionCache, canonical_record_key
+from us_visa.pipline.serving_metrics import ServingMetrics
+from us_visa.entity.estimator import TargetValueMapping
 
 from us_visa.exception import USvisaException
-from us_visa.logger import logging
+from us_visa.logger import logging, request_logger
 
 
 
+# Column order of the raw prediction input (same keys as USvisaData.get_usvisa_data_as_dict)
+USVISA_DATA_COLUMNS = ["yr_of_estab", "prevailing_wage", "no_of_employees",
+                       "continent", "education_of_employee", "has_job_experience", "requires_job_training",
+                       "region_of_employment", "unit_of_wage", "full_time_position"]
+
 
 class USvisaData:
     
@@ -55,7 +65,7 @@ class USvisaData:
         This function returns a dictionary from USvisaData class input 
         """
         
-        logging.info("Entered get_usvisa_data_as_dict method as USvisaData class inside src/us_visa/pipline/prediction_pipeline.py file")
+        request_logger.info("Entered get_usvisa_data_as_dict method as USvisaData class inside src/us_visa/pipline/prediction_pipeline.py file")
 
         try:
             input_data_dict = {
@@ -73,9 +83,9 @@ class USvisaData:
                 
             }
 
-            logging.info("Created usvisa input data dict")
+            request_logger.info("Created usvisa input data dict")
 
-            logging.info("Exited get_usvisa_data_as_dict method as USvisaData class inside src/us_visa/pipline/prediction_pipeline.py file")
+            request_logger.info("Exited get_usvisa_data_as_dict method as USvisaData class inside src/us_visa/pipline/prediction_pipeline.py file")
 
             return input_data_dict
 
@@ -83,6 +93,15 @@ class USvisaData:
             raise USvisaException(e, sys) from e
 
 
+    def get_usvisa_data_as_record(self) -> dict:
+        
+        """
+        This function returns the USvisaData class input as one flat record (column -> scalar value)
+        """
+        
+        return {column: getattr(self, column) for column in USVISA_DATA_COLUMNS}
+
+
     def get_usvisa_input_data_frame(self)-> DataFrame:
         
         """
@@ -97,43 +116,115 @@ class USvisaData:
             raise USvisaException(e, sys) from e
 
 
+    @staticmethod
+    def get_usvisa_batch_data_frame(records: List[dict]) -> DataFrame:
+        
+        """
+        This function returns one columnar DataFrame for many applicant records (dicts with the USvisaData fields),
+        keeping the input order of the records.
+        """
+        try:
+            
+            usvisa_batch_data_dict = {column: [record[column] for record in records] for column in USVISA_DATA_COLUMNS}
+            return DataFrame(usvisa_batch_data_dict, columns=USVISA_DATA_COLUMNS)
+        
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+
+    @staticmethod
+    def get_usvisa_grid_data_frame(base_record: dict, sweeps: Dict[str, list]) -> DataFrame:
+        
+        """
+        This function returns the DataFrame of every combination of the sweep values applied to one applicant record,
+        in row-major order (the last sweep varies fastest), built column by column without a dict per row.
+        """
+        try:
+            
+            shape = [len(values) for values in sweeps.values()]
+            n_rows = int(np.prod(shape))
+            
+            usvisa_grid_data_dict = {column: np.full(n_rows, base_record[column]) for column in USVISA_DATA_COLUMNS}
+            
+            for axis, (column, values) in enumerate(sweeps.items()):
+                # Each value is repeated for every combination of the following sweeps, the block for the preceding ones
+                inner, outer = int(np.prod(shape[axis + 1:])), int(np.prod(shape[:axis]))
+                usvisa_grid_data_dict[column] = np.tile(np.repeat(np.array(values), inner), outer)
+            
+            return DataFrame(usvisa_grid_data_dict, columns=USVISA_DATA_COLUMNS)
+        
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+
 class USvisaClassifier:
     
     def __init__(self,
-                 prediction_pipeline_config: USvisaPredictorConfig = USvisaPredictorConfig(),) -> None:
+                 prediction_pipeline_config: USvisaPredictorConfig = USvisaPredictorConfig(),
+                 serving_metrics: Optional[ServingMetrics] = None,
+                 prediction_cache_config: Optional[PredictionCacheConfig] = None) -> None:
         
         """
         :param prediction_pipeline_config: Configuration for prediction the value
+        :param serving_metrics: Stage latency histograms receiving the model loading / transform / predict timings
+        :param prediction_cache_config: Prediction cache settings, PredictionCacheConfig() (environment) when not given
         """
         
         try:
             # self.schema_config = read_yaml_file(SCHEMA_FILE_PATH)
             self.prediction_pipeline_config = prediction_pipeline_config
             
+            # Process-wide registry : the pickles are loaded once and shared by every USvisaClassifier
+            self.model_registry = ModelRegistry.get_registry(prediction_pipeline_config=prediction_pipeline_config)
+            
+            # Results of repeated submissions, emptied when the model version changes
+            prediction_cache_config = prediction_cache_config if prediction_cache_config is not None else PredictionCacheConfig()
+            self.prediction_cache = (PredictionCache(get_current_version=self.get_current_model_version,
+                                                     prediction_cache_config=prediction_cache_config)
+                                     if prediction_cache_config.enabled else None)
+            
+            self.serving_metrics = serving_metrics if serving_metrics is not None else ServingMetrics()
+            
         except Exception as e:
             raise USvisaException(e, sys)
 
 
-    def get_data_preprocessor_n_pred_model(self):
+    def get_current_model_version(self) -> Optional[str]:
         
         """
-        This method returns the data preprocessor object and trained model object.
+        This method returns the model version currently served, without looking at the disk (None before the first load).
         """
-        logging.info("Entered get_pred_model_n_data_preprocessor method of USvisaClassifier class inside src/us_visa/pipline/prediction_pipeline.py file")
+        
+        model_handle = self.model_registry.get_current_handle()
+        
+        return None if model_handle is None else model_handle.version
+
 
-        data_preprocessor_path_local = self.prediction_pipeline_config.data_preprocessor_filepath_local
-        pred_model_path_local = self.prediction_pipeline_config.pred_model_filepath_local
+    def get_model_handle(self) -> ModelHandle:
         
-        with open(data_preprocessor_path_local, "rb") as data_preprocessor_handle:
-            data_preprocessor = pickle.load(data_preprocessor_handle)
+        """
+        This method returns the current immutable (data preprocessor, prediction model) handle.
+        """
+        
+        start_time = time.perf_counter()
+        model_handle = self.model_registry.get_handle()
+        self.serving_metrics.observe_stage("model_loading", time.perf_counter() - start_time)
         
+        return model_handle
+
+
+    def get_data_preprocessor_n_pred_model(self):
         
-        with open(pred_model_path_local, mode="rb") as pred_model_handle:
-            prediction_model = pickle.load(pred_model_handle)
+        """
+        This method returns the data preprocessor object and trained model object.
+        """
+        request_logger.info("Entered get_pred_model_n_data_preprocessor method of USvisaClassifier class inside src/us_visa/pipline/prediction_pipeline.py file")
+
+        model_handle = self.get_model_handle()
             
-        logging.info("Exited get_pred_model_n_data_preprocessor method of USvisaClassifier class inside src/us_visa/pipline/prediction_pipeline.py file")
+        request_logger.info("Exited get_pred_model_n_data_preprocessor method of USvisaClassifier class inside src/us_visa/pipline/prediction_pipeline.py file")
             
-        return data_preprocessor, prediction_model
+        return model_handle.data_preprocessor, model_handle.prediction_model
         
         
     def predict(self, dataframe) -> str:
@@ -144,7 +235,7 @@ class USvisaClassifier:
         """
         
         try:
-            logging.info("Entered predict method of USvisaClassifier class inside src/us_visa/pipline/prediction_pipeline.py file")
+            request_logger.info("Entered predict method of USvisaClassifier class inside src/us_visa/pipline/prediction_pipeline.py file")
             #model = USvisaEstimator(
             #    bucket_name=self.prediction_pipeline_config.model_bucket_name,
             #    model_path=self.prediction_pipeline_config.model_filepath,
@@ -153,15 +244,300 @@ class USvisaClassifier:
             data_preprocessor, prediction_model = self.get_data_preprocessor_n_pred_model()
             
             X_prod = data_preprocessor.transform(dataframe)
-            print("X_prod : ", X_prod)
             
             result = prediction_model.predict(X_prod)
-            print("Production data prediction : ", result)
+            request_logger.debug("Production data prediction : %s", result)
             #result =  model.predict(dataframe)
             
             return result
         
         except Exception as e:
             raise USvisaException(e, sys)
+
+
+    def _predict_transformed(self, model_handle: ModelHandle, X_prod: np.ndarray) -> Tuple[np.ndarray, np.ndarray, str]:
+        
+        prediction_model = model_handle.prediction_model
+        
+        # Small batches : the flattened tree arrays give the same probabilities with less per-call overhead
+        if (model_handle.compiled_model is not None and isinstance(X_prod, np.ndarray)
+                and X_prod.shape[0] <= self.prediction_pipeline_config.compiled_ensemble_max_rows):
+            prediction_model = model_handle.compiled_model
+        
+        start_time = time.perf_counter()
+        
+        pred_proba = prediction_model.predict_proba(X_prod)
+        
+        # For GradientBoostingClassifier, predict() is the argmax of predict_proba()
+        labels = prediction_model.classes_.take(np.argmax(pred_proba, axis=1))
+        
+        self.serving_metrics.observe_stage("predict", time.perf_counter() - start_time)
+        
+        positive_class_index = list(prediction_model.classes_).index(TargetValueMapping().Certified)
+        
+        return labels, pred_proba[:, positive_class_index], model_handle.version
+
+
+    def _check_batch_size(self, batch_size: int) -> None:
+        
+        if batch_size > self.prediction_pipeline_config.max_batch_size:
+            raise ValueError(f"Batch of {batch_size} records exceeds the max batch size "
+                             f"{self.prediction_pipeline_config.max_batch_size}")
+
+
+    def predict_batch(self, dataframe: DataFrame) -> Tuple[np.ndarray, np.ndarray, str]:
+        
+        """
+        This method scores a whole batch with a single transform and a single predict_proba call.
+        Returns: (predicted labels, positive class (Certified) probabilities, model version) in input order
+        """
+        
+        try:
+            self._check_batch_size(len(dataframe))
+            
+            # Same handle for transform and predict, even if the registry swaps meanwhile
+            model_handle = self.get_model_handle()
+            
+            start_time = time.perf_counter()
+            X_prod = model_handle.data_preprocessor.transform(dataframe)
+            self.serving_metrics.observe_stage("transform", time.perf_counter() - start_time)
+            
+            return self._predict_transformed(model_handle, X_prod)
+        
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+
+    def _transform_records(self, model_handle: ModelHandle, records: List[dict]) -> np.ndarray:
+        
+        # A single record is encoded by the compiled encoder without building a DataFrame
+        if len(records) == 1 and model_handle.compiled_encoder is not None:
+            start_time = time.perf_counter()
+            X_prod = model_handle.compiled_encoder.encode_record(records[0])
+            
+            if X_prod is not None:
+                self.serving_metrics.observe_stage("transform", time.perf_counter() - start_time)
+                return X_prod
+        
+        start_time = time.perf_counter()
+        dataframe = USvisaData.get_usvisa_batch_data_frame(records=records)
+        self.serving_metrics.observe_stage("dataframe_construction", time.perf_counter() - start_time)
+        
+        start_time = time.perf_counter()
+        X_prod = model_handle.data_preprocessor.transform(dataframe)
+        self.serving_metrics.observe_stage("transform", time.perf_counter() - start_time)
+        
+        return X_prod
+
+
+    def _score_records(self, model_handle: ModelHandle, records: List[dict]) -> Tuple[np.ndarray, np.ndarray, str]:
+        
+        return self._predict_transformed(model_handle, self._transform_records(model_handle, records))
+
+
+    def predict_record_labels(self, records: List[dict]) -> Tuple[np.ndarray, str, Optional[np.ndarray]]:
+        
+        """
+        This method returns only the predicted labels of applicant records (the form route needs no probability).
+        With early exit enabled (and a compiled model), the trees are evaluated in stages and a record stops
+        as soon as the remaining stages cannot flip its decision; the labels are the same as predict_records().
+        Returns: (predicted labels, model version, trees evaluated per record or None without early exit)
+        """
+        
+        try:
+            model_handle = self.get_model_handle()
+            
+            if not self.prediction_pipeline_config.early_exit_enabled or model_handle.compiled_model is None:
+                labels, _, model_version = self.predict_records(records=records)
+                return labels, model_version, None
+            
+            self._check_batch_size(len(records))
+            
+            # A cached single record is answered from the cache; early-exit results carry no probability, so they are not cached
+            if self.prediction_cache is not None and len(records) == 1:
+                cached_result = self.prediction_cache.get(canonical_record_key(records[0]), model_handle.version)
+                
+                if cached_result is not None:
+                    return np.array([cached_result[0]]), model_handle.version, None
+            
+            X_prod = self._transform_records(model_handle, records)
+            
+            start_time = time.perf_counter()
+            labels, n_trees_evaluated = model_handle.compiled_model.predict_early_exit(
+                                            X_prod, stages_per_check=self.prediction_pipeline_config.early_exit_stages_per_check)
+            self.serving_metrics.observe_stage("predict", time.perf_counter() - start_time)
+            
+            return labels, model_handle.version, n_trees_evaluated
+        
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+
+    def explain_records(self, records: List[dict]) -> Tuple[List[dict], str]:
+        
+        """
+        This method explains the prediction of applicant records with TreeSHAP over the compiled trees.
+        The contributions of the one-hot output columns are summed back into their ohe_features column, so every
+        raw field gets one contribution (log-odds of Certified); base_value + their sum is the raw model output.
+        Explanations are cached alongside the predictions, per record and model version.
+        Returns: (list of {"prediction", "probability_certified", "base_value", "contributions"}, model version)
+        """
+        
+        try:
+            self._check_batch_size(len(records))
+            
+            model_handle = self.get_model_handle()
+            
+            if model_handle.tree_explainer is None or model_handle.compiled_encoder is None:
+                raise ValueError(f"Explanations are not available for model version {model_handle.version}")
+            
+            explanations = [None] * len(records)
+            keys = None
+            
+            if self.prediction_cache is not None and len(records) <= self.prediction_cache.max_records_per_call:
+                keys = [canonical_record_key(record) for record in records]
+                
+                for index, key in enumerate(keys):
+                    explanations[index] = self.prediction_cache.get_explanation(key, model_handle.version)
+            
+            miss_indices = [index for index, explanation in enumerate(explanations) if explanation is None]
+            
+            if miss_indices:
+                X_prod = self._transform_records(model_handle, [records[index] for index in miss_indices])
+                labels, probabilities, _ = self._predict_transformed(model_handle, X_prod)
+                
+                start_time = time.perf_counter()
+                
+                # Output column -> raw column : one-hot columns are summed into their ohe_features column
+                output_columns = model_handle.compiled_encoder.output_columns
+                columns = list(dict.fromkeys(output_columns))
+                
+                column_indicator = np.zeros((len(output_columns), len(columns)), dtype=np.float64)
+                column_indicator[np.arange(len(output_columns)), [columns.index(column) for column in output_columns]] = 1.0
+                
+                contributions = model_handle.tree_explainer.shap_values(X_prod) @ column_indicator
+                
+                self.serving_metrics.observe_stage("explain", time.perf_counter() - start_time)
+                
+                for row, index in enumerate(miss_indices):
+                    explanation = {"prediction": float(labels[row]),
+                                   "probability_certified": float(probabilities[row]),
+                                   "base_value": model_handle.tree_explainer.expected_value,
+                                   "contributions": dict(zip(columns, contributions[row].tolist()))}
+                    explanations[index] = explanation
+                    
+                    if keys is not None:
+                        self.prediction_cache.put_explanation(keys[index], model_handle.version, explanation)
+                        self.prediction_cache.put(keys[index], model_handle.version, float(labels[row]), float(probabilities[row]))
+            
+            return explanations, model_handle.version
+        
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+
+    def predict_grid(self, base_record: dict, sweeps: Dict[str, list]) -> Tuple[np.ndarray, np.ndarray, str]:
+        
+        """
+        This method scores every combination of the sweep values applied to one applicant record
+        with a single transform and a single predict_proba call (see USvisaData.get_usvisa_grid_data_frame).
+        Returns: (predicted labels, Certified probabilities, model version) in row-major grid order
+        """
+        
+        try:
+            self._check_batch_size(int(np.prod([len(values) for values in sweeps.values()])))
+            
+            start_time = time.perf_counter()
+            dataframe = USvisaData.get_usvisa_grid_data_frame(base_record=base_record, sweeps=sweeps)
+            self.serving_metrics.observe_stage("dataframe_construction", time.perf_counter() - start_time)
+            
+            return self.predict_batch(dataframe)
+        
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+
+    def find_similar_cases(self, records: List[dict], k: int) -> Tuple[List[List[dict]], np.ndarray, np.ndarray, str]:
+        
+        """
+        This method returns, for every applicant record, the k most similar historical applications
+        (nearest in the encoded feature space) with their outcome, nearest first, and scores the records
+        with the same model handle and encoding : the decision and the neighbours come from one model version.
+        Returns: (list of similar cases per record, predicted labels, Certified probabilities, model version)
+        """
+        
+        try:
+            self._check_batch_size(len(records))
+            
+            if not 1 <= k <= self.prediction_pipeline_config.similar_cases_max_k:
+                raise ValueError(f"k must be between 1 and {self.prediction_pipeline_config.similar_cases_max_k}")
+            
+            model_handle = self.get_model_handle()
+            
+            if model_handle.case_index is None:
+                raise ValueError(f"No case index is available for model version {model_handle.version}")
+            
+            X_prod = self._transform_records(model_handle, records)
+            
+            start_time = time.perf_counter()
+            
+            similar_cases = []
+            for x in X_prod:
+                rows, squared_distances = model_handle.case_index.query(x, k)
+                similar_cases.append([model_handle.case_index.get_case(row, squared_distance)
+                                      for row, squared_distance in zip(rows, squared_distances)])
+            
+            self.serving_metrics.observe_stage("neighbour_search", time.perf_counter() - start_time)
+            
+            labels, probabilities, model_version = self._predict_transformed(model_handle, X_prod)
+            
+            return similar_cases, labels, probabilities, model_version
+        
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+
+    def predict_records(self, records: List[dict]) -> Tuple[np.ndarray, np.ndarray, str]:
+        
+        """
+        This method scores applicant records (dicts with the USvisaData fields).
+        Records already in the prediction cache are not scored again; a single remaining record is encoded
+        by the compiled encoder, batches and records with unseen categories go through the data preprocessor.
+        Returns: (predicted labels, positive class (Certified) probabilities, model version) in input order
+        """
+        
+        try:
+            self._check_batch_size(len(records))
+            
+            model_handle = self.get_model_handle()
+            
+            if self.prediction_cache is None or len(records) > self.prediction_cache.max_records_per_call:
+                return self._score_records(model_handle, records)
+            
+            keys = [canonical_record_key(record) for record in records]
+            
+            labels = np.empty(len(records), dtype=np.float64)
+            probabilities = np.empty(len(records), dtype=np.float64)
+            miss_indices = []
+            
+            for index, key in enumerate(keys):
+                cached_result = self.prediction_cache.get(key, model_handle.version)
+                
+                if cached_result is None:
+                    miss_indices.append(index)
+                else:
+                    labels[index], probabilities[index] = cached_result
+            
+            if miss_indices:
+                miss_labels, miss_probabilities, _ = self._score_records(model_handle, [records[index] for index in miss_indices])
+                
+                for index, label, probability in zip(miss_indices, miss_labels, miss_probabilities):
+                    labels[index], probabilities[index] = label, probability
+                    self.prediction_cache.put(keys[index], model_handle.version, float(label), float(probability))
+            
+            return labels, probabilities, model_handle.version
+        
+        except Exception as e:
+            raise USvisaException(e, sys) from e
         
         
\ No newline at end of file
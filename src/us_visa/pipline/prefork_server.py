@@ -0,0 +1,129 @@
+import os, sys
+import gc
+import time
+import signal
+from typing import Callable, Optional, Set
+
+import uvicorn
+
+from us_visa.entity.config_entity import PreforkServerConfig
+
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+
+
+class PreforkServer:
+
+    """
+    This class serves the app from n_workers processes forked from one parent, all accepting on one listening socket.
+
+    The parent loads the model before forking, so every worker inherits the same ModelHandle. What stays shared
+    depends on the model artifact format (MODEL_ARTIFACT_FORMAT, "mmap" by default in this mode) :
+    - "mmap" : the encoder and the flattened trees are read-only views on the mapped file, used for every batch size.
+      Their pages live in the OS page cache, so they stay shared, and a hot swap maps the new file in every worker
+      without a private copy.
+    - "pickle" : only the NumPy buffers (CompiledEncoder parameters, CompiledGradientBoosting tree arrays) stay
+      shared, for batches of up to compiled_ensemble_max_rows rows. Larger batches and every DataFrame transform
+      go through the sklearn objects, whose reference counts dirty the pages they touch; after a hot swap each
+      worker unpickles its own private copy of the new pair.
+    gc.freeze() keeps the garbage collector from touching the inherited objects.
+    """
+
+    def __init__(self, app, host: str, port: int,
+                 prefork_server_config: PreforkServerConfig = PreforkServerConfig(),
+                 preload: Optional[Callable[[], object]] = None):
+
+        """
+        :param app: ASGI application served by every worker
+        :param host: Interface to bind
+        :param port: Port to bind
+        :param prefork_server_config: Number of worker processes
+        :param preload: Called in the parent before forking (loads the model)
+        """
+
+        self.app = app
+        self.host = host
+        self.port = port
+        self.prefork_server_config = prefork_server_config
+        self.preload = preload
+
+        self._worker_pids: Set[int] = set()
+        self._stopping = False
+
+
+    def _start_worker(self, listening_socket) -> int:
+
+        pid = os.fork()
+
+        if pid == 0:
+            exit_code = 0
+
+            try:
+                # uvicorn installs its own SIGINT / SIGTERM handlers for a graceful shutdown of the worker
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+                uvicorn.Server(uvicorn.Config(self.app, host=self.host, port=self.port)).run(sockets=[listening_socket])
+
+            except BaseException as e:
+                logging.error(f"Serving worker {os.getpid()} failed : {e}")
+                exit_code = 1
+
+            finally:
+                os._exit(exit_code)
+
+        logging.info(f"Started serving worker {pid}")
+
+        return pid
+
+
+    def _stop_workers(self, signum, frame) -> None:
+
+        self._stopping = True
+
+        for pid in self._worker_pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+
+    def run(self) -> None:
+
+        """
+        This method preloads the model, forks the workers and restarts any worker that dies, until SIGINT / SIGTERM.
+        """
+
+        try:
+            if self.preload is not None:
+                self.preload()
+
+            listening_socket = uvicorn.Config(self.app, host=self.host, port=self.port).bind_socket()
+
+            # Objects created so far (the model) are never scanned by the garbage collector of the workers
+            gc.freeze()
+
+            for _ in range(self.prefork_server_config.n_workers):
+                self._worker_pids.add(self._start_worker(listening_socket))
+
+            signal.signal(signal.SIGINT, self._stop_workers)
+            signal.signal(signal.SIGTERM, self._stop_workers)
+
+            while self._worker_pids:
+                pid, status = os.wait()
+                self._worker_pids.discard(pid)
+
+                if not self._stopping:
+                    logging.warning(f"Serving worker {pid} exited with status {status}, starting a new one")
+
+                    # A worker failing at startup must not turn into a fork loop
+                    time.sleep(self.prefork_server_config.restart_delay_seconds)
+                    self._worker_pids.add(self._start_worker(listening_socket))
+
+            listening_socket.close()
+
+            logging.info("All serving workers stopped")
+
+        except Exception as e:
+            raise USvisaException(e, sys) from e
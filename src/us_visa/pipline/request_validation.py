@@ -0,0 +1,201 @@
+import sys
+import math
+import threading
+from collections.abc import Hashable
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from us_visa.constants import SCHEMA_FILEPATH
+from us_visa.pipline.model_registry import ModelHandle
+from us_visa.pipline.prediction_pipeline import USvisaClassifier
+from us_visa.utils.main_utils import read_yaml_file
+
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+
+
+class ValidationRules:
+
+    """
+    Validation rules compiled for one model version : the allowed levels of every ohe_features column
+    (categories learned by the fitted OneHotEncoder) and the type / range of every num_features column
+    (request_validation section of config/schema.yaml).
+    """
+
+    def __init__(self, version: str, category_sets: Dict[str, FrozenSet], numeric_rules: Dict[str, Tuple[type, float, float]]):
+
+        """
+        :param version: Model version the category sets were learned by
+        :param category_sets: ohe column -> allowed categories
+        :param numeric_rules: numerical column -> (int or float, min, max)
+        """
+
+        self.version = version
+        self.category_sets = category_sets
+        self.numeric_rules = numeric_rules
+
+        self._category_items = list(category_sets.items())
+        self._numeric_items = list(numeric_rules.items())
+
+
+    def validate_record(self, record: dict) -> Tuple[dict, List[dict]]:
+
+        """
+        This method checks every field of one applicant record and keeps going after the first error.
+        Returns: (record with numerical values converted to int / float, list of {"field", "error"})
+        """
+
+        field_errors = []
+        clean_record = dict(record)
+
+        for column, allowed_categories in self._category_items:
+            value = record.get(column)
+
+            if value is None:
+                field_errors.append({"field": column, "error": "field required"})
+
+            elif not isinstance(value, Hashable) or value not in allowed_categories:
+                field_errors.append({"field": column,
+                                     "error": f"unknown value {value!r}, expected one of {sorted(allowed_categories)}"})
+
+        for column, (value_type, min_value, max_value) in self._numeric_items:
+            value = record.get(column)
+
+            if value is None or value == "":
+                field_errors.append({"field": column, "error": "field required"})
+                continue
+
+            try:
+                # bool is an int subclass
+                if isinstance(value, bool):
+                    raise ValueError
+
+                number = float(value)
+
+                if not math.isfinite(number):
+                    raise ValueError
+
+                # 5.0 or "5.0" is accepted as 5 (like the pydantic int fields of /predict/batch), 12.5 must not silently become 12
+                if value_type is int:
+                    if not number.is_integer():
+                        raise ValueError
+
+                    number = value if isinstance(value, int) else int(number)
+
+            except (TypeError, ValueError, OverflowError):
+                field_errors.append({"field": column, "error": f"{value!r} is not a valid {value_type.__name__}"})
+                continue
+
+            if not min_value <= number <= max_value:
+                field_errors.append({"field": column, "error": f"{number} is outside [{min_value}, {max_value}]"})
+                continue
+
+            clean_record[column] = number
+
+        return clean_record, field_errors
+
+
+
+class RequestValidator:
+
+    """
+    This class validates prediction requests before any model work : payloads with unknown categories,
+    non-numerical values or out-of-range numbers are rejected with all their field errors at once.
+
+    The rules are compiled once per model version (a new model can learn new category levels);
+    a request only does set-membership and range checks.
+    """
+
+    def __init__(self, model_predictor: USvisaClassifier, schema_filepath: str = SCHEMA_FILEPATH):
+
+        """
+        :param model_predictor: Serving classifier, gives the ModelHandle the category levels are read from
+        :param schema_filepath: config/schema.yaml (ohe_features, num_features, request_validation)
+        """
+
+        try:
+            self.model_predictor = model_predictor
+
+            schema_config = read_yaml_file(filepath=schema_filepath)
+
+            self.ohe_features = schema_config["ohe_features"]
+
+            self.numeric_rules = {}
+            for column in schema_config["num_features"]:
+                column_rule = schema_config.get("request_validation", {}).get(column, {})
+
+                self.numeric_rules[column] = ({"int": int, "float": float}[column_rule.get("type", "float")],
+                                              column_rule.get("min", -math.inf),
+                                              column_rule.get("max", math.inf))
+
+            self._rules: Optional[ValidationRules] = None
+            self._compile_lock = threading.Lock()
+
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+
+    def compile_rules(self, model_handle: ModelHandle) -> ValidationRules:
+
+        """
+        This method reads the category levels of the ohe_features columns from the compiled encoder
+        (or the fitted OneHotEncoder of the data preprocessor) of the given model version.
+        """
+
+        category_levels = {}
+
+        if model_handle.compiled_encoder is not None:
+            category_levels.update(zip(model_handle.compiled_encoder.ohe_columns, model_handle.compiled_encoder.ohe_category_maps))
+
+        else:
+            for _, transformer, columns in model_handle.data_preprocessor.transformers_:
+                if hasattr(transformer, "categories_"):
+                    category_levels.update(zip(columns, transformer.categories_))
+
+        category_sets = {column: frozenset(category_levels[column]) for column in self.ohe_features}
+
+        logging.info(f"Compiled request validation rules for model version {model_handle.version}")
+
+        return ValidationRules(version=model_handle.version, category_sets=category_sets, numeric_rules=self.numeric_rules)
+
+
+    def get_rules(self) -> ValidationRules:
+
+        # The handle currently served : validation never triggers a disk check or a model reload itself
+        model_handle = self.model_predictor.model_registry.get_current_handle()
+
+        if model_handle is None:
+            model_handle = self.model_predictor.get_model_handle()
+
+        rules = self._rules
+        if rules is None or rules.version != model_handle.version:
+            with self._compile_lock:
+                rules = self._rules
+                if rules is None or rules.version != model_handle.version:
+                    rules = self._rules = self.compile_rules(model_handle)
+
+        return rules
+
+
+    def validate_records(self, records: List[dict]) -> Tuple[List[dict], List[dict]]:
+
+        """
+        This method validates a batch of applicant records.
+        Returns: (records with converted numerical values, list of {"index", "field", "error"} for every invalid field)
+        """
+
+        try:
+            rules = self.get_rules()
+
+            clean_records, field_errors = [], []
+
+            for index, record in enumerate(records):
+                clean_record, record_errors = rules.validate_record(record)
+
+                clean_records.append(clean_record)
+                field_errors.extend({"index": index, **field_error} for field_error in record_errors)
+
+            return clean_records, field_errors
+
+        except Exception as e:
+            raise USvisaException(e, sys) from e
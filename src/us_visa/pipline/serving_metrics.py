@@ -0,0 +1,147 @@
+import threading
+from bisect import bisect_left
+from typing import List, Tuple
+
+from us_visa.constants import SERVING_METRICS_STAGES, SERVING_METRICS_LATENCY_BUCKETS
+
+
+
+class LatencyHistogram:
+
+    """
+    Fixed-bucket latency histogram (seconds), allocated once.
+    counts[i] is the number of observations <= buckets[i] (and > buckets[i - 1]); the last slot counts everything above.
+    """
+
+    def __init__(self, buckets: List[float]):
+
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+
+
+class ServingMetrics:
+
+    """
+    This class keeps the latency histogram of every stage of the serving path (SERVING_METRICS_STAGES)
+    and the request / error count of every route, and renders them in the Prometheus text format.
+
+    Everything is allocated up front : an observation is a dict lookup, a bisect and three increments.
+    With buffered=True (process pool workers), stage observations are only queued, to be returned with
+    the scoring result and recorded by the serving process (drain_stage_observations / record_stage_observations).
+    """
+
+    def __init__(self, buffered: bool = False):
+
+        """
+        :param buffered: Queue the stage observations instead of recording them
+        """
+
+        self.buffered = buffered
+
+        self.stage_histograms = {stage: LatencyHistogram(SERVING_METRICS_LATENCY_BUCKETS) for stage in SERVING_METRICS_STAGES}
+        self.request_counts = {}
+        self.error_counts = {}
+
+        # Early-exit scoring : trees evaluated and records scored (their ratio is the average number of trees)
+        self.early_exit_trees_evaluated = 0
+        self.early_exit_records = 0
+
+        self._pending_stage_observations: List[Tuple[str, float]] = []
+        self._lock = threading.Lock()
+
+
+    def observe_stage(self, stage: str, seconds: float) -> None:
+
+        with self._lock:
+            if self.buffered:
+                self._pending_stage_observations.append((stage, seconds))
+            else:
+                self.stage_histograms[stage].observe(seconds)
+
+
+    def drain_stage_observations(self) -> List[Tuple[str, float]]:
+
+        """
+        Returns and forgets the queued stage observations (always empty when not buffered).
+        """
+
+        with self._lock:
+            stage_observations = self._pending_stage_observations
+            self._pending_stage_observations = []
+
+        return stage_observations
+
+
+    def record_stage_observations(self, stage_observations: List[Tuple[str, float]]) -> None:
+
+        with self._lock:
+            for stage, seconds in stage_observations:
+                self.stage_histograms[stage].observe(seconds)
+
+
+    def count_request(self, route: str) -> None:
+
+        with self._lock:
+            self.request_counts[route] = self.request_counts.get(route, 0) + 1
+
+
+    def count_error(self, route: str) -> None:
+
+        with self._lock:
+            self.error_counts[route] = self.error_counts.get(route, 0) + 1
+
+
+    def count_trees_evaluated(self, n_trees_evaluated: List[int]) -> None:
+
+        with self._lock:
+            self.early_exit_trees_evaluated += sum(n_trees_evaluated)
+            self.early_exit_records += len(n_trees_evaluated)
+
+
+    def render_prometheus(self) -> str:
+
+        """
+        This method returns all the metrics in the Prometheus text exposition format (version 0.0.4).
+        """
+
+        lines = ["# HELP usvisa_stage_latency_seconds Latency of each stage of the serving path",
+                 "# TYPE usvisa_stage_latency_seconds histogram"]
+
+        with self._lock:
+            for stage, histogram in self.stage_histograms.items():
+                cumulative_count = 0
+
+                for bucket, count in zip(histogram.buckets, histogram.counts):
+                    cumulative_count += count
+                    lines.append(f'usvisa_stage_latency_seconds_bucket{{stage="{stage}",le="{bucket}"}} {cumulative_count}')
+
+                lines.append(f'usvisa_stage_latency_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'usvisa_stage_latency_seconds_sum{{stage="{stage}"}} {histogram.total}')
+                lines.append(f'usvisa_stage_latency_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+            lines.append("# HELP usvisa_requests_total Requests received per route")
+            lines.append("# TYPE usvisa_requests_total counter")
+            lines.extend(f'usvisa_requests_total{{route="{route}"}} {count}' for route, count in self.request_counts.items())
+
+            lines.append("# HELP usvisa_request_errors_total Requests that failed per route")
+            lines.append("# TYPE usvisa_request_errors_total counter")
+            lines.extend(f'usvisa_request_errors_total{{route="{route}"}} {count}' for route, count in self.error_counts.items())
+
+            lines.append("# HELP usvisa_early_exit_trees_evaluated_total Trees evaluated by early-exit scoring")
+            lines.append("# TYPE usvisa_early_exit_trees_evaluated_total counter")
+            lines.append(f"usvisa_early_exit_trees_evaluated_total {self.early_exit_trees_evaluated}")
+
+            lines.append("# HELP usvisa_early_exit_records_total Records scored with early exit")
+            lines.append("# TYPE usvisa_early_exit_records_total counter")
+            lines.append(f"usvisa_early_exit_records_total {self.early_exit_records}")
+
+        return "\n".join(lines) + "\n"
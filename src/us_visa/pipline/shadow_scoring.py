@@ -0,0 +1,411 @@
+import os
+import sys
+import time
+import random
+import asyncio
+from pathlib import Path
+from dataclasses import replace
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from us_visa.constants import (DATA_TRANSFORMATION_OBJECT_FILENAME, S3_PRODUCTION_MODEL_NAME, S3_PRODUCTION_MMAP_ARTIFACT_NAME,
+                               S3_PRODUCTION_CASE_INDEX_NAME, PRODUCTION_MODEL_MANIFEST_NAME, SERVING_METRICS_LATENCY_BUCKETS, SHADOW_WORKER_NICENESS)
+from us_visa.entity.config_entity import ShadowScoringConfig, USvisaPredictorConfig, PredictionCacheConfig
+from us_visa.pipline.inference_executor import InferenceExecutor
+from us_visa.pipline.prediction_pipeline import USvisaClassifier
+from us_visa.pipline.serving_metrics import ServingMetrics, LatencyHistogram
+
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+
+
+# Outcomes of a sampled request
+SHADOW_OUTCOMES = ["scored", "shed_production_load", "shed_queue_full", "too_large", "no_candidate", "error"]
+
+
+# Global variables : production replica and candidate classifiers of the shadow worker process
+_shadow_production_predictor: Optional[USvisaClassifier] = None
+_shadow_candidate_predictor: Optional[USvisaClassifier] = None
+
+
+def _init_shadow_worker(production_predictor_config: USvisaPredictorConfig, candidate_predictor_config: USvisaPredictorConfig) -> None:
+
+    """
+    Shadow process initializer : lowest CPU priority, so that the scheduler only runs the shadow work on the CPU time
+    the serving process leaves idle. Both models are loaded here, so that no timed call pays for the loading.
+    """
+
+    global _shadow_production_predictor, _shadow_candidate_predictor
+
+    if hasattr(os, "nice"):
+        os.nice(SHADOW_WORKER_NICENESS)
+
+    # Own stage histograms, never read : the shadow timings must not land in the production ones.
+    # No prediction cache : a cache hit would time a dictionary lookup instead of the model
+    _shadow_production_predictor = USvisaClassifier(prediction_pipeline_config=production_predictor_config,
+                                                    serving_metrics=ServingMetrics(),
+                                                    prediction_cache_config=PredictionCacheConfig(enabled=False))
+    _shadow_candidate_predictor = USvisaClassifier(prediction_pipeline_config=candidate_predictor_config,
+                                                   serving_metrics=ServingMetrics(),
+                                                   prediction_cache_config=PredictionCacheConfig(enabled=False))
+
+    _shadow_production_predictor.get_model_handle()
+    _shadow_candidate_predictor.get_model_handle()
+
+
+def _timed_scoring(model_predictor: USvisaClassifier, records: List[dict], with_probabilities: bool) -> Tuple[list, Optional[list], str, float]:
+
+    # CPU time of this thread : unaffected by the preemptions of a low priority process
+    start_time = time.thread_time()
+
+    if with_probabilities:
+        labels, probabilities, model_version = model_predictor.predict_records(records=records)
+        probabilities = probabilities.tolist()
+
+    else:
+        labels, model_version, _ = model_predictor.predict_record_labels(records=records)
+        probabilities = None
+
+    return labels.tolist(), probabilities, model_version, time.thread_time() - start_time
+
+
+def score_shadow(records: List[dict], with_probabilities: bool) -> Tuple[list, Optional[list], str, float, float]:
+
+    """
+    Runs inside the shadow process : scores the records with the candidate, and times the same call
+    (probabilities or labels only, like production) on the production replica for the latency comparison.
+    Returns: (candidate labels, Certified probabilities or None, candidate model version, candidate seconds, production seconds)
+    """
+
+    # A model changed on disk is reloaded here, outside the timed calls
+    _shadow_candidate_predictor.get_model_handle()
+    _shadow_production_predictor.get_model_handle()
+
+    labels, probabilities, model_version, candidate_seconds = _timed_scoring(_shadow_candidate_predictor, records, with_probabilities)
+    _, _, _, production_seconds = _timed_scoring(_shadow_production_predictor, records, with_probabilities)
+
+    return labels, probabilities, model_version, candidate_seconds, production_seconds
+
+
+
+class ShadowComparison:
+
+    """
+    Production vs candidate agreement and scoring latencies for one (production version, candidate version) pair.
+    """
+
+    def __init__(self, production_version: str, candidate_version: str):
+
+        self.production_version = production_version
+        self.candidate_version = candidate_version
+        self.since = time.time()
+
+        self.records = 0
+        self.agreements = 0
+        self.production_certified = 0
+        self.candidate_certified = 0
+
+        # Only requests scored with probabilities (the form route predicts labels only)
+        self.probability_records = 0
+        self.probability_abs_diff_sum = 0.0
+        self.probability_abs_diff_max = 0.0
+
+        self.production_latency = LatencyHistogram(SERVING_METRICS_LATENCY_BUCKETS)
+        self.candidate_latency = LatencyHistogram(SERVING_METRICS_LATENCY_BUCKETS)
+
+
+    def observe(self, labels: np.ndarray, candidate_labels: np.ndarray,
+                probabilities: Optional[np.ndarray], candidate_probabilities: Optional[np.ndarray],
+                production_seconds: float, candidate_seconds: float) -> None:
+
+        self.records += labels.shape[0]
+        self.agreements += int(np.count_nonzero(labels == candidate_labels))
+        self.production_certified += int(np.count_nonzero(labels == 1))
+        self.candidate_certified += int(np.count_nonzero(candidate_labels == 1))
+
+        if probabilities is not None:
+            probability_abs_diff = np.abs(probabilities - candidate_probabilities)
+
+            self.probability_records += probability_abs_diff.shape[0]
+            self.probability_abs_diff_sum += float(probability_abs_diff.sum())
+            self.probability_abs_diff_max = max(self.probability_abs_diff_max, float(probability_abs_diff.max()))
+
+        self.production_latency.observe(production_seconds)
+        self.candidate_latency.observe(candidate_seconds)
+
+
+    def as_dict(self) -> dict:
+
+        requests = self.candidate_latency.count
+
+        return {"production_version": self.production_version,
+                "candidate_version": self.candidate_version,
+                "since": self.since,
+                "requests": requests,
+                "records": self.records,
+                "agreement_rate": self.agreements / self.records if self.records else None,
+                "production_certified_rate": self.production_certified / self.records if self.records else None,
+                "candidate_certified_rate": self.candidate_certified / self.records if self.records else None,
+                "mean_probability_abs_diff": self.probability_abs_diff_sum / self.probability_records if self.probability_records else None,
+                "max_probability_abs_diff": self.probability_abs_diff_max if self.probability_records else None,
+                "production_latency_mean_seconds": self.production_latency.total / requests if requests else None,
+                "candidate_latency_mean_seconds": self.candidate_latency.total / requests if requests else None,
+                "latency_delta_mean_seconds": (self.candidate_latency.total - self.production_latency.total) / requests if requests else None}
+
+
+
+class ShadowScorer:
+
+    """
+    This class shadow-scores a candidate model (staged in candidate_model_dir with the file names of the production pair)
+    on a sample of the live prediction traffic, to compare it with the production model before promoting it.
+
+    The routes hand their validated records and production results to submit() as a background task, which runs
+    once the response has been sent : submit() only samples and queues. One worker coroutine scores the queued
+    requests with the candidate in a single shadow process running at the lowest CPU priority, never on the
+    production inference pool (a thread would compete for the GIL), and records agreement rate and probability
+    differences against the production results per version pair.
+
+    The shadow process is only started once a candidate is staged : until then a sampled request is dropped as no_candidate.
+    Candidate work is shed first : a sampled request is dropped when production calls are running on the
+    inference pool (checked when it is sampled and again before it is scored) or when the queue is full.
+    Latencies : the shadow process times the same scoring call on the candidate and on a replica of the production
+    model, in CPU time, so that the delta only reflects the models (not the load or the priority of the process).
+    """
+
+    def __init__(self, inference_executor: InferenceExecutor,
+                 shadow_scoring_config: ShadowScoringConfig = ShadowScoringConfig()):
+
+        """
+        :param inference_executor: Production pool : its calls in flight are the load signal of the shedding
+        :param shadow_scoring_config: Candidate directory, sample rate and shedding limits
+        """
+
+        try:
+            self.inference_executor = inference_executor
+            self.shadow_scoring_config = shadow_scoring_config
+
+            candidate_model_dir = Path(shadow_scoring_config.candidate_model_dir)
+
+            # No TreeSHAP tables in the shadow process
+            self.production_predictor_config = replace(inference_executor.model_predictor.prediction_pipeline_config,
+                                                       explanations_enabled=False)
+
+            # Pickles only : the candidate is loaded once by the shadow process, without TreeSHAP tables or case index
+            self.candidate_predictor_config = USvisaPredictorConfig(
+                data_preprocessor_filepath_local=candidate_model_dir / DATA_TRANSFORMATION_OBJECT_FILENAME,
+                pred_model_filepath_local=candidate_model_dir / S3_PRODUCTION_MODEL_NAME,
+                production_manifest_filepath_local=candidate_model_dir / PRODUCTION_MODEL_MANIFEST_NAME,
+                mmap_artifact_filepath_local=candidate_model_dir / S3_PRODUCTION_MMAP_ARTIFACT_NAME,
+                case_index_filepath_local=candidate_model_dir / S3_PRODUCTION_CASE_INDEX_NAME,
+                model_artifact_format="pickle",
+                explanations_enabled=False)
+
+            self.outcome_counts = {outcome: 0 for outcome in SHADOW_OUTCOMES}
+            self.comparison: Optional[ShadowComparison] = None
+
+            self._queue: Optional[asyncio.Queue] = None
+            self._worker_task: Optional[asyncio.Task] = None
+            self._executor: Optional[ProcessPoolExecutor] = None
+
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+
+    def has_candidate(self) -> bool:
+
+        return (self.candidate_predictor_config.data_preprocessor_filepath_local.exists()
+                and self.candidate_predictor_config.pred_model_filepath_local.exists())
+
+
+    async def start(self) -> None:
+
+        """
+        This method starts the worker coroutine on the running event loop; the shadow process itself is started
+        by the first request scored once a candidate is staged.
+        """
+
+        if self._worker_task is None:
+            self._queue = asyncio.Queue(maxsize=self.shadow_scoring_config.max_pending)
+            self._worker_task = asyncio.create_task(self._run_worker())
+
+            logging.info(f"Started shadow scoring with {self.shadow_scoring_config}, "
+                         f"candidate {'found' if self.has_candidate() else 'not staged yet'} in {self.shadow_scoring_config.candidate_model_dir}")
+
+
+    async def stop(self) -> None:
+
+        """
+        This method stops the worker; queued requests are dropped.
+        """
+
+        if self._worker_task is not None:
+            self._worker_task.cancel()
+
+            try:
+                await self._worker_task
+            except asyncio.CancelledError:
+                pass
+
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+
+            self._worker_task = None
+            self._executor = None
+
+
+    def _is_production_loaded(self) -> bool:
+
+        return self.inference_executor.in_flight > self.shadow_scoring_config.max_production_in_flight
+
+
+    async def submit(self, records: List[dict], labels: list, probabilities: Optional[list], model_version: str) -> None:
+
+        """
+        This method samples one scored request for the candidate. Meant to run as the background task of the response.
+        :param records: Validated applicant records
+        :param labels: Production labels
+        :param probabilities: Production Certified probabilities, None when production predicted the labels only
+        :param model_version: Production model version
+        """
+
+        if self._worker_task is None or random.random() >= self.shadow_scoring_config.sample_rate:
+            return
+
+        if len(records) > self.shadow_scoring_config.max_records:
+            self.outcome_counts["too_large"] += 1
+            return
+
+        if self._is_production_loaded():
+            self.outcome_counts["shed_production_load"] += 1
+            return
+
+        if not self.has_candidate():
+            self.outcome_counts["no_candidate"] += 1
+            return
+
+        try:
+            self._queue.put_nowait((records, labels, probabilities, model_version))
+        except asyncio.QueueFull:
+            self.outcome_counts["shed_queue_full"] += 1
+
+
+    async def _score_request(self, records: List[dict], labels: list, probabilities: Optional[list], model_version: str) -> None:
+
+        # Production traffic arrived while the request was queued : the candidate backs off
+        if self._is_production_loaded():
+            self.outcome_counts["shed_production_load"] += 1
+            return
+
+        if not self.has_candidate():
+            self.outcome_counts["no_candidate"] += 1
+            return
+
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=1, initializer=_init_shadow_worker,
+                                                 initargs=(self.production_predictor_config, self.candidate_predictor_config))
+            logging.info(f"Started the shadow process for the candidate staged in {self.shadow_scoring_config.candidate_model_dir}")
+
+        try:
+            (candidate_labels, candidate_probabilities, candidate_version,
+             candidate_seconds, production_seconds) = await asyncio.get_running_loop().run_in_executor(self._executor, score_shadow,
+                                                                                                       records, probabilities is not None)
+
+        except Exception as e:
+            self.outcome_counts["error"] += 1
+            logging.warning(f"Shadow scoring of the candidate model failed : {e}")
+
+            # e.g. the candidate was removed before the process could load it : restarted by the next request
+            if isinstance(e, BrokenProcessPool):
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+            return
+
+        # A new production or candidate version starts a new comparison
+        if (self.comparison is None or self.comparison.production_version != model_version
+                or self.comparison.candidate_version != candidate_version):
+
+            if self.comparison is not None:
+                logging.info(f"Shadow scoring comparison closed : {self.comparison.as_dict()}")
+
+            self.comparison = ShadowComparison(production_version=model_version, candidate_version=candidate_version)
+
+        self.comparison.observe(labels=np.asarray(labels), candidate_labels=np.asarray(candidate_labels),
+                                probabilities=None if probabilities is None else np.asarray(probabilities),
+                                candidate_probabilities=None if candidate_probabilities is None else np.asarray(candidate_probabilities),
+                                production_seconds=production_seconds, candidate_seconds=candidate_seconds)
+
+        self.outcome_counts["scored"] += 1
+
+
+    async def _run_worker(self) -> None:
+
+        while True:
+            shadow_request = await self._queue.get()
+
+            try:
+                await self._score_request(*shadow_request)
+
+            except Exception as e:
+                self.outcome_counts["error"] += 1
+                logging.error(f"Shadow scoring worker failed : {USvisaException(e, sys)}")
+
+
+    def get_stats(self) -> dict:
+
+        return {"enabled": self.shadow_scoring_config.enabled,
+                "candidate_staged": self.has_candidate(),
+                "sample_rate": self.shadow_scoring_config.sample_rate,
+                "pending": self._queue.qsize() if self._queue is not None else 0,
+                "requests": dict(self.outcome_counts),
+                "comparison": None if self.comparison is None else self.comparison.as_dict()}
+
+
+    def render_prometheus(self) -> str:
+
+        """
+        This method returns the shadow scoring metrics in the Prometheus text exposition format (version 0.0.4).
+        """
+
+        lines = ["# HELP usvisa_shadow_requests_total Requests sampled for the candidate model per outcome",
+                 "# TYPE usvisa_shadow_requests_total counter"]
+        lines.extend(f'usvisa_shadow_requests_total{{outcome="{outcome}"}} {count}' for outcome, count in self.outcome_counts.items())
+
+        comparison = self.comparison
+        if comparison is None:
+            return "\n".join(lines) + "\n"
+
+        versions = f'production_version="{comparison.production_version}",candidate_version="{comparison.candidate_version}"'
+
+        lines.append("# HELP usvisa_shadow_records_total Records scored by both the production and the candidate model")
+        lines.append("# TYPE usvisa_shadow_records_total counter")
+        lines.append(f"usvisa_shadow_records_total{{{versions}}} {comparison.records}")
+
+        lines.append("# HELP usvisa_shadow_agreements_total Records with the same label from both models")
+        lines.append("# TYPE usvisa_shadow_agreements_total counter")
+        lines.append(f"usvisa_shadow_agreements_total{{{versions}}} {comparison.agreements}")
+
+        lines.append("# HELP usvisa_shadow_probability_abs_diff_sum Sum of the absolute Certified probability differences")
+        lines.append("# TYPE usvisa_shadow_probability_abs_diff_sum counter")
+        lines.append(f"usvisa_shadow_probability_abs_diff_sum{{{versions}}} {comparison.probability_abs_diff_sum}")
+
+        lines.append("# HELP usvisa_shadow_scoring_latency_seconds CPU time of the scoring call of the shadowed requests per model")
+        lines.append("# TYPE usvisa_shadow_scoring_latency_seconds histogram")
+
+        for model, histogram in (("production", comparison.production_latency), ("candidate", comparison.candidate_latency)):
+            cumulative_count = 0
+
+            for bucket, count in zip(histogram.buckets, histogram.counts):
+                cumulative_count += count
+                lines.append(f'usvisa_shadow_scoring_latency_seconds_bucket{{model="{model}",{versions},le="{bucket}"}} {cumulative_count}')
+
+            lines.append(f'usvisa_shadow_scoring_latency_seconds_bucket{{model="{model}",{versions},le="+Inf"}} {histogram.count}')
+            lines.append(f'usvisa_shadow_scoring_latency_seconds_sum{{model="{model}",{versions}}} {histogram.total}')
+            lines.append(f'usvisa_shadow_scoring_latency_seconds_count{{model="{model}",{versions}}} {histogram.count}')
+
+        return "\n".join(lines) + "\n"
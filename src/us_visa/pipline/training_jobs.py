@@ -0,0 +1,246 @@
+import sys
+import time
+import uuid
+import queue
+import threading
+import multiprocessing
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field, asdict
+from typing import Optional
+
+from us_visa.constants import TRAINING_PIPELINE_STAGES
+from us_visa.entity.config_entity import TrainingJobsConfig
+
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+
+
+@dataclass
+class TrainingJob:
+    job_id: str
+    status: str = "queued"            # queued -> running -> succeeded / failed
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    stages: dict = field(default_factory=lambda: {stage: "pending" for stage in TRAINING_PIPELINE_STAGES})
+    error: Optional[str] = None
+
+    def as_dict(self) -> dict:
+
+        job_dict = asdict(self)
+
+        finished_stages = sum(status in ("completed", "skipped") for status in self.stages.values())
+        job_dict["progress"] = round(finished_stages / len(self.stages), 4)
+
+        return job_dict
+
+
+
+def run_training_job(job_id: str, progress_queue) -> None:
+
+    """
+    Entry point of the training process : runs the complete TrainPipeline and reports
+    every stage transition to the serving process through progress_queue.
+    """
+
+    # Imported here so that only the training process pays for the training dependencies
+    from us_visa.pipline.training_pipeline import TrainPipeline
+
+    def report_progress(stage: str, status: str) -> None:
+        progress_queue.put((job_id, stage, status, None))
+
+    try:
+        TrainPipeline(progress_callback=report_progress).run_pipeline()
+        progress_queue.put((job_id, None, "succeeded", None))
+
+    except Exception as e:
+        progress_queue.put((job_id, None, "failed", str(e)))
+
+
+
+class TrainingJobManager:
+
+    """
+    This class runs TrainPipeline jobs in separate processes (at most max_concurrent_jobs at a time)
+    and keeps their per-stage status, so that /train returns immediately and serving is never blocked by retraining.
+    """
+
+    def __init__(self, training_jobs_config: TrainingJobsConfig = TrainingJobsConfig()):
+
+        """
+        :param training_jobs_config: Concurrency limit and job history size
+        """
+
+        self.training_jobs_config = training_jobs_config
+
+        # "spawn" : a fresh interpreter per job, nothing inherited from the serving threads
+        self._mp_context = multiprocessing.get_context("spawn")
+        self._progress_queue = None
+
+        self._jobs: "OrderedDict[str, TrainingJob]" = OrderedDict()
+        self._pending_job_ids = deque()
+        self._running_processes = {}
+        self._lock = threading.Lock()
+
+        self._monitor_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+
+    def start(self) -> None:
+
+        """
+        This method starts the monitor thread which launches queued jobs and collects their progress.
+        """
+
+        if self._monitor_thread is None:
+            self._progress_queue = self._mp_context.Queue()
+            self._stop_event.clear()
+
+            self._monitor_thread = threading.Thread(target=self._monitor, name="usvisa-training-jobs", daemon=True)
+            self._monitor_thread.start()
+
+
+    def shutdown(self) -> None:
+
+        """
+        This method stops the monitor thread. Running training processes are terminated.
+        """
+
+        if self._monitor_thread is not None:
+            self._stop_event.set()
+            self._monitor_thread.join()
+            self._monitor_thread = None
+
+        with self._lock:
+            for job_id, process in self._running_processes.items():
+                process.terminate()
+                self._finish_job(job_id, status="failed", error="Training job terminated at shutdown")
+
+            self._running_processes.clear()
+
+
+    def submit(self) -> dict:
+
+        """
+        This method queues a new training job and returns its status immediately.
+        """
+
+        try:
+            if self._monitor_thread is None:
+                self.start()
+
+            job = TrainingJob(job_id=uuid.uuid4().hex)
+
+            with self._lock:
+                self._jobs[job.job_id] = job
+                self._pending_job_ids.append(job.job_id)
+                self._trim_history()
+
+                submitted_job = job.as_dict()
+
+            logging.info(f"Queued training job {job.job_id}")
+
+            return submitted_job
+
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+
+    def get_job(self, job_id: str) -> Optional[dict]:
+
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.as_dict() if job is not None else None
+
+
+    def list_jobs(self) -> list:
+
+        with self._lock:
+            return [job.as_dict() for job in reversed(self._jobs.values())]
+
+
+    def _trim_history(self) -> None:
+
+        # Forget the oldest finished jobs beyond history_size
+        finished_job_ids = [job_id for job_id, job in self._jobs.items() if job.status in ("succeeded", "failed")]
+
+        for job_id in finished_job_ids[:max(0, len(finished_job_ids) - self.training_jobs_config.history_size)]:
+            del self._jobs[job_id]
+
+
+    def _finish_job(self, job_id: str, status: str, error: Optional[str] = None) -> None:
+
+        job = self._jobs.get(job_id)
+        if job is None or job.status in ("succeeded", "failed"):
+            return
+
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+
+        if status == "failed":
+            for stage, stage_status in job.stages.items():
+                if stage_status == "running":
+                    job.stages[stage] = "failed"
+
+        logging.info(f"Training job {job_id} {status}" + (f" : {error}" if error else ""))
+
+
+    def _handle_progress(self, job_id: str, stage: Optional[str], status: str, error: Optional[str]) -> None:
+
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+
+            if stage is not None:
+                job.stages[stage] = status
+            else:
+                self._finish_job(job_id, status=status, error=error)
+
+
+    def _launch_pending_jobs(self) -> None:
+
+        with self._lock:
+            # Processes which exited without reporting (e.g. killed) are marked as failed
+            for job_id, process in list(self._running_processes.items()):
+                if not process.is_alive():
+                    process.join()
+                    del self._running_processes[job_id]
+
+                    if process.exitcode != 0:
+                        self._finish_job(job_id, status="failed",
+                                         error=f"Training process exited with code {process.exitcode}")
+
+            while self._pending_job_ids and len(self._running_processes) < self.training_jobs_config.max_concurrent_jobs:
+                job_id = self._pending_job_ids.popleft()
+
+                process = self._mp_context.Process(target=run_training_job,
+                                                   args=(job_id, self._progress_queue),
+                                                   name=f"usvisa-training-{job_id}",
+                                                   daemon=False)
+                process.start()
+
+                self._running_processes[job_id] = process
+
+                job = self._jobs[job_id]
+                job.status = "running"
+                job.started_at = time.time()
+
+                logging.info(f"Started training job {job_id} in process {process.pid}")
+
+
+    def _monitor(self) -> None:
+
+        while not self._stop_event.is_set():
+            try:
+                self._launch_pending_jobs()
+
+                try:
+                    self._handle_progress(*self._progress_queue.get(timeout=0.5))
+                except queue.Empty:
+                    pass
+
+            except Exception as e:
+                logging.error(f"Training job monitor error : {e}")
@@ -1,5 +1,6 @@
-import sys , shutil
+import sys
 from pathlib import Path
+from typing import Callable, Optional
 
 from us_visa.exception import USvisaException
 from us_visa.logger import logging
@@ -26,11 +27,19 @@ from us_visa.components.data_transformation import DataTransformation
 from us_visa.components.model_trainer import ModelTrainer
 from us_visa.components.model_evaluation import ModelEvaluation
 from us_visa.components.model_pusher import ModelPusher
+from us_visa.pipline.model_promotion import stage_candidate
 
 
 class TrainPipeline:
     
-    def __init__(self):
+    def __init__(self, progress_callback: Optional[Callable[[str, str], None]] = None):
+        
+        """
+        :param progress_callback: Optional callable(stage, status) notified when a pipeline stage
+                                  (TRAINING_PIPELINE_STAGES) is running, completed or skipped
+        """
+        
+        self.progress_callback = progress_callback
         
         self.data_ingestion_config = DataIngestionConfig()
         self.data_validation_config = DataValidationConfig()
@@ -148,7 +157,9 @@ class TrainPipeline:
             raise USvisaException(e, sys)
     
     
-    def start_model_pusher(self, model_evaluation_artifact: ModelEvaluationArtifact) -> ModelPusherArtifact:
+    def start_model_pusher(self, model_evaluation_artifact: ModelEvaluationArtifact,
+                           data_transformation_artifact: DataTransformationArtifact,
+                           data_ingestion_artifact: Optional[DataIngestionArtifact] = None) -> ModelPusherArtifact:
         
         """
         This method of TrainPipeline class is responsible for starting model pushing
@@ -156,7 +167,9 @@ class TrainPipeline:
         """
         try:
             model_pusher = ModelPusher(model_evaluation_artifact=model_evaluation_artifact,
-                                       model_pusher_config=self.model_pusher_config
+                                       model_pusher_config=self.model_pusher_config,
+                                       data_preprocessor_filepath=data_transformation_artifact.transformed_object_filepath,
+                                       data_ingestion_artifact=data_ingestion_artifact
                                        )
             model_pusher_artifact = model_pusher.initiate_model_pusher()
             
@@ -166,6 +179,16 @@ class TrainPipeline:
             raise USvisaException(e, sys)
     
     
+    def report_progress(self, stage: str, status: str) -> None:
+        
+        """
+        This method notifies the progress callback (if any) about a pipeline stage.
+        """
+        
+        if self.progress_callback is not None:
+            self.progress_callback(stage, status)
+    
+    
     def run_pipeline(self) -> None:
         
         """
@@ -173,17 +196,30 @@ class TrainPipeline:
         """
         
         try :
+            self.report_progress("data_ingestion", "running")
             data_ingestion_artifact=self.start_data_ingestion()
+            self.report_progress("data_ingestion", "completed")
+            
+            self.report_progress("data_validation", "running")
             data_validation_artifact=self.start_data_validation(data_ingestion_artifact=data_ingestion_artifact)
+            self.report_progress("data_validation", "completed")
+            
+            self.report_progress("data_transformation", "running")
             data_transformation_artifact=self.start_data_transformation(
                                                         data_ingestion_artifact=data_ingestion_artifact,
                                                         data_validation_artifact=data_validation_artifact
                                                         )
+            self.report_progress("data_transformation", "completed")
+            
+            self.report_progress("model_trainer", "running")
             model_trainer_artifact = self.start_model_trainer(data_transformation_artifact=data_transformation_artifact)
+            self.report_progress("model_trainer", "completed")
             
+            self.report_progress("model_evaluation", "running")
             model_evaluation_artifact = self.start_model_evaluation(data_ingestion_artifact=data_ingestion_artifact,
                                                                     data_transformation_artifact=data_transformation_artifact,
                                                                     model_trainer_artifact=model_trainer_artifact)
+            self.report_progress("model_evaluation", "completed")
             
             
             if not model_evaluation_artifact.is_trained_model_accepted:
@@ -191,25 +227,33 @@ class TrainPipeline:
                 print("Trained model is not better than the AWS S3 model.")
                 print("Therefore, No need to push the Trained model to AWS S3 bucket for production use.")
                 logging.info("Trained model is not better than the AWS S3 model.")
+                
+                self.report_progress("model_pusher", "skipped")
+            
+            elif MODEL_PUSHER_STAGE_AS_CANDIDATE:
+                
+                # Not pushed : the serving processes shadow-score the candidate pair until promote_candidate.py
+                # makes it the production model
+                stage_candidate(transformed_object_filepath=data_transformation_artifact.transformed_object_filepath,
+                                trained_model_filepath=model_trainer_artifact.trained_model_filepath,
+                                data_ingestion_artifact=data_ingestion_artifact)
+                
+                print(f"Staged the trained model as candidate model in {LOCAL_CANDIDATE_MODEL_DIR}")
+                
+                self.report_progress("model_pusher", "skipped")
                   
             else:
                 
                 # Pushing the trained model to GCS bucket for production use
-                model_pusher_artifacts=self.start_model_pusher(model_evaluation_artifact=model_evaluation_artifact)
+                self.report_progress("model_pusher", "running")
+                model_pusher_artifacts=self.start_model_pusher(model_evaluation_artifact=model_evaluation_artifact,
+                                                               data_transformation_artifact=data_transformation_artifact,
+                                                               data_ingestion_artifact=data_ingestion_artifact)
                 print("Pushed the trained model to AWS S3 bucket......")
-                
-                
-                #trained_model_filepath = model_trainer_artifact.trained_model_filepath
-                from_filepath = Path(model_trainer_artifact.trained_model_filepath)
-                to_filepath = Path(f"{LOCAL_PRODUCTION_MODEL_DIR}/{Path(S3_PRODUCTION_MODEL_NAME)}")
-
-                # Make sure the parent directory exists
-                to_filepath.parent.mkdir(parents=True, exist_ok=True)
-
-                # Copy the file
-                shutil.copy(from_filepath, to_filepath)
                 print(f"Saved the current trained model as Production model to {LOCAL_PRODUCTION_MODEL_DIR}/{S3_PRODUCTION_MODEL_NAME}")
                 
+                self.report_progress("model_pusher", "completed")
+                
     
             logging.info("Exited the run_pipline method of TrainPipeline class in src/us_visa/pipline/training_pipeline.py")
 
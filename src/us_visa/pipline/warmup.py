@@ -0,0 +1,145 @@
+import sys
+import time
+import asyncio
+from typing import Callable, List, Optional
+
+from us_visa.constants import SCHEMA_FILEPATH
+from us_visa.entity.config_entity import WarmupConfig
+from us_visa.pipline.inference_executor import InferenceExecutor
+from us_visa.pipline.model_registry import ModelHandle
+from us_visa.pipline.prediction_pipeline import USvisaClassifier
+from us_visa.utils.main_utils import read_yaml_file
+
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+
+
+class ServingWarmup:
+
+    """
+    Startup phase of a serving process : loads the preprocessor/model pair, runs synthetic predictions through
+    the serving path (single records and one batch, on the inference executor) and pre-renders the templates.
+    The process only reports ready once this is done, so the load balancer never routes traffic to a cold worker.
+    """
+
+    def __init__(self, model_predictor: USvisaClassifier, inference_executor: InferenceExecutor,
+                 warmup_config: WarmupConfig = WarmupConfig()):
+
+        """
+        :param model_predictor: Serving classifier
+        :param inference_executor: Pool the requests are scored on
+        :param warmup_config: Number of synthetic predictions
+        """
+
+        try:
+            self.model_predictor = model_predictor
+            self.inference_executor = inference_executor
+            self.warmup_config = warmup_config
+
+            self._schema_config = read_yaml_file(filepath=SCHEMA_FILEPATH)
+
+            self.ready = False
+            self.error: Optional[str] = None
+            self.warmup_seconds: Optional[float] = None
+
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+
+    def build_synthetic_records(self, model_handle: ModelHandle, n_records: int) -> List[dict]:
+
+        """
+        This method builds applicant records covering the category levels of every ohe_features column of
+        config/schema.yaml. schema.yaml has no category levels, they are taken from the fitted OneHotEncoder
+        (or the compiled encoder); num_features values are spread around the StandardScaler mean
+        (mean - scale clipped at 0, mean, mean + scale).
+        """
+
+        category_levels = {}
+        numerical_values = {}
+
+        compiled_encoder = model_handle.compiled_encoder
+
+        # The memory-mapped artifact only has the compiled encoder, not the fitted ColumnTransformer
+        if compiled_encoder is not None:
+            category_levels.update(zip(compiled_encoder.ohe_columns, map(list, compiled_encoder.ohe_category_maps)))
+            numerical_scalers = zip(compiled_encoder.num_columns, compiled_encoder.num_means, compiled_encoder.num_scales)
+
+        else:
+            numerical_scalers = []
+
+            for _, transformer, columns in model_handle.data_preprocessor.transformers_:
+                if hasattr(transformer, "categories_"):
+                    category_levels.update(zip(columns, transformer.categories_))
+
+                elif hasattr(transformer, "mean_"):
+                    numerical_scalers.extend(zip(columns, transformer.mean_, transformer.scale_))
+
+        for column, mean, scale in numerical_scalers:
+            numerical_values[column] = [max(mean - scale, 0.0), mean, mean + scale]
+
+        records = []
+
+        for index in range(n_records):
+            record = {}
+
+            for column in self._schema_config["ohe_features"]:
+                levels = category_levels[column]
+                record[column] = str(levels[index % len(levels)])
+
+            for column in self._schema_config["num_features"]:
+                values = numerical_values[column]
+                record[column] = float(values[index % len(values)])
+
+            records.append(record)
+
+        return records
+
+
+    async def run(self, prerender_templates: Optional[Callable[[], None]] = None) -> None:
+
+        """
+        This method runs the warm-up; a failure is logged and keeps the process not ready.
+        :param prerender_templates: Renders the HTML templates once (compiles and caches them)
+        """
+
+        start_time = time.perf_counter()
+
+        try:
+            loop = asyncio.get_running_loop()
+
+            # Unpickling takes a while : keep the event loop free for the liveness probe
+            model_handle = await loop.run_in_executor(None, self.model_predictor.get_model_handle)
+
+            records = self.build_synthetic_records(model_handle, self.warmup_config.n_predictions)
+
+            if records:
+                # Concurrent single predictions reach every pool worker, on the scoring and on the label-only
+                # (form route, early exit) paths, then one batch warms the DataFrame path
+                await asyncio.gather(*(self.inference_executor.score_records([record]) for record in records))
+                await asyncio.gather(*(self.inference_executor.score_record_labels([record]) for record in records))
+                await self.inference_executor.score_records(records)
+
+            # Synthetic applicants must not stay in the prediction caches, the ones of process pool workers included
+            self.inference_executor.clear_prediction_caches()
+
+            if prerender_templates is not None:
+                prerender_templates()
+
+            self.warmup_seconds = time.perf_counter() - start_time
+            self.ready = True
+
+            logging.info(f"Warm-up finished in {self.warmup_seconds:.2f} s ({len(records)} synthetic predictions), "
+                         f"serving model version {model_handle.version}")
+
+        except Exception as e:
+            self.error = f"{e}"
+            logging.error(f"Warm-up failed, the process stays not ready : {e}")
+
+
+    def get_status(self) -> dict:
+
+        return {"ready": self.ready,
+                "warmup_seconds": self.warmup_seconds,
+                "error": self.error}
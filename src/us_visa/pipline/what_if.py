@@ -0,0 +1,170 @@
+import sys
+import math
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from us_visa.entity.config_entity import WhatIfConfig
+from us_visa.entity.estimator import TargetValueMapping
+from us_visa.pipline.inference_executor import InferenceExecutor
+from us_visa.pipline.prediction_pipeline import USVISA_DATA_COLUMNS
+from us_visa.pipline.request_validation import RequestValidator
+
+from us_visa.exception import USvisaException
+from us_visa.logger import logging
+
+
+
+class WhatIfAnalyzer:
+
+    """
+    This class answers "what would change the outcome" for one applicant : given the applicant and sweep specs,
+    every combination of the sweep values is materialized as one grid, scored in a single transform +
+    predict_proba batch, and returned as a probability surface with one axis per swept field.
+
+    Sweep specs, per field :
+        - a list of values (category alternatives, or explicit numbers),
+        - {"start": ..., "stop": ..., "num": ...} for a numerical field (num evenly spaced values, both ends included).
+    Every sweep value is validated like a field of a prediction request.
+    """
+
+    def __init__(self, request_validator: RequestValidator, inference_executor: InferenceExecutor,
+                 what_if_config: WhatIfConfig = WhatIfConfig()):
+
+        """
+        :param request_validator: Validates the applicant and every sweep value
+        :param inference_executor: Pool the grid is built and scored on
+        :param what_if_config: Max applicants per grid and max values of a numerical range
+        """
+
+        try:
+            self.request_validator = request_validator
+            self.inference_executor = inference_executor
+            self.what_if_config = what_if_config
+
+            self.status_mapping = TargetValueMapping().reverse_mapping()
+
+        except Exception as e:
+            raise USvisaException(e, sys) from e
+
+
+    def _expand_sweep(self, field: str, sweep_spec: object) -> Tuple[list, str]:
+
+        """
+        Returns (sweep values, error message or None) of one sweep spec.
+        """
+
+        if isinstance(sweep_spec, list):
+            if not sweep_spec:
+                return [], "expected at least one value"
+
+            return sweep_spec, None
+
+        if isinstance(sweep_spec, dict):
+            if field not in self.request_validator.numeric_rules:
+                return [], "a range only applies to a numerical field, give a list of values"
+
+            try:
+                start, stop, num = float(sweep_spec["start"]), float(sweep_spec["stop"]), sweep_spec["num"]
+
+                if not (math.isfinite(start) and math.isfinite(stop)) or isinstance(num, bool) or not isinstance(num, int):
+                    raise ValueError
+
+            except (KeyError, TypeError, ValueError):
+                return [], "expected {\"start\": number, \"stop\": number, \"num\": integer}"
+
+            if not 1 <= num <= self.what_if_config.max_range_steps:
+                return [], f"num must be between 1 and {self.what_if_config.max_range_steps}"
+
+            values = np.linspace(start, stop, num)
+
+            # Integer fields : rounded, without the duplicates the rounding creates
+            if self.request_validator.numeric_rules[field][0] is int:
+                values = np.rint(values).astype(np.int64)
+
+            return list(dict.fromkeys(values.tolist())), None
+
+        return [], "expected a list of values or a {\"start\", \"stop\", \"num\"} range"
+
+
+    def parse_sweeps(self, base_record: dict, sweeps: object) -> Tuple[Dict[str, list], List[dict]]:
+
+        """
+        This method expands and validates the sweep specs against the (already validated) applicant record.
+        Returns: (field -> validated sweep values, list of {"index", "field", "error"}; index is the position in the sweep)
+        """
+
+        if not isinstance(sweeps, dict) or not sweeps:
+            return {}, [{"index": 0, "field": "sweeps", "error": "expected an object mapping fields to sweep specs"}]
+
+        rules = self.request_validator.get_rules()
+
+        axes, field_errors = {}, []
+
+        for field, sweep_spec in sweeps.items():
+            if field not in USVISA_DATA_COLUMNS:
+                field_errors.append({"index": 0, "field": f"sweeps.{field}", "error": "unknown field"})
+                continue
+
+            values, error = self._expand_sweep(field, sweep_spec)
+
+            if error is not None:
+                field_errors.append({"index": 0, "field": f"sweeps.{field}", "error": error})
+                continue
+
+            clean_values, value_errors = [], []
+            for index, value in enumerate(values):
+                clean_record, record_errors = rules.validate_record({**base_record, field: value})
+
+                value_errors.extend({"index": index, "field": f"sweeps.{field}", "error": record_error["error"]}
+                                    for record_error in record_errors if record_error["field"] == field)
+
+                clean_values.append(clean_record[field])
+
+            if value_errors:
+                field_errors.extend(value_errors)
+                continue
+
+            axes[field] = list(dict.fromkeys(clean_values))
+
+        grid_size = math.prod(len(values) for values in axes.values())
+
+        if not field_errors and grid_size > self.what_if_config.max_grid_size:
+            field_errors.append({"index": 0, "field": "sweeps",
+                                 "error": f"grid of {grid_size} applicants exceeds the max grid size {self.what_if_config.max_grid_size}"})
+
+        return axes, field_errors
+
+
+    async def analyze(self, base_record: dict, axes: Dict[str, list]) -> dict:
+
+        """
+        This method scores the applicant and its what-if grid.
+        Returns: {"model_version", "base", "axes", "shape", "probabilities", "predictions"}, the surfaces nested in axis order
+        """
+
+        try:
+            grid_labels, grid_probabilities, model_version = await self.inference_executor.score_grid(base_record=base_record, sweeps=axes)
+
+            labels, probabilities, base_model_version = await self.inference_executor.score_records(records=[base_record])
+
+            # A model swap between both calls : the grid is scored again, so that both come from the same version
+            if base_model_version != model_version:
+                logging.info(f"Model version changed from {model_version} to {base_model_version} during a what-if sweep")
+                grid_labels, grid_probabilities, model_version = await self.inference_executor.score_grid(base_record=base_record, sweeps=axes)
+
+            base_label, base_probability = int(labels[0]), float(probabilities[0])
+
+            shape = [len(values) for values in axes.values()]
+
+            return {"model_version": model_version,
+                    "base": {"prediction": base_label,
+                             "case_status": self.status_mapping[base_label],
+                             "probability_certified": base_probability},
+                    "axes": [{"field": field, "values": values} for field, values in axes.items()],
+                    "shape": shape,
+                    "probabilities": np.reshape(grid_probabilities, shape).tolist(),
+                    "predictions": np.reshape(grid_labels, shape).astype(int).tolist()}
+
+        except Exception as e:
+            raise USvisaException(e, sys) from e
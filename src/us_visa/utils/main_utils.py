@@ -1,5 +1,7 @@
 # In this file, we're writing functions that we'll be used througout the project again & again.
 import os, sys, dill, yaml 
+import shutil
+import hashlib
 import numpy as np
 from pandas import DataFrame
 
@@ -111,6 +113,98 @@ def load_object(filepath:str) -> object:
         raise USvisaException(e, sys) from e
 
 
+def copy_file_atomic(from_filepath: str, to_filepath: str) -> None:
+    
+    """
+    This method copies a file under a temporary name next to the destination and renames it over the destination,
+    so that a reader (e.g. a serving process reloading the model) never opens a partially written file.
+    
+    parameters :
+    
+       (a) from_filepath : file to copy
+       (b) to_filepath : destination file, replaced if it exists
+       
+    """
+    
+    try:
+        os.makedirs(os.path.dirname(to_filepath) or ".", exist_ok=True)
+        
+        temporary_filepath = f"{to_filepath}.tmp"
+        shutil.copyfile(from_filepath, temporary_filepath)
+        os.replace(temporary_filepath, to_filepath)
+        
+    except Exception as e:
+        raise USvisaException(e, sys) from e
+
+
+def write_bytes_atomic(filepath: str, content: bytes) -> None:
+    
+    """
+    This method writes bytes under a temporary name next to filepath and renames them over filepath,
+    like copy_file_atomic.
+    
+    parameters :
+    
+       (a) filepath : destination file, replaced if it exists
+       (b) content : bytes to write
+       
+    """
+    
+    try:
+        os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+        
+        temporary_filepath = f"{filepath}.tmp"
+        with open(temporary_filepath, "wb") as file:
+            file.write(content)
+        
+        os.replace(temporary_filepath, filepath)
+        
+    except Exception as e:
+        raise USvisaException(e, sys) from e
+
+
+def get_bytes_version(contents: list) -> str:
+    
+    """
+    This method returns the version of artifact contents already read in memory : same digest as
+    get_content_version over files holding these bytes, in the given order.
+    
+    parameters :
+    
+       (a) contents : list of bytes objects (e.g. [data preprocessor pickle, production model pickle])
+       
+    """
+    
+    digest = hashlib.sha256()
+    
+    for content in contents:
+        digest.update(content)
+    
+    return digest.hexdigest()[:12]
+
+
+def get_content_version(filepaths: list) -> str:
+    
+    """
+    This method returns the version of a set of artifact files : the first 12 hex digits
+    of the sha256 over their content, in the given order.
+    
+    parameters :
+    
+       (a) filepaths : list of artifact filepaths (e.g. [data preprocessor, production model])
+       
+    """
+    
+    digest = hashlib.sha256()
+    
+    for filepath in filepaths:
+        with open(filepath, "rb") as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                digest.update(block)
+    
+    return digest.hexdigest()[:12]
+
+
 def save_numpy_array_data(filepath:str, array:np.ndarray):
     
     """
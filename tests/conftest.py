@@ -0,0 +1,47 @@
+import os
+import sys
+import pickle
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+
+# The tests run against the repository artifacts (config/, ProductionModel/, notebook/EasyVisa.csv),
+# which the configs reference with paths relative to the project root
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+
+sys.path[:0] = [str(PROJECT_ROOT / "src"), str(PROJECT_ROOT)]
+os.chdir(PROJECT_ROOT)
+
+from us_visa.entity.config_entity import USvisaPredictorConfig
+
+
+DATA_FILEPATH = "notebook/EasyVisa.csv"
+
+
+@pytest.fixture(scope="session")
+def easyvisa_dataframe() -> pd.DataFrame:
+
+    return pd.read_csv(DATA_FILEPATH)
+
+
+@pytest.fixture(scope="session")
+def data_preprocessor():
+
+    with open(USvisaPredictorConfig().data_preprocessor_filepath_local, "rb") as preprocessor_file:
+        return pickle.load(preprocessor_file)
+
+
+@pytest.fixture(scope="session")
+def prediction_model():
+
+    with open(USvisaPredictorConfig().pred_model_filepath_local, "rb") as model_file:
+        return pickle.load(model_file)
+
+
+@pytest.fixture(scope="session")
+def X_all(easyvisa_dataframe, data_preprocessor):
+
+    # Whole training data set encoded by the production preprocessor
+    return data_preprocessor.transform(easyvisa_dataframe.drop(columns=["case_id", "case_status"]))
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from us_visa.entity.case_index import CaseIndex, CASE_ID_COLUMN
+from us_visa.entity.compiled_encoder import CompiledEncoder
+
+
+N_QUERIES = 200
+
+
+@pytest.fixture(scope="module")
+def compiled_encoder(data_preprocessor):
+
+    return CompiledEncoder.from_preprocessor(data_preprocessor)
+
+
+@pytest.fixture(scope="module")
+def case_index(easyvisa_dataframe, compiled_encoder, tmp_path_factory):
+
+    # Saved and mapped back, like the serving processes load it
+    case_index_filepath = tmp_path_factory.mktemp("case_index") / "case_index.mmap"
+    CaseIndex.build(dataframe=easyvisa_dataframe, compiled_encoder=compiled_encoder, model_version="test").save(case_index_filepath)
+
+    return CaseIndex.load(case_index_filepath)
+
+
+def brute_force(X: np.ndarray, x: np.ndarray, k: int) -> np.ndarray:
+
+    squared_distances = np.square(X - x).sum(axis=1)
+
+    # Ties broken by position in the index, like CaseIndex.query
+    return np.lexsort((np.arange(X.shape[0]), squared_distances))[:k]
+
+
+@pytest.mark.parametrize("k", [1, 5, 50])
+def test_query_matches_brute_force(case_index, compiled_encoder, easyvisa_dataframe, k):
+
+    # Index rows in the same (partition) order, float32 like the index
+    X_index = np.hstack([np.repeat(case_index.partition_keys, np.diff(case_index.partition_offsets), axis=0),
+                         case_index.numeric])
+    columns = np.concatenate([case_index.ohe_output_indices, case_index.num_output_indices])
+
+    # Applicants of the history (distance 0 to themselves) and jittered ones
+    queries = easyvisa_dataframe.sample(n=N_QUERIES, random_state=0).reset_index(drop=True)
+    queries.loc[N_QUERIES // 2:, "prevailing_wage"] *= np.random.default_rng(0).uniform(0.5, 1.5, N_QUERIES - N_QUERIES // 2)
+
+    for x in compiled_encoder.transform(queries):
+        rows, squared_distances = case_index.query(x, k)
+        expected_rows = brute_force(X_index, x[columns].astype(np.float32), k)
+
+        assert np.array_equal(rows, expected_rows)
+        np.testing.assert_allclose(squared_distances, np.square(X_index[expected_rows] - x[columns].astype(np.float32)).sum(axis=1),
+                                   rtol=1e-5, atol=1e-6)
+
+
+def test_get_case_returns_the_historical_application(case_index, compiled_encoder, easyvisa_dataframe):
+
+    applicant = easyvisa_dataframe.iloc[[123]]
+    rows, squared_distances = case_index.query(compiled_encoder.transform(applicant)[0], 1)
+
+    case = case_index.get_case(rows[0], squared_distances[0])
+
+    assert case[CASE_ID_COLUMN] == applicant[CASE_ID_COLUMN].iloc[0]
+    assert case["case_status"] == applicant["case_status"].iloc[0]
+    assert case["distance"] == 0.0
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from us_visa.entity.compiled_encoder import CompiledEncoder
+from us_visa.pipline.prediction_pipeline import USVISA_DATA_COLUMNS
+
+
+@pytest.fixture(scope="module")
+def compiled_encoder(data_preprocessor):
+
+    compiled_encoder = CompiledEncoder.from_preprocessor(data_preprocessor)
+    assert compiled_encoder is not None
+
+    return compiled_encoder
+
+
+def test_transform_matches_preprocessor(compiled_encoder, easyvisa_dataframe, X_all):
+
+    X_compiled = compiled_encoder.transform(easyvisa_dataframe)
+
+    assert X_compiled.shape == X_all.shape
+    assert np.array_equal(X_compiled, X_all)
+
+
+def test_encode_record_matches_preprocessor(compiled_encoder, easyvisa_dataframe, X_all):
+
+    records = easyvisa_dataframe[USVISA_DATA_COLUMNS].to_dict("records")
+
+    for row in range(0, len(records), 97):
+        assert np.array_equal(compiled_encoder.encode_record(records[row]), X_all[row:row + 1])
+
+
+def test_unknown_category(compiled_encoder, easyvisa_dataframe):
+
+    record = {**easyvisa_dataframe[USVISA_DATA_COLUMNS].iloc[0].to_dict(), "continent": "Atlantis"}
+
+    assert compiled_encoder.encode_record(record) is None
+
+    with pytest.raises(ValueError):
+        compiled_encoder.transform(easyvisa_dataframe.head(3).assign(continent="Atlantis"))
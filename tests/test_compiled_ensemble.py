@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from us_visa.entity.compiled_ensemble import CompiledGradientBoosting
+
+
+@pytest.fixture(scope="module")
+def compiled_model(prediction_model):
+
+    compiled_model = CompiledGradientBoosting.from_model(prediction_model)
+    assert compiled_model is not None
+
+    return compiled_model
+
+
+def test_decision_function_matches_sklearn(compiled_model, prediction_model, X_all):
+
+    assert np.array_equal(compiled_model.decision_function(X_all), prediction_model.decision_function(X_all))
+
+
+@pytest.mark.parametrize("n_rows", [1, 8, 1024, None])
+def test_predict_proba_matches_sklearn(compiled_model, prediction_model, X_all, n_rows):
+
+    X = X_all[:n_rows]
+
+    assert np.array_equal(compiled_model.predict_proba(X), prediction_model.predict_proba(X))
+    assert np.array_equal(compiled_model.predict(X), prediction_model.predict(X))
+
+
+@pytest.mark.parametrize("stages_per_check", [1, 5, 25, 300])
+def test_early_exit_labels_match_full_labels(compiled_model, X_all, stages_per_check):
+
+    # Serving labels : classes_ taken at the argmax of predict_proba
+    expected_labels = compiled_model.classes_.take(np.argmax(compiled_model.predict_proba(X_all), axis=1))
+
+    labels, n_trees_evaluated = compiled_model.predict_early_exit(X_all, stages_per_check=stages_per_check)
+
+    assert np.array_equal(labels, expected_labels)
+    assert n_trees_evaluated.max() <= len(compiled_model.roots)
+    assert n_trees_evaluated.min() < len(compiled_model.roots) or stages_per_check >= len(compiled_model.roots)
+
+
+def test_predict_on_the_decision_boundary_matches_serving():
+
+    # One stump whose leaves cancel the prior exactly : the decision function of the row is 0, both probabilities 0.5
+    compiled_model = CompiledGradientBoosting(feature=np.array([0, 0, 0], dtype=np.intp),
+                                              threshold=np.array([0.5, np.inf, np.inf]),
+                                              children_left=np.array([1, 1, 2], dtype=np.intp),
+                                              children_right=np.array([2, 1, 2], dtype=np.intp),
+                                              leaf_value=np.array([0.0, -0.25, 0.75]),
+                                              roots=np.array([0], dtype=np.intp),
+                                              max_depth=1,
+                                              init_raw_prediction=0.25,
+                                              classes=np.array([0, 1]),
+                                              n_features=1)
+
+    X = np.array([[0.0], [1.0]])
+    serving_labels = compiled_model.classes_.take(np.argmax(compiled_model.predict_proba(X), axis=1))
+
+    assert compiled_model.decision_function(X)[0] == 0.0
+    assert np.array_equal(compiled_model.predict(X), serving_labels)
+    assert np.array_equal(compiled_model.predict_early_exit(X)[0], serving_labels)
@@ -0,0 +1,36 @@
+import asyncio
+
+from us_visa.entity.config_entity import InferenceExecutorConfig
+from us_visa.pipline import inference_executor
+from us_visa.pipline.inference_executor import InferenceExecutor
+from us_visa.pipline.prediction_pipeline import USvisaClassifier
+
+
+def get_worker_cache_size() -> int:
+
+    # Runs inside the pool worker
+    return inference_executor._worker_model_predictor.prediction_cache.get_stats()["size"]
+
+
+def test_clear_prediction_caches_reaches_process_workers(easyvisa_dataframe):
+
+    executor = InferenceExecutor(model_predictor=USvisaClassifier(),
+                                 inference_executor_config=InferenceExecutorConfig(kind="process", max_workers=1))
+
+    record = easyvisa_dataframe.drop(columns=["case_id", "case_status"]).iloc[0].to_dict()
+
+    async def score_then_clear():
+
+        await executor.score_records([record])
+        cache_size_before = await executor._run_in_pool(get_worker_cache_size)
+
+        executor.clear_prediction_caches()
+        cache_size_after = await executor._run_in_pool(get_worker_cache_size)
+
+        return cache_size_before, cache_size_after
+
+    try:
+        assert asyncio.run(score_then_clear()) == (1, 0)
+
+    finally:
+        executor.shutdown()
@@ -0,0 +1,17 @@
+import logging
+
+from us_visa.logger import SampledLogger
+
+
+def test_sampled_logger_keeps_every_warning_and_error():
+
+    sampled_logger = SampledLogger("us_visa.test_request", sample_every=10)
+    sampled_logger.parent = logging.getLogger()
+    sampled_logger.setLevel(logging.INFO)
+
+    assert sum(sampled_logger.isEnabledFor(logging.INFO) for _ in range(100)) == 10
+    assert all(sampled_logger.isEnabledFor(logging.WARNING) for _ in range(100))
+    assert all(sampled_logger.isEnabledFor(logging.ERROR) for _ in range(100))
+
+    # WARNING and above do not advance the INFO sampling counter
+    assert sum(sampled_logger.isEnabledFor(logging.INFO) for _ in range(100)) == 10
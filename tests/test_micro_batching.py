@@ -0,0 +1,30 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from us_visa.entity.config_entity import MicroBatchingConfig
+from us_visa.pipline.micro_batching import MicroBatchDispatcher
+
+
+def test_stop_inside_the_batch_window_cancels_the_collected_callers():
+
+    async def run():
+
+        inference_executor = SimpleNamespace(inference_executor_config=SimpleNamespace(max_workers=1))
+        dispatcher = MicroBatchDispatcher(inference_executor=inference_executor,
+                                          micro_batching_config=MicroBatchingConfig(enabled=True, max_batch_size=8,
+                                                                                    max_wait_us=60_000_000))
+        await dispatcher.start()
+
+        # The worker takes the record off the queue and waits for more until the 60 s window closes
+        prediction = asyncio.create_task(dispatcher.predict({}))
+        await asyncio.sleep(0.05)
+        assert dispatcher._queue.empty()
+
+        await dispatcher.stop()
+
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(prediction, timeout=1)
+
+    asyncio.run(run())
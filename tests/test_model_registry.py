@@ -0,0 +1,117 @@
+import pickle
+import shutil
+
+from us_visa.components import model_pusher
+from us_visa.components.model_pusher import ModelPusher
+from us_visa.entity import s3_estimator
+from us_visa.entity.artifact_entity import ModelEvaluationArtifact
+from us_visa.entity.config_entity import ModelPusherConfig, USvisaPredictorConfig
+from us_visa.pipline.model_registry import ModelRegistry, get_production_pair_filepaths
+from us_visa.utils.main_utils import get_content_version
+
+
+def make_registry(tmp_path) -> ModelRegistry:
+
+    production_config = USvisaPredictorConfig()
+
+    data_preprocessor_filepath = tmp_path / "data_preprocessor.pkl"
+    pred_model_filepath = tmp_path / "production_model.pkl"
+    shutil.copy(production_config.data_preprocessor_filepath_local, data_preprocessor_filepath)
+    shutil.copy(production_config.pred_model_filepath_local, pred_model_filepath)
+
+    return ModelRegistry(prediction_pipeline_config=USvisaPredictorConfig(data_preprocessor_filepath_local=data_preprocessor_filepath,
+                                                                          pred_model_filepath_local=pred_model_filepath,
+                                                                          production_manifest_filepath_local=tmp_path / "production_model.yaml",
+                                                                          case_index_filepath_local=tmp_path / "case_index.mmap",
+                                                                          model_artifact_format="pickle",
+                                                                          explanations_enabled=False),
+                           check_interval_seconds=0.0)
+
+
+def get_version(model_registry: ModelRegistry) -> str:
+
+    config = model_registry.prediction_pipeline_config
+
+    return get_content_version(list(get_production_pair_filepaths(config)))
+
+
+def test_version_is_the_content_version(tmp_path):
+
+    model_registry = make_registry(tmp_path)
+
+    assert model_registry.get_handle().version == get_version(model_registry)
+    assert model_registry.refresh() is False
+
+
+def test_model_replaced_during_the_load_is_loaded_again(tmp_path):
+
+    model_registry = make_registry(tmp_path)
+    first_version = model_registry.get_handle().version
+
+    pred_model_filepath = model_registry.prediction_pipeline_config.pred_model_filepath_local
+    prediction_model = model_registry.get_handle().prediction_model
+    load_handle = model_registry._load_handle
+    loaded_versions = []
+
+    def load_handle_then_replace_model(force: bool):
+
+        # The training pipeline replaces the model right after the registry has read the files
+        handle = load_handle(force=force)
+        loaded_versions.append(handle.version)
+
+        if len(loaded_versions) == 1:
+            pred_model_filepath.write_bytes(pickle.dumps(prediction_model, protocol=2))
+
+        return handle
+
+    model_registry._load_handle = load_handle_then_replace_model
+    pred_model_filepath.write_bytes(pickle.dumps(prediction_model, protocol=3))
+
+    assert model_registry.refresh() is True
+    assert len(loaded_versions) == 2
+    assert model_registry.get_current_handle().version == get_version(model_registry) != first_version
+    assert model_registry.get_current_handle().version == loaded_versions[-1]
+
+
+def test_pair_pushed_while_serving_is_swapped_at_once(tmp_path, monkeypatch):
+
+    model_registry = make_registry(tmp_path)
+    first_version = model_registry.get_handle().version
+    config = model_registry.prediction_pipeline_config
+
+    # Only the local publication of the pair is exercised, not the s3 uploads
+    monkeypatch.setattr(model_pusher, "SimpleStorageService", lambda: None)
+    monkeypatch.setattr(s3_estimator, "SimpleStorageService", lambda: None)
+
+    trained_model_filepath = tmp_path / "trained_model.pkl"
+    trained_model_filepath.write_bytes(pickle.dumps(model_registry.get_handle().prediction_model, protocol=2))
+
+    pusher = ModelPusher(model_evaluation_artifact=ModelEvaluationArtifact(is_trained_model_accepted=True,
+                                                                           eval_metric_f1score_diff=0.0,
+                                                                           s3_prod_model_path="",
+                                                                           trained_model_path=str(trained_model_filepath)),
+                         model_pusher_config=ModelPusherConfig(production_manifest_filepath_local=config.production_manifest_filepath_local,
+                                                               production_versions_dir_local=tmp_path / "versions"),
+                         data_preprocessor_filepath=str(config.data_preprocessor_filepath_local))
+
+    served_versions = []
+
+    def refresh_after(write_function):
+
+        # A serving process checks the disk between the writes of the preprocessor and of the model
+        def write_then_refresh(**kwargs):
+            write_function(**kwargs)
+            model_registry.refresh()
+            served_versions.append(model_registry.get_current_handle().version)
+
+        return write_then_refresh
+
+    monkeypatch.setattr(model_pusher, "write_bytes_atomic", refresh_after(model_pusher.write_bytes_atomic))
+    monkeypatch.setattr(model_pusher, "copy_file_atomic", refresh_after(model_pusher.copy_file_atomic))
+
+    model_version = pusher.save_production_model()
+
+    assert served_versions == [first_version, first_version]
+
+    assert model_registry.refresh() is True
+    assert model_registry.get_current_handle().version == model_version == get_version(model_registry) != first_version
@@ -0,0 +1,65 @@
+import pandas as pd
+
+from us_visa.entity.config_entity import OfflineScoringConfig
+from us_visa.pipline import offline_scoring
+from us_visa.pipline.offline_scoring import OfflineScoringPipeline
+
+
+N_ROWS = 120
+CHUNK_SIZE = 40
+BAD_ROW = 55    # second chunk
+
+
+def write_input_file(tmp_path) -> str:
+
+    dataframe = pd.read_csv("notebook/EasyVisa.csv", nrows=N_ROWS)
+    dataframe["prevailing_wage"] = dataframe["prevailing_wage"].astype(object)
+    dataframe.loc[BAD_ROW, "prevailing_wage"] = "not-a-number"
+
+    input_filepath = tmp_path / "applications.csv"
+    dataframe.to_csv(input_filepath, index=False)
+
+    return str(input_filepath)
+
+
+def check_output(output_filepath: str) -> None:
+
+    output = pd.read_csv(output_filepath)
+
+    assert len(output) == N_ROWS
+    assert output["case_id"].tolist() == pd.read_csv("notebook/EasyVisa.csv", nrows=N_ROWS)["case_id"].tolist()
+
+    failed_rows = output.index[output["error"].notna()].tolist()
+    assert failed_rows == [BAD_ROW]
+    assert output.drop(index=BAD_ROW)["prediction"].notna().all()
+    assert pd.isna(output.loc[BAD_ROW, "prediction"])
+
+
+def test_bad_row_does_not_abort_the_run(tmp_path):
+
+    output_filepath = str(tmp_path / "scores.csv")
+    pipeline = OfflineScoringPipeline(input_filepath=write_input_file(tmp_path), output_filepath=output_filepath,
+                                      offline_scoring_config=OfflineScoringConfig(chunk_size=CHUNK_SIZE, max_workers=1))
+
+    assert pipeline.run() == {"chunks": 3, "scored_chunks": 3, "reused_chunks": 0}
+    check_output(output_filepath)
+
+
+def test_bad_row_does_not_abort_the_resume(tmp_path):
+
+    output_filepath = str(tmp_path / "scores.parquet")
+    pipeline = OfflineScoringPipeline(input_filepath=write_input_file(tmp_path), output_filepath=output_filepath,
+                                      offline_scoring_config=OfflineScoringConfig(chunk_size=CHUNK_SIZE, max_workers=1))
+
+    # A previous run that crashed after its first chunk : only the chunk holding the bad row and the last one are left
+    pipeline._prepare_parts_dir(pipeline._get_manifest())
+    offline_scoring._init_scoring_worker(pipeline.prediction_pipeline_config)
+    first_chunk = next(pipeline._iter_chunks())
+    offline_scoring.score_chunk(0, first_chunk, pipeline.model_columns, pipeline.echo_columns,
+                                str(pipeline._get_part_filepath(0)))
+
+    assert pipeline.run() == {"chunks": 3, "scored_chunks": 2, "reused_chunks": 1}
+
+    output = pd.read_parquet(output_filepath)
+    output.to_csv(tmp_path / "scores.csv", index=False)
+    check_output(str(tmp_path / "scores.csv"))
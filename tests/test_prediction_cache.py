@@ -0,0 +1,25 @@
+from us_visa.entity.config_entity import PredictionCacheConfig
+from us_visa.pipline.prediction_cache import PredictionCache
+
+
+def test_calls_of_a_previous_version_do_not_invalidate_the_served_one():
+
+    served = {"version": "v1"}
+    prediction_cache = PredictionCache(get_current_version=lambda: served["version"],
+                                       prediction_cache_config=PredictionCacheConfig(enabled=True, max_size=10, ttl_seconds=60.0))
+
+    prediction_cache.put(("a",), "v1", 1.0, 0.9)
+    assert prediction_cache.get(("a",), "v1") == (1.0, 0.9)
+
+    # The registry swaps to v2 : v1 entries are gone, a request still on the v1 handle is neither served nor cached
+    served["version"] = "v2"
+    assert prediction_cache.get(("a",), "v1") is None
+
+    prediction_cache.put(("a",), "v2", 0.0, 0.2)
+    prediction_cache.put(("b",), "v1", 1.0, 0.8)
+    prediction_cache.put_explanation(("b",), "v1", {"base_value": 0.0})
+
+    assert prediction_cache.get(("a",), "v2") == (0.0, 0.2)
+    assert prediction_cache.get(("b",), "v2") is None
+    assert prediction_cache.get_explanation(("b",), "v2") is None
+    assert prediction_cache.get_stats()["invalidations"] == 1
@@ -0,0 +1,43 @@
+import pandas as pd
+import pytest
+
+from us_visa.pipline.prediction_pipeline import USvisaClassifier
+from us_visa.pipline.request_validation import RequestValidator
+
+
+RECORD = {"continent": "Asia", "education_of_employee": "Master's", "has_job_experience": "Y",
+          "requires_job_training": "N", "no_of_employees": 14513, "yr_of_estab": 2007,
+          "region_of_employment": "West", "prevailing_wage": 592.2029, "unit_of_wage": "Hour",
+          "full_time_position": "Y"}
+
+
+@pytest.fixture(scope="module")
+def rules():
+
+    return RequestValidator(model_predictor=USvisaClassifier()).get_rules()
+
+
+def test_training_data_is_valid(rules):
+
+    dataframe = pd.read_csv("notebook/EasyVisa.csv")
+    records = dataframe[list(RECORD)].to_dict("records")
+
+    assert [index for index, record in enumerate(records) if rules.validate_record(record)[1]] == []
+
+
+@pytest.mark.parametrize("value", [5, 5.0, "5", "5.0", -26])
+def test_int_field_accepts_integral_values(rules, value):
+
+    clean_record, field_errors = rules.validate_record({**RECORD, "no_of_employees": value})
+
+    assert field_errors == []
+    assert clean_record["no_of_employees"] == int(float(value))
+    assert type(clean_record["no_of_employees"]) is int
+
+
+@pytest.mark.parametrize("value", [12.5, "12.5", "x", True, float("nan"), None])
+def test_int_field_rejects_other_values(rules, value):
+
+    _, field_errors = rules.validate_record({**RECORD, "no_of_employees": value})
+
+    assert [field_error["field"] for field_error in field_errors] == ["no_of_employees"]
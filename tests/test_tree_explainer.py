@@ -0,0 +1,93 @@
+import copy
+import math
+
+import numpy as np
+import pytest
+
+from us_visa.entity.compiled_ensemble import CompiledGradientBoosting
+from us_visa.entity.tree_explainer import CompiledTreeExplainer
+
+
+N_ROWS = 2000
+
+
+@pytest.fixture(scope="module")
+def compiled_model(prediction_model):
+
+    return CompiledGradientBoosting.from_model(prediction_model)
+
+
+@pytest.fixture(scope="module")
+def tree_explainer(compiled_model):
+
+    tree_explainer = CompiledTreeExplainer.from_model(compiled_model)
+    assert tree_explainer is not None
+
+    return tree_explainer
+
+
+def test_shap_values_sum_to_the_margin(tree_explainer, prediction_model, X_all):
+
+    X = X_all[:N_ROWS]
+    shap_values = tree_explainer.shap_values(X)
+
+    assert shap_values.shape == X.shape
+    np.testing.assert_allclose(tree_explainer.expected_value + shap_values.sum(axis=1),
+                               prediction_model.decision_function(X), rtol=0, atol=1e-9)
+
+
+def brute_force_shap_values(tree, learning_rate: float, x: np.ndarray) -> np.ndarray:
+
+    """
+    Path-dependent Shapley values of one sklearn regression tree for one row, from the definition : the value of a
+    feature subset S follows x on the splits on S and averages both children (by training weight) on the others.
+    """
+
+    features = np.unique(tree.feature[tree.feature >= 0])
+    n_used = features.shape[0]
+
+    def subset_value(node: int, subset: set) -> float:
+
+        if tree.children_left[node] < 0:
+            return learning_rate * tree.value[node].ravel()[0]
+
+        left, right = tree.children_left[node], tree.children_right[node]
+
+        if tree.feature[node] in subset:
+            return subset_value(left if x[tree.feature[node]] <= tree.threshold[node] else right, subset)
+
+        return (tree.weighted_n_node_samples[left] * subset_value(left, subset)
+                + tree.weighted_n_node_samples[right] * subset_value(right, subset)) / tree.weighted_n_node_samples[node]
+
+    masks = np.arange(2 ** n_used)
+    values = np.array([subset_value(0, {feature for bit, feature in enumerate(features) if mask >> bit & 1}) for mask in masks])
+    subset_sizes = np.array([bin(mask).count("1") for mask in masks])
+
+    # |S|! (n - |S| - 1)! / n! for the subsets S without the feature
+    weights = np.array([math.factorial(size) * math.factorial(n_used - size - 1) / math.factorial(n_used) if size < n_used else 0.0
+                        for size in range(n_used + 1)])
+
+    shap_values = np.zeros(x.shape[0])
+
+    for bit, feature in enumerate(features):
+        without_feature = masks[(masks >> bit & 1) == 0]
+        shap_values[feature] = np.sum(weights[subset_sizes[without_feature]] * (values[without_feature | (1 << bit)] - values[without_feature]))
+
+    return shap_values
+
+
+def test_shap_values_match_the_shapley_definition(prediction_model, X_all):
+
+    # One-tree ensemble : the brute force enumerates every subset of the features the tree splits on
+    single_tree_model = copy.deepcopy(prediction_model)
+    single_tree_model.estimators_ = prediction_model.estimators_[:1]
+    single_tree_model.n_estimators_ = single_tree_model.n_estimators = 1
+
+    tree_explainer = CompiledTreeExplainer.from_model(CompiledGradientBoosting.from_model(single_tree_model))
+
+    X = X_all[:3].astype(np.float32)
+
+    for x, shap_values in zip(X, tree_explainer.shap_values(X)):
+        expected_shap_values = brute_force_shap_values(prediction_model.estimators_[0, 0].tree_, prediction_model.learning_rate, x)
+
+        np.testing.assert_allclose(shap_values, expected_shap_values, rtol=0, atol=1e-9)